@@ -1,17 +1,129 @@
 import os
+import csv
 import hashlib
 import hmac
+import io
+import json
+import re
+import secrets
+import time
 from datetime import date, datetime, timedelta
 from functools import wraps
 
-from flask import Flask, flash, redirect, render_template, request, session, url_for
-
-from db import close_db, get_db
+import click
+from flask import (
+    Flask,
+    Response,
+    before_render_template,
+    flash,
+    g,
+    get_template_attribute,
+    jsonify,
+    message_flashed,
+    redirect,
+    render_template,
+    request,
+    send_from_directory,
+    session,
+    template_rendered,
+    stream_with_context,
+    url_for,
+)
+from mysql.connector.errors import IntegrityError
+
+from attendance_analytics import attendance_analytics
+from class_schedule import (
+    adjacent_offerings,
+    cached_days,
+    day_offerings_query,
+    neighbouring_offerings,
+    schedule_days_query,
+    store_days,
+)
+from db import (
+    DEFAULT_ACADEMY_ID,
+    close_db,
+    connect_db,
+    current_academy_id,
+    database_route,
+    get_db,
+    pool_status,
+    prime_pool,
+    routed_academy_ids,
+    run_query_batch,
+    select_academy,
+)
+from events import MAX_STREAMS, get_event_bus, stream_events
+from instructor_hours import HOUR_COLUMNS, mark_weeks_dirty, refresh_week_hours, week_hours_rows, weeks_between
+from instructor_solver import solve_assignments
+from jobs import (
+    JobLost,
+    decode_jobs,
+    enqueue_job,
+    job_handler,
+    maintenance_task,
+    recent_jobs_query,
+    run_worker_pool,
+    start_inline_worker,
+)
+from metrics import (
+    latest_metrics,
+    record_cache,
+    record_request_metrics,
+    record_template_render,
+    start_request_timer,
+    start_template_timer,
+)
+from profiling import (
+    PROFILE_NAME_PATTERN,
+    list_profiles,
+    profile_dir,
+    start_profiler,
+    stop_profiler,
+)
+from progress_ledger import (
+    current_timestamp,
+    import_untracked_progress,
+    lock_children,
+    rebuild_progress_projection,
+    record_progress_event,
+)
+from readiness import readiness_label, refresh_readiness
+from schedule_calendar import (
+    VIEWS as CALENDAR_VIEWS,
+    calendar_skeleton,
+    calendar_window,
+    classes_query,
+    normalize_start,
+    overlay_calendar,
+    shift_start,
+    shifts_query,
+)
+from shift_coverage import iso_week_bounds, suggest_coverage
+from tracing import (
+    finish_template_span,
+    finish_trace,
+    start_template_span,
+    start_trace,
+    tag_trace_response,
+    traced,
+)
 
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-change-me")
 app.teardown_appcontext(close_db)
+app.before_request(start_request_timer)
+app.before_request(start_trace)
+app.before_request(start_profiler)
+app.teardown_request(stop_profiler)
+app.teardown_request(finish_trace)
+app.after_request(tag_trace_response)
+app.after_request(record_request_metrics)
+before_render_template.connect(start_template_timer, app)
+before_render_template.connect(start_template_span, app)
+template_rendered.connect(record_template_render, app)
+template_rendered.connect(finish_template_span, app)
 
 BELT_SEQUENCE = [
     "White",
@@ -45,6 +157,36 @@ TRACK_NORMALIZATION = {
 PROGRAM_TRACKS = tuple(TRACK_LABELS.keys())
 MAX_CLASSES_PER_WEEK = 3
 LEARNED_TARGET = 3
+ASSIGNMENT_TIME_BUDGET_SECONDS = float(os.getenv("ASSIGNMENT_TIME_BUDGET_SECONDS", "5"))
+# Bulk enrollments and attendance close-outs larger than this run as background jobs.
+INLINE_BULK_LIMIT = int(os.getenv("INLINE_BULK_LIMIT", "20"))
+INLINE_ATTENDANCE_ENTRY_LIMIT = int(os.getenv("INLINE_ATTENDANCE_ENTRY_LIMIT", "60"))
+# Most queued offline attendance sessions one sync request may carry.
+ATTENDANCE_SYNC_MAX_SESSIONS = int(os.getenv("ATTENDANCE_SYNC_MAX_SESSIONS", "500"))
+# Replayed form submissions within this window return the original result.
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# Longest range the instructor hours report accepts in one request.
+INSTRUCTOR_HOURS_MAX_WEEKS = 104
+IDEMPOTENCY_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+CLIENT_ID_PATTERN = re.compile(r"^[0-9A-Za-z-]{8,36}$")
+NO_TECHNIQUES_APPLIED = "No per-student techniques were selected to apply."
+# "[YYYY-MM-DD HH:MM username] comment" lines that edit_technique used to append to descriptions.
+# It always started them on a new line, so a bracketed stamp mid-line is description text.
+LEGACY_TECHNIQUE_COMMENT = re.compile(r"(?m)^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}) ([^\]\n]+)\]\s*")
+TECHNIQUE_REVISION_FIELDS = ("technique_name", "description", "is_active", "program_track", "belt_index")
+TECHNIQUE_REVISIONS_PER_PAGE = 20
+# Tables that carry academy_id; the leading-academy index is created alongside the column.
+ACADEMY_SCOPED_INDEXES = {
+    "users": "idx_users_academy_role (academy_id, role, username)",
+    "children": "idx_children_academy_parent (academy_id, parent_user_id, child_name)",
+    "shifts": "idx_shifts_academy_date (academy_id, shift_date, employee_user_id)",
+    "class_offerings": "idx_class_offerings_academy_date (academy_id, class_date, start_time)",
+    "techniques": "idx_techniques_academy_track_belt (academy_id, program_track, belt_index, is_active)",
+    "attendance_sessions": "idx_attendance_sessions_academy_date (academy_id, class_date, start_time)",
+    "instructor_assignment_runs": "idx_instructor_assignment_runs_academy (academy_id, id)",
+}
+# Database routes (see db.database_route) whose on-demand migrations have run in this process.
+_feature_schema_routes = set()
 
 
 def _belt_name_for_index(belt_index):
@@ -63,8 +205,12 @@ def _track_label(value):
     return TRACK_LABELS.get(normalized, normalized.replace("_", " ").title())
 
 
-def _ensure_feature_schema(cur):
+def _ensure_feature_schema(cur, academy_id=None):
     # Keep old local databases compatible by creating/altering new tables on demand.
+    route = database_route(current_academy_id() if academy_id is None else academy_id)
+    record_cache("feature_schema", route in _feature_schema_routes)
+    if route in _feature_schema_routes:
+        return
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS class_offerings (
@@ -103,7 +249,6 @@ def _ensure_feature_schema(cur):
         "ALTER TABLE children ADD COLUMN program_track ENUM('little_dragons', 'kids_martial_arts', 'teen_martial_arts', 'adult_martial_arts') NOT NULL DEFAULT 'kids_martial_arts'",
         "ALTER TABLE children ADD COLUMN belt_index INT NOT NULL DEFAULT 0",
         "ALTER TABLE techniques ADD COLUMN program_track ENUM('little_dragons', 'kids_martial_arts', 'teen_martial_arts', 'adult_martial_arts') NOT NULL DEFAULT 'kids_martial_arts'",
-        "ALTER TABLE techniques ADD COLUMN belt_name VARCHAR(40) NOT NULL DEFAULT 'White'",
         "ALTER TABLE child_skill_progress ADD COLUMN learned_count TINYINT NOT NULL DEFAULT 0",
         "ALTER TABLE attendance_students ADD COLUMN is_present TINYINT(1) NOT NULL DEFAULT 1",
         "ALTER TABLE attendance_sessions ADD COLUMN offering_id INT NULL",
@@ -111,6 +256,16 @@ def _ensure_feature_schema(cur):
         "ALTER TABLE children ADD COLUMN contact_phone VARCHAR(40) NULL",
         "ALTER TABLE requests ADD COLUMN switch_target_status ENUM('pending','accepted','rejected') NOT NULL DEFAULT 'pending'",
         "ALTER TABLE class_offerings ADD COLUMN program_track ENUM('little_dragons', 'kids_martial_arts', 'teen_martial_arts', 'adult_martial_arts') NOT NULL DEFAULT 'kids_martial_arts'",
+        "ALTER TABLE shifts ADD INDEX idx_shifts_date_employee (shift_date, employee_user_id)",
+        "ALTER TABLE shifts ADD INDEX idx_shifts_class_employee (class_name, employee_user_id)",
+        "ALTER TABLE class_offerings ADD COLUMN week_key INT AS (YEARWEEK(class_date, 1)) STORED",
+        "ALTER TABLE class_offerings ADD INDEX idx_class_offerings_week (week_key)",
+        "ALTER TABLE child_skill_progress ADD COLUMN predicted_ready_date DATE NULL",
+        "ALTER TABLE shifts ADD COLUMN coverage_status ENUM('scheduled','called_out','covered') NOT NULL DEFAULT 'scheduled'",
+        "ALTER TABLE shifts ADD COLUMN covering_employee_id INT NULL",
+        "ALTER TABLE shifts ADD INDEX idx_shifts_coverage_date (coverage_status, shift_date)",
+        "ALTER TABLE techniques ADD COLUMN belt_index INT NOT NULL DEFAULT 0",
+        "ALTER TABLE techniques ADD INDEX idx_techniques_track_belt_active (program_track, belt_index, is_active)",
     ]
     for statement in alter_statements:
         try:
@@ -133,6 +288,378 @@ def _ensure_feature_schema(cur):
         except Exception:
             pass
 
+    cur.execute(
+        """
+        SELECT COUNT(*) AS legacy_belt_name
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'techniques'
+          AND COLUMN_NAME = 'belt_name'
+        """
+    )
+    if cur.fetchone()["legacy_belt_name"]:
+        # Older databases stored the belt by name; move it to belt_index once. The label is
+        # derived from belt_index when rendering.
+        cur.execute(
+            "UPDATE techniques SET belt_index = GREATEST(FIELD(belt_name, {}) - 1, 0)".format(
+                ", ".join(["%s"] * len(BELT_SEQUENCE))
+            ),
+            tuple(BELT_SEQUENCE),
+        )
+        cur.execute("ALTER TABLE techniques DROP COLUMN belt_name")
+
+    # Call-outs used to be recorded by appending a suffix to the class name.
+    cur.execute(
+        """
+        UPDATE shifts
+        SET coverage_status = 'called_out',
+            class_name = TRIM(REPLACE(class_name, ' (CALL-OUT)', ''))
+        WHERE class_name LIKE '%(CALL-OUT)'
+        """
+    )
+    # Covers used to overwrite employee_user_id as well; restore the employee who called out.
+    cur.execute(
+        """
+        UPDATE shifts s
+        JOIN (
+            SELECT shift_id, MAX(id) AS request_id
+            FROM requests
+            WHERE request_type = 'callout' AND status = 'approved'
+            GROUP BY shift_id
+        ) latest ON latest.shift_id = s.id
+        JOIN requests r ON r.id = latest.request_id
+        SET s.employee_user_id = r.requester_user_id
+        WHERE s.coverage_status = 'covered'
+          AND s.employee_user_id = s.covering_employee_id
+        """
+    )
+
+    # Per-child weekly signup counters backing the MAX_CLASSES_PER_WEEK check.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS child_week_signups (
+          child_id INT NOT NULL,
+          week_key INT NOT NULL,
+          signup_count INT NOT NULL DEFAULT 0,
+          PRIMARY KEY (child_id, week_key),
+          FOREIGN KEY (child_id) REFERENCES children(id)
+        )
+        """
+    )
+    cur.execute("SELECT 1 FROM child_week_signups LIMIT 1")
+    if not cur.fetchall():
+        # Seed counters from existing enrollments the first time the table is used.
+        cur.execute(
+            """
+            INSERT INTO child_week_signups (child_id, week_key, signup_count)
+            SELECT ce.child_id, co.week_key, COUNT(*)
+            FROM class_enrollments ce
+            JOIN class_offerings co ON co.id = ce.offering_id
+            GROUP BY ce.child_id, co.week_key
+            ON DUPLICATE KEY UPDATE signup_count = VALUES(signup_count)
+            """
+        )
+
+    # Seat counters: every enrollment write adjusts enrolled_count; a NULL capacity is unlimited.
+    try:
+        cur.execute("ALTER TABLE class_offerings ADD COLUMN enrolled_count INT NOT NULL DEFAULT 0")
+    except Exception:
+        pass
+    else:
+        # Seed the counter from existing rosters when the column is first added.
+        cur.execute(
+            """
+            UPDATE class_offerings co
+            JOIN (
+                SELECT offering_id, COUNT(*) AS enrolled
+                FROM class_enrollments
+                GROUP BY offering_id
+            ) rosters ON rosters.offering_id = co.id
+            SET co.enrolled_count = rosters.enrolled
+            """
+        )
+    try:
+        cur.execute("ALTER TABLE class_offerings ADD COLUMN capacity INT NULL")
+    except Exception:
+        pass
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS class_waitlist (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          offering_id INT NOT NULL,
+          child_id INT NOT NULL,
+          requested_by_user_id INT NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          UNIQUE KEY uq_class_waitlist (offering_id, child_id),
+          KEY idx_class_waitlist_offering (offering_id, id),
+          KEY idx_class_waitlist_child (child_id),
+          FOREIGN KEY (offering_id) REFERENCES class_offerings(id),
+          FOREIGN KEY (child_id) REFERENCES children(id),
+          FOREIGN KEY (requested_by_user_id) REFERENCES users(id)
+        )
+        """
+    )
+
+    # Background instructor auto-assignment runs and their reported scores.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS instructor_assignment_runs (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          month_start DATE NOT NULL,
+          status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+          score DOUBLE NULL,
+          summary TEXT NULL,
+          created_by_user_id INT NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          finished_at TIMESTAMP NULL,
+          FOREIGN KEY (created_by_user_id) REFERENCES users(id)
+        )
+        """
+    )
+
+    # Precomputed test-readiness predictions maintained by the readiness batch job.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS child_learning_stats (
+          child_id INT PRIMARY KEY,
+          total_increments INT NOT NULL DEFAULT 0,
+          session_count INT NOT NULL DEFAULT 0,
+          first_session_date DATE NULL,
+          last_session_date DATE NULL,
+          FOREIGN KEY (child_id) REFERENCES children(id)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS child_belt_readiness (
+          child_id INT NOT NULL,
+          belt_index INT NOT NULL,
+          belt_name VARCHAR(40) NOT NULL,
+          predicted_ready_date DATE NULL,
+          steps_per_week DOUBLE NOT NULL DEFAULT 1,
+          updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (child_id, belt_index),
+          FOREIGN KEY (child_id) REFERENCES children(id)
+        )
+        """
+    )
+    cur.execute(
+        """
+        SELECT COUNT(*) AS legacy_key
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'child_belt_readiness'
+          AND CONSTRAINT_NAME = 'PRIMARY'
+          AND COLUMN_NAME = 'belt_name'
+        """
+    )
+    if cur.fetchone()["legacy_key"]:
+        # Older databases keyed readiness rows by belt name; re-key them by belt index once.
+        try:
+            cur.execute("ALTER TABLE child_belt_readiness ADD COLUMN belt_index INT NOT NULL DEFAULT 0")
+        except Exception:
+            pass
+        cur.execute(
+            "UPDATE child_belt_readiness SET belt_index = GREATEST(FIELD(belt_name, {}) - 1, 0)".format(
+                ", ".join(["%s"] * len(BELT_SEQUENCE))
+            ),
+            tuple(BELT_SEQUENCE),
+        )
+        cur.execute("ALTER TABLE child_belt_readiness DROP PRIMARY KEY, ADD PRIMARY KEY (child_id, belt_index)")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS readiness_job_state (
+          id TINYINT PRIMARY KEY,
+          last_session_id INT NOT NULL DEFAULT 0,
+          last_run_at TIMESTAMP NULL
+        )
+        """
+    )
+    try:
+        cur.execute("ALTER TABLE attendance_sessions ADD COLUMN readiness_folded TINYINT(1) NOT NULL DEFAULT 0")
+    except Exception:
+        pass
+    else:
+        # Sessions up to the old id watermark were already folded into learning stats.
+        cur.execute(
+            """
+            UPDATE attendance_sessions
+            SET readiness_folded = 1
+            WHERE id <= (SELECT last_session_id FROM readiness_job_state WHERE id = 1)
+            """
+        )
+    try:
+        cur.execute("ALTER TABLE attendance_sessions ADD INDEX idx_attendance_sessions_unfolded (readiness_folded, id)")
+    except Exception:
+        pass
+
+    # Queue table polled by the background job workers.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS background_jobs (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          job_type VARCHAR(60) NOT NULL,
+          label VARCHAR(200) NOT NULL,
+          payload MEDIUMTEXT NULL,
+          status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+          progress TINYINT NOT NULL DEFAULT 0,
+          progress_message VARCHAR(200) NULL,
+          attempts INT NOT NULL DEFAULT 0,
+          max_attempts INT NOT NULL DEFAULT 3,
+          run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          locked_by VARCHAR(120) NULL,
+          result TEXT NULL,
+          error TEXT NULL,
+          created_by_user_id INT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          started_at TIMESTAMP NULL,
+          heartbeat_at TIMESTAMP NULL,
+          finished_at TIMESTAMP NULL,
+          KEY idx_background_jobs_claim (status, run_after),
+          KEY idx_background_jobs_user (created_by_user_id, id),
+          FOREIGN KEY (created_by_user_id) REFERENCES users(id)
+        )
+        """
+    )
+    # Running jobs are requeued on a stale heartbeat, not on how long ago they started.
+    try:
+        cur.execute("ALTER TABLE background_jobs ADD COLUMN heartbeat_at TIMESTAMP NULL")
+    except Exception:
+        pass
+
+    # Append-only technique edit history; descriptions hold only the current text.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS technique_revisions (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          technique_id INT NOT NULL,
+          changed_by_user_id INT NULL,
+          changes TEXT NULL,
+          comment TEXT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          KEY idx_technique_revisions_technique (technique_id, id),
+          FOREIGN KEY (technique_id) REFERENCES techniques(id) ON DELETE CASCADE,
+          FOREIGN KEY (changed_by_user_id) REFERENCES users(id)
+        )
+        """
+    )
+    _migrate_legacy_technique_comments(cur)
+
+    # Append-only progress ledger; child_skill_progress is folded from it.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS progress_events (
+          id BIGINT AUTO_INCREMENT PRIMARY KEY,
+          progress_id INT NOT NULL,
+          child_id INT NOT NULL,
+          technique_id INT NOT NULL,
+          event_type ENUM('assigned', 'learned', 'corrected', 'removed', 'imported') NOT NULL,
+          learned_delta TINYINT NOT NULL DEFAULT 0,
+          learned_count TINYINT NULL,
+          completed TINYINT(1) NULL,
+          completed_at TIMESTAMP NULL,
+          notes TEXT NULL,
+          actor_user_id INT NULL,
+          attendance_session_id INT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          KEY idx_progress_events_child (child_id, progress_id, id),
+          KEY idx_progress_events_progress (progress_id, id),
+          FOREIGN KEY (child_id) REFERENCES children(id),
+          FOREIGN KEY (actor_user_id) REFERENCES users(id)
+        )
+        """
+    )
+    import_untracked_progress(cur)
+
+    # Weekly instructor hours, rebuilt per week when that week's version moves past the stored one.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS instructor_hours_weeks (
+          academy_id INT NOT NULL,
+          week_start DATE NOT NULL,
+          version INT NOT NULL DEFAULT 1,
+          computed_version INT NOT NULL DEFAULT 0,
+          PRIMARY KEY (academy_id, week_start)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS instructor_week_hours (
+          academy_id INT NOT NULL,
+          week_start DATE NOT NULL,
+          employee_user_id INT NOT NULL,
+          scheduled_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          worked_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          called_out_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          switched_out_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          picked_up_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          teaching_little_dragons_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          teaching_kids_martial_arts_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          teaching_teen_martial_arts_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          teaching_adult_martial_arts_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          teaching_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+          utilization DECIMAL(6,3) NULL,
+          PRIMARY KEY (academy_id, week_start, employee_user_id),
+          FOREIGN KEY (employee_user_id) REFERENCES users(id)
+        )
+        """
+    )
+
+    # Belt promotion history; batch_key groups the rows written by one promotion run.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS belt_promotions (
+          id INT AUTO_INCREMENT PRIMARY KEY,
+          academy_id INT NOT NULL DEFAULT 1,
+          child_id INT NOT NULL,
+          program_track ENUM('little_dragons', 'kids_martial_arts', 'teen_martial_arts', 'adult_martial_arts') NOT NULL,
+          from_belt_index INT NOT NULL,
+          to_belt_index INT NOT NULL,
+          promoted_by_user_id INT NULL,
+          batch_key CHAR(32) NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          KEY idx_belt_promotions_academy_created (academy_id, created_at, to_belt_index),
+          KEY idx_belt_promotions_batch (batch_key),
+          KEY idx_belt_promotions_child (child_id, id),
+          FOREIGN KEY (child_id) REFERENCES children(id),
+          FOREIGN KEY (promoted_by_user_id) REFERENCES users(id)
+        )
+        """
+    )
+
+    # Cross-process fan-out log tailed by the live update streams (EVENT_BUS_BACKEND=mysql).
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS live_events (
+          id BIGINT AUTO_INCREMENT PRIMARY KEY,
+          channel VARCHAR(60) NOT NULL,
+          event_type VARCHAR(40) NOT NULL,
+          payload MEDIUMTEXT NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          KEY idx_live_events_created (created_at)
+        )
+        """
+    )
+
+    # Dedupe table for form submissions carrying a server-issued idempotency key.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+          idem_key CHAR(32) PRIMARY KEY,
+          user_id INT NOT NULL,
+          scope VARCHAR(60) NOT NULL,
+          response_location VARCHAR(500) NULL,
+          flashes TEXT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          completed_at TIMESTAMP NULL,
+          expires_at TIMESTAMP NOT NULL,
+          KEY idx_idempotency_keys_expires (expires_at)
+        )
+        """
+    )
+
     # Create separate SQL views for kid/adult belt placement.
     cur.execute(
         """
@@ -197,34 +724,119 @@ def _ensure_feature_schema(cur):
         """
     )
 
+    # Location dimension: academy-owned rows carry academy_id, which leads their lookup indexes.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS academies (
+          id INT PRIMARY KEY,
+          academy_name VARCHAR(120) NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cur.execute(
+        "INSERT IGNORE INTO academies (id, academy_name) VALUES (%s, %s)",
+        (DEFAULT_ACADEMY_ID, "Modesto's Karate"),
+    )
+    for table, index in ACADEMY_SCOPED_INDEXES.items():
+        for statement in (
+            f"ALTER TABLE {table} ADD COLUMN academy_id INT NOT NULL DEFAULT {DEFAULT_ACADEMY_ID}",
+            f"ALTER TABLE {table} ADD INDEX {index}",
+        ):
+            try:
+                cur.execute(statement)
+            except Exception:
+                pass
+    # Lets the attendance analytics cache check for newly closed sessions with an index lookup.
+    try:
+        cur.execute("ALTER TABLE attendance_sessions ADD INDEX idx_attendance_sessions_academy_id (academy_id, id)")
+    except Exception:
+        pass
+    # Sessions synced from offline devices carry the device's id so a resent queue is recorded once.
+    for statement in (
+        "ALTER TABLE attendance_sessions ADD COLUMN client_id VARCHAR(36) NULL",
+        "ALTER TABLE attendance_sessions ADD UNIQUE KEY uq_attendance_sessions_client (academy_id, client_id)",
+    ):
+        try:
+            cur.execute(statement)
+        except Exception:
+            pass
+    # Technique names only need to be unique within one academy.
+    try:
+        cur.execute(
+            """
+            ALTER TABLE techniques
+              DROP INDEX technique_name,
+              ADD UNIQUE KEY uq_techniques_academy_name (academy_id, technique_name)
+            """
+        )
+    except Exception:
+        pass
+    _feature_schema_routes.add(route)
+
+
+def _split_legacy_technique_comments(text):
+    # Return (description, [(timestamp, username, comment)]) for a description with appended comments.
+    matches = list(LEGACY_TECHNIQUE_COMMENT.finditer(text or ""))
+    if not matches:
+        return text, []
+    comments = []
+    for pos, match in enumerate(matches):
+        end = matches[pos + 1].start() if pos + 1 < len(matches) else len(text)
+        comments.append((match.group(1), match.group(2), text[match.end():end].strip()))
+    return text[: matches[0].start()].strip(), comments
 
-def _predict_test_ready_date(progress_row):
-    # Estimate test readiness date from learned_count progression (3 = test ready).
-    learned_count = int(progress_row.get("learned_count") or 0)
-    if learned_count >= LEARNED_TARGET:
-        progress_row["predicted_test_date"] = None
-        progress_row["prediction_label"] = "Ready now"
+
+def _migrate_legacy_technique_comments(cur):
+    # One-time move of appended comment lines into technique_revisions; later runs find no matches.
+    cur.execute(
+        "SELECT id, description FROM techniques WHERE description LIKE %s",
+        ("%[____-__-__ __:__ %]%",),
+    )
+    rows = cur.fetchall()
+    if not rows:
         return
+    cur.execute("SELECT id, username FROM users")
+    user_ids = {row["username"]: row["id"] for row in cur.fetchall()}
+    for row in rows:
+        description, comments = _split_legacy_technique_comments(row["description"])
+        if not comments:
+            continue
+        cur.executemany(
+            """
+            INSERT INTO technique_revisions (technique_id, changed_by_user_id, comment, created_at)
+            VALUES (%s, %s, %s, %s)
+            """,
+            [
+                (row["id"], user_ids.get(username), comment, datetime.strptime(stamp, "%Y-%m-%d %H:%M"))
+                for stamp, username, comment in comments
+            ],
+        )
+        cur.execute("UPDATE techniques SET description = %s WHERE id = %s", (description, row["id"]))
 
-    remaining = max(LEARNED_TARGET - learned_count, 1)
-    anchor = progress_row.get("assigned_at")
-    if not isinstance(anchor, datetime):
-        anchor = datetime.now()
-    predicted = (anchor.date() + timedelta(days=remaining * 7))
-    progress_row["predicted_test_date"] = predicted
-    progress_row["prediction_label"] = predicted.strftime("%b %d, %Y")
+
+def _label_test_ready_date(progress_row):
+    # Format the precomputed readiness date; the readiness job owns the estimate itself.
+    progress_row["predicted_test_date"] = progress_row.get("predicted_ready_date")
+    progress_row["prediction_label"] = readiness_label(
+        progress_row.get("predicted_ready_date"),
+        progress_row.get("learned_count"),
+        LEARNED_TARGET,
+    )
 
 
-def _get_child_belt_progress(cur, child_id, track, belt_name):
+@traced
+def _get_child_belt_progress(cur, child_id, track, belt_index):
     cur.execute(
         """
         SELECT COUNT(*) AS belt_total
         FROM techniques
-        WHERE is_active = 1
+        WHERE academy_id = %s
           AND program_track = %s
-          AND belt_name = %s
+          AND belt_index = %s
+          AND is_active = 1
         """,
-        (track, belt_name),
+        (current_academy_id(), track, belt_index),
     )
     total_row = cur.fetchone() or {}
     belt_total = int(total_row.get("belt_total") or 0)
@@ -236,23 +848,28 @@ def _get_child_belt_progress(cur, child_id, track, belt_name):
         JOIN techniques t ON t.id = csp.technique_id
         WHERE csp.child_id = %s
           AND t.program_track = %s
-          AND t.belt_name = %s
+          AND t.belt_index = %s
           AND (csp.learned_count >= %s OR csp.completed = 1)
         """,
-        (child_id, track, belt_name, LEARNED_TARGET),
+        (child_id, track, belt_index, LEARNED_TARGET),
     )
     learned_row = cur.fetchone() or {}
     learned_total = int(learned_row.get("learned_total") or 0)
     return learned_total, belt_total
 
 
-def _apply_learning_entry(cur, child_id, technique_id, staff_user_id, increment=1, notes_text=None):
+@traced
+def _apply_learning_entry(cur, academy_id, child_id, technique_id, staff_user_id, increment=1,
+                          notes_text=None, attendance_session_id=None, occurred_at=None):
     # Increment learning count for a child-technique pair, capped at 3.
-    cur.execute("SELECT id FROM children WHERE id = %s", (child_id,))
+    # The shared child lock comes first so a progress rebuild batch cannot interleave.
+    cur.execute(
+        "SELECT id FROM children WHERE id = %s AND academy_id = %s FOR SHARE", (child_id, academy_id)
+    )
     child = cur.fetchone()
     cur.execute(
-        "SELECT id FROM techniques WHERE id = %s AND is_active = 1",
-        (technique_id,),
+        "SELECT id FROM techniques WHERE id = %s AND academy_id = %s AND is_active = 1",
+        (technique_id, academy_id),
     )
     technique = cur.fetchone()
     if not child or not technique:
@@ -261,63 +878,63 @@ def _apply_learning_entry(cur, child_id, technique_id, staff_user_id, increment=
     step = max(1, min(int(increment or 1), LEARNED_TARGET))
     cur.execute(
         """
-        SELECT id, learned_count
+        SELECT id, child_id, technique_id, assigned_by_user_id, assigned_at, learned_count,
+               completed, completed_at, notes
         FROM child_skill_progress
         WHERE child_id = %s AND technique_id = %s
         ORDER BY id DESC
         LIMIT 1
+        FOR UPDATE
         """,
         (child_id, technique_id),
     )
     existing = cur.fetchone()
-    if existing:
-        new_count = min(LEARNED_TARGET, int(existing.get("learned_count") or 0) + step)
-        completed = 1 if new_count >= LEARNED_TARGET else 0
-        cur.execute(
-            """
-            UPDATE child_skill_progress
-            SET learned_count = %s,
-                completed = %s,
-                completed_at = CASE WHEN %s = 1 THEN CURRENT_TIMESTAMP ELSE NULL END,
-                notes = COALESCE(%s, notes)
-            WHERE id = %s
-            """,
-            (new_count, completed, completed, notes_text or None, existing["id"]),
-        )
-    else:
-        learned_count = min(LEARNED_TARGET, step)
-        completed = 1 if learned_count >= LEARNED_TARGET else 0
-        cur.execute(
-            """
-            INSERT INTO child_skill_progress
-                (child_id, technique_id, assigned_by_user_id, learned_count, completed, completed_at, notes)
-            VALUES
-                (%s, %s, %s, %s, %s, CASE WHEN %s = 1 THEN CURRENT_TIMESTAMP ELSE NULL END, %s)
-            """,
-            (
-                child_id,
-                technique_id,
-                staff_user_id,
-                learned_count,
-                completed,
-                completed,
-                notes_text or None,
-            ),
-        )
+    record_progress_event(
+        cur,
+        {
+            "event_type": "learned" if existing else "assigned",
+            "progress_id": existing["id"] if existing else None,
+            "child_id": child_id,
+            "technique_id": technique_id,
+            "learned_delta": step,
+            "notes": notes_text,
+            "actor_user_id": staff_user_id,
+            "attendance_session_id": attendance_session_id,
+            "created_at": occurred_at,
+        },
+        LEARNED_TARGET,
+        current=existing,
+    )
     return True
 
 
+@traced
 def _fetch_child_progress_summary(cur, parent_user_id=None):
     # Return per-child belt-based progress, optionally scoped to one parent.
     _ensure_feature_schema(cur)
-    query = "SELECT c.id, c.child_name, c.program_track, c.belt_index FROM children c"
-    params = ()
+    query = "SELECT c.id, c.child_name, c.program_track, c.belt_index FROM children c WHERE c.academy_id = %s"
+    params = (current_academy_id(),)
     if parent_user_id is not None:
-        query += " WHERE c.parent_user_id = %s"
-        params = (parent_user_id,)
+        query += " AND c.parent_user_id = %s"
+        params += (parent_user_id,)
     query += " ORDER BY c.child_name"
     cur.execute(query, params)
     children = cur.fetchall()
+    belt_readiness = {}
+    if children:
+        placeholders = ", ".join(["%s"] * len(children))
+        cur.execute(
+            f"""
+            SELECT child_id, belt_index, predicted_ready_date
+            FROM child_belt_readiness
+            WHERE child_id IN ({placeholders})
+            """,
+            tuple(child["id"] for child in children),
+        )
+        belt_readiness = {
+            (row["child_id"], row["belt_index"]): row["predicted_ready_date"]
+            for row in cur.fetchall()
+        }
     for child in children:
         track = _normalize_track(child.get("program_track"))
         belt_index = int(child.get("belt_index") or 0)
@@ -329,7 +946,7 @@ def _fetch_child_progress_summary(cur, parent_user_id=None):
             else "Mastery Track"
         )
         completed_skills, total_skills = _get_child_belt_progress(
-            cur, child["id"], track, current_belt
+            cur, child["id"], track, belt_index
         )
         child["program_track"] = track
         child["belt_index"] = belt_index
@@ -349,9 +966,17 @@ def _fetch_child_progress_summary(cur, parent_user_id=None):
             and completed_skills >= total_skills
             and belt_index < len(BELT_SEQUENCE) - 1
         )
+        belt_ready_date = belt_readiness.get((child["id"], belt_index))
+        if total_skills > 0 and completed_skills >= total_skills:
+            child["belt_ready_label"] = "Ready now"
+        elif belt_ready_date:
+            child["belt_ready_label"] = belt_ready_date.strftime("%b %d, %Y")
+        else:
+            child["belt_ready_label"] = "Estimate pending"
     return children
 
 
+@traced
 def _fetch_child_progress_rows(cur, child_ids):
     # Return detailed progress rows grouped by child id for dashboard rendering.
     if not child_ids:
@@ -369,9 +994,10 @@ def _fetch_child_progress_rows(cur, child_ids):
             csp.assigned_at,
             csp.completed_at,
             csp.notes,
+            csp.predicted_ready_date,
             t.technique_name,
             t.program_track,
-            t.belt_name,
+            t.belt_index,
             u.username AS assigned_by
         FROM child_skill_progress csp
         JOIN techniques t ON t.id = csp.technique_id
@@ -384,52 +1010,738 @@ def _fetch_child_progress_rows(cur, child_ids):
     rows = cur.fetchall()
     grouped = {child_id: [] for child_id in child_ids}
     for row in rows:
-        _predict_test_ready_date(row)
+        _label_test_ready_date(row)
         grouped[row["child_id"]].append(row)
     return grouped
 
 
-def _build_two_week_calendar(start_date, shifts):
-    # Build a 14-day calendar payload grouped into 2 weeks for UI rendering.
-    shifts_by_date = {}
-    for shift in shifts:
-        key = shift["shift_date"].isoformat()
-        shifts_by_date.setdefault(key, []).append(shift)
-
-    days = []
-    for offset in range(14):
-        day_value = start_date + timedelta(days=offset)
-        key = day_value.isoformat()
-        days.append(
-            {
-                "iso_date": key,
-                "display_date": day_value.strftime("%b %d"),
-                "weekday": day_value.strftime("%A"),
-                "weekday_short": day_value.strftime("%a"),
-                "shifts": shifts_by_date.get(key, []),
-            }
-        )
+def _build_calendar(view, start_date, shifts=(), classes=(), class_marks=None):
+    # Calendar payload grouped into weeks for UI rendering; the rows must cover calendar_window().
+    skeleton = calendar_skeleton(view, start_date, on_lookup=lambda hit: record_cache("calendar_skeleton", hit))
+    return overlay_calendar(skeleton, shifts, classes, class_marks)
 
-    return [days[:7], days[7:]]
+
+def _reserve_weekly_signup(cur, child_id, week_key):
+    # Atomically take one of the child's weekly class slots; False when the week is full.
+    cur.execute(
+        """
+        INSERT IGNORE INTO child_week_signups (child_id, week_key, signup_count)
+        VALUES (%s, %s, 0)
+        """,
+        (child_id, week_key),
+    )
+    cur.execute(
+        """
+        UPDATE child_week_signups
+        SET signup_count = signup_count + 1
+        WHERE child_id = %s
+          AND week_key = %s
+          AND signup_count < %s
+        """,
+        (child_id, week_key, MAX_CLASSES_PER_WEEK),
+    )
+    return cur.rowcount == 1
 
 
-def _parse_time_value(value):
-    try:
-        return datetime.strptime((value or "").strip(), "%H:%M").time()
-    except ValueError:
-        return None
+def _record_weekly_signup(cur, child_id, week_key):
+    # Count a staff enrollment toward the child's week without enforcing the limit.
+    cur.execute(
+        """
+        INSERT INTO child_week_signups (child_id, week_key, signup_count)
+        VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE signup_count = signup_count + 1
+        """,
+        (child_id, week_key),
+    )
 
 
-def _is_valid_time_window(start_time_value, end_time_value):
-    start_time = _parse_time_value(start_time_value)
-    end_time = _parse_time_value(end_time_value)
-    if not start_time or not end_time:
-        return False
-    return start_time < end_time
+def _release_weekly_signup(cur, child_id, week_key):
+    cur.execute(
+        """
+        UPDATE child_week_signups
+        SET signup_count = GREATEST(signup_count - 1, 0)
+        WHERE child_id = %s AND week_key = %s
+        """,
+        (child_id, week_key),
+    )
 
 
-def _ensure_parent_notes_table(cur):
-    # Ensure parent notes table exists so note features work on existing databases.
+def _take_class_seats(cur, offering_id, wanted):
+    # Claim up to `wanted` seats on the offering's counter; returns how many were granted.
+    if wanted <= 0:
+        return 0
+    cur.execute(
+        """
+        UPDATE class_offerings
+        SET enrolled_count = enrolled_count + %s
+        WHERE id = %s
+          AND (capacity IS NULL OR enrolled_count + %s <= capacity)
+        """,
+        (wanted, offering_id, wanted),
+    )
+    if cur.rowcount == 1:
+        return wanted
+    if wanted == 1:
+        return 0
+    # Not everyone fits: lock the counter and take the seats that are left.
+    cur.execute(
+        "SELECT capacity, enrolled_count FROM class_offerings WHERE id = %s FOR UPDATE",
+        (offering_id,),
+    )
+    row = cur.fetchone()
+    if not row or row["capacity"] is None:
+        return 0
+    granted = max(0, min(wanted, row["capacity"] - row["enrolled_count"]))
+    if granted:
+        cur.execute(
+            "UPDATE class_offerings SET enrolled_count = enrolled_count + %s WHERE id = %s",
+            (granted, offering_id),
+        )
+    return granted
+
+
+def _release_class_seat(cur, offering_id):
+    cur.execute(
+        "UPDATE class_offerings SET enrolled_count = GREATEST(enrolled_count - 1, 0) WHERE id = %s",
+        (offering_id,),
+    )
+
+
+def _join_waitlist(cur, offering_id, child_id, requested_by_user_id):
+    # Queue a child for a full class; returns their position, or None if already enrolled.
+    cur.execute(
+        "SELECT 1 FROM class_enrollments WHERE offering_id = %s AND child_id = %s",
+        (offering_id, child_id),
+    )
+    if cur.fetchone():
+        return None
+    cur.execute(
+        """
+        INSERT IGNORE INTO class_waitlist (offering_id, child_id, requested_by_user_id)
+        VALUES (%s, %s, %s)
+        """,
+        (offering_id, child_id, requested_by_user_id),
+    )
+    cur.execute(
+        """
+        SELECT COUNT(*) AS position
+        FROM class_waitlist
+        WHERE offering_id = %s
+          AND id <= (SELECT id FROM class_waitlist WHERE offering_id = %s AND child_id = %s)
+        """,
+        (offering_id, offering_id, child_id),
+    )
+    return int(cur.fetchone()["position"])
+
+
+def _promote_waitlist(cur, offering):
+    # Fill free seats from the waitlist in signup order; returns the promoted child ids.
+    # The locked offering row serializes promotions with signups for the same class.
+    cur.execute(
+        "SELECT capacity, enrolled_count FROM class_offerings WHERE id = %s FOR UPDATE",
+        (offering["id"],),
+    )
+    counter = cur.fetchone()
+    if not counter:
+        return []
+    promoted = []
+    while counter["capacity"] is None or counter["enrolled_count"] < counter["capacity"]:
+        cur.execute(
+            """
+            SELECT id, child_id, requested_by_user_id
+            FROM class_waitlist
+            WHERE offering_id = %s
+            ORDER BY id
+            LIMIT 1
+            """,
+            (offering["id"],),
+        )
+        entry = cur.fetchone()
+        if not entry:
+            break
+        cur.execute("DELETE FROM class_waitlist WHERE id = %s", (entry["id"],))
+        if not _reserve_weekly_signup(cur, entry["child_id"], offering["week_key"]):
+            # The child filled their week while waiting; the seat goes to the next entry.
+            continue
+        cur.execute(
+            """
+            INSERT IGNORE INTO class_enrollments (offering_id, child_id, enrolled_by_user_id)
+            VALUES (%s, %s, %s)
+            """,
+            (offering["id"], entry["child_id"], entry["requested_by_user_id"]),
+        )
+        if not cur.rowcount:
+            _release_weekly_signup(cur, entry["child_id"], offering["week_key"])
+            continue
+        _take_class_seats(cur, offering["id"], 1)
+        counter["enrolled_count"] += 1
+        cur.execute(
+            "UPDATE children SET program_track = %s WHERE id = %s",
+            (offering["program_track"], entry["child_id"]),
+        )
+        promoted.append(entry["child_id"])
+    return promoted
+
+
+def _withdraw_from_class(cur, offering, child_id):
+    # Drop a child's enrollment (or waitlist entry); returns ("enrolled"|"waitlisted"|None, promoted ids).
+    cur.execute(
+        "DELETE FROM class_enrollments WHERE offering_id = %s AND child_id = %s",
+        (offering["id"], child_id),
+    )
+    if cur.rowcount:
+        _release_class_seat(cur, offering["id"])
+        _release_weekly_signup(cur, child_id, offering["week_key"])
+        return "enrolled", _promote_waitlist(cur, offering)
+    cur.execute(
+        "DELETE FROM class_waitlist WHERE offering_id = %s AND child_id = %s",
+        (offering["id"], child_id),
+    )
+    return ("waitlisted" if cur.rowcount else None), []
+
+
+def _month_bounds(month_start):
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return month_start, next_month - timedelta(days=1)
+
+
+def _run_instructor_assignment(db, academy_id, run_id, month_start, commit=None):
+    # Solve and apply instructor assignments for one month, recording the outcome on the run row.
+    # The job handler passes JobContext.commit so a requeued duplicate cannot apply its writes.
+    commit = commit or db.commit
+    cur = db.cursor(dictionary=True)
+    try:
+        cur.execute(
+            "UPDATE instructor_assignment_runs SET status = 'running' WHERE id = %s",
+            (run_id,),
+        )
+        commit()
+
+        # The solver balances ISO-week hours, so read whole Mon-Sun weeks around the month.
+        # Classes outside the month only count as fixed load: unassigned ones stay unassigned.
+        first_day, last_day = _month_bounds(month_start)
+        window_first = first_day - timedelta(days=first_day.weekday())
+        window_last = last_day + timedelta(days=6 - last_day.weekday())
+        cur.execute(
+            """
+            SELECT id, program_track, class_date, start_time, end_time, instructor_user_id
+            FROM class_offerings
+            WHERE academy_id = %s
+              AND class_date BETWEEN %s AND %s
+            """,
+            (academy_id, window_first, window_last),
+        )
+        offerings = [
+            row
+            for row in cur.fetchall()
+            if first_day <= row["class_date"] <= last_day or row["instructor_user_id"] is not None
+        ]
+        cur.execute(
+            "SELECT id FROM users WHERE academy_id = %s AND role = 'employee' ORDER BY id",
+            (academy_id,),
+        )
+        employee_ids = [row["id"] for row in cur.fetchall()]
+        cur.execute(
+            """
+            SELECT COALESCE(covering_employee_id, employee_user_id) AS employee_user_id,
+                   shift_date, start_time, end_time
+            FROM shifts
+            WHERE academy_id = %s
+              AND shift_date BETWEEN %s AND %s
+              AND coverage_status <> 'called_out'
+            """,
+            (academy_id, window_first, window_last),
+        )
+        busy_blocks = {}
+        for row in cur.fetchall():
+            key = (row["employee_user_id"], row["shift_date"])
+            busy_blocks.setdefault(key, []).append((row["start_time"], row["end_time"]))
+        cur.execute(
+            """
+            SELECT instructor_user_id, program_track, COUNT(*) AS taught_count
+            FROM class_offerings
+            WHERE academy_id = %s
+              AND instructor_user_id IS NOT NULL
+            GROUP BY instructor_user_id, program_track
+            """,
+            (academy_id,),
+        )
+        track_experience = {
+            (row["instructor_user_id"], row["program_track"]): int(row["taught_count"])
+            for row in cur.fetchall()
+        }
+
+        result = solve_assignments(
+            offerings,
+            employee_ids,
+            busy_blocks=busy_blocks,
+            track_experience=track_experience,
+            time_budget=ASSIGNMENT_TIME_BUDGET_SECONDS,
+            seed=run_id,
+        )
+        updates = [
+            (employee_id, offering_id)
+            for offering_id, employee_id in result.pop("assignments").items()
+            if employee_id is not None
+        ]
+        if updates:
+            # Only fill offerings that are still unassigned, in case a manager edited meanwhile.
+            cur.executemany(
+                """
+                UPDATE class_offerings
+                SET instructor_user_id = %s
+                WHERE id = %s AND academy_id = %s AND instructor_user_id IS NULL
+                """,
+                [(employee_id, offering_id, academy_id) for employee_id, offering_id in updates],
+            )
+            offering_dates = {row["id"]: row["class_date"] for row in offerings}
+            mark_weeks_dirty(cur, academy_id, [offering_dates.get(offering_id) for _, offering_id in updates])
+        cur.execute(
+            """
+            UPDATE instructor_assignment_runs
+            SET status = 'done', score = %s, summary = %s, finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """,
+            (result["score"], json.dumps(result), run_id),
+        )
+        commit()
+    except JobLost:
+        db.rollback()
+        raise
+    except Exception as exc:
+        db.rollback()
+        cur.execute(
+            """
+            UPDATE instructor_assignment_runs
+            SET status = 'failed', summary = %s, finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """,
+            (json.dumps({"error": str(exc)}), run_id),
+        )
+        commit()
+        raise
+    finally:
+        cur.close()
+    return result
+
+
+@traced
+def _create_weekly_offerings(cur, academy_id, program_track, class_name, start_day, end_day, start_time,
+                             end_time, instructor_user_id, created_by_user_id, progress=None, capacity=None):
+    # Insert one offering per week from start_day to end_day, skipping duplicates and overlaps.
+    counts = {"inserted": 0, "duplicates": 0, "overlaps": 0}
+    total_weeks = (end_day - start_day).days // 7 + 1
+    day_cursor = start_day
+    week_number = 0
+    while day_cursor <= end_day:
+        week_number += 1
+        cur.execute(
+            """
+            SELECT id
+            FROM class_offerings
+            WHERE academy_id = %s
+              AND class_date = %s
+              AND class_name = %s
+              AND program_track = %s
+              AND start_time = %s
+              AND end_time = %s
+              AND (instructor_user_id <=> %s)
+            LIMIT 1
+            """,
+            (academy_id, day_cursor, class_name, program_track, start_time, end_time, instructor_user_id),
+        )
+        if cur.fetchone():
+            counts["duplicates"] += 1
+        else:
+            overlapping = None
+            if instructor_user_id:
+                cur.execute(
+                    """
+                    SELECT id
+                    FROM class_offerings
+                    WHERE academy_id = %s
+                      AND class_date = %s
+                      AND instructor_user_id = %s
+                      AND NOT (end_time <= %s OR start_time >= %s)
+                    LIMIT 1
+                    """,
+                    (academy_id, day_cursor, instructor_user_id, start_time, end_time),
+                )
+                overlapping = cur.fetchone()
+            if overlapping:
+                counts["overlaps"] += 1
+            else:
+                cur.execute(
+                    """
+                    INSERT INTO class_offerings
+                      (academy_id, program_track, class_name, class_date, start_time, end_time,
+                       instructor_user_id, created_by_user_id, capacity)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (
+                        academy_id,
+                        program_track,
+                        class_name,
+                        day_cursor,
+                        start_time,
+                        end_time,
+                        instructor_user_id,
+                        created_by_user_id,
+                        capacity,
+                    ),
+                )
+                counts["inserted"] += 1
+                mark_weeks_dirty(cur, academy_id, [day_cursor])
+        if progress:
+            progress(week_number * 100 // total_weeks, f"Week {week_number} of {total_weeks}")
+        day_cursor += timedelta(days=7)
+    return counts
+
+
+@traced
+def _enroll_children(cur, offering, child_ids, enrolled_by_user_id, progress=None):
+    # Add children to an offering roster, keeping seat and weekly counters in sync.
+    # Children beyond the class capacity join the waitlist; returns (added, waitlisted).
+    child_ids = list(dict.fromkeys(child_ids))
+    if not child_ids:
+        return 0, 0
+    placeholders = ", ".join(["%s"] * len(child_ids))
+    cur.execute(
+        f"SELECT child_id FROM class_enrollments WHERE offering_id = %s AND child_id IN ({placeholders})",
+        (offering["id"], *child_ids),
+    )
+    already_enrolled = {row["child_id"] for row in cur.fetchall()}
+    new_ids = [child_id for child_id in child_ids if child_id not in already_enrolled]
+    granted = _take_class_seats(cur, offering["id"], len(new_ids))
+    seated, overflow = new_ids[:granted], new_ids[granted:]
+
+    added = 0
+    for position, child_id in enumerate(seated, start=1):
+        cur.execute(
+            """
+            INSERT IGNORE INTO class_enrollments (offering_id, child_id, enrolled_by_user_id)
+            VALUES (%s, %s, %s)
+            """,
+            (offering["id"], child_id, enrolled_by_user_id),
+        )
+        if cur.rowcount:
+            added += 1
+            _record_weekly_signup(cur, child_id, offering["week_key"])
+        cur.execute(
+            "UPDATE children SET program_track = %s WHERE id = %s",
+            (offering["program_track"], child_id),
+        )
+        if progress and position % 25 == 0:
+            progress(position * 100 // len(child_ids), f"{position} of {len(child_ids)} students")
+    if added < granted:
+        # A concurrent signup enrolled some of these children first; hand back their seats.
+        cur.execute(
+            "UPDATE class_offerings SET enrolled_count = enrolled_count - %s WHERE id = %s",
+            (granted - added, offering["id"]),
+        )
+    if seated:
+        cur.execute(
+            f"DELETE FROM class_waitlist WHERE offering_id = %s AND child_id IN ({', '.join(['%s'] * len(seated))})",
+            (offering["id"], *seated),
+        )
+    for child_id in overflow:
+        _join_waitlist(cur, offering["id"], child_id, enrolled_by_user_id)
+    return added, len(overflow)
+
+
+@traced
+def _apply_attendance_techniques(cur, academy_id, attendance_session_id, class_row, technique_plan,
+                                 staff_user_id, progress=None):
+    # Apply {child_id: (technique_ids, increment)} learning entries and log them on the session.
+    updates = 0
+    notes_text = f"Attendance: {class_row['class_name']} {class_row['class_date']}"
+    occurred_at = current_timestamp(cur)
+    for position, (child_id, (technique_ids, learned_increment)) in enumerate(
+        sorted(technique_plan.items()), start=1
+    ):
+        for technique_id in technique_ids:
+            if _apply_learning_entry(
+                cur,
+                academy_id,
+                child_id,
+                technique_id,
+                staff_user_id,
+                increment=learned_increment,
+                notes_text=notes_text,
+                attendance_session_id=attendance_session_id,
+                occurred_at=occurred_at,
+            ):
+                cur.execute(
+                    """
+                    INSERT INTO attendance_technique_logs
+                      (attendance_session_id, child_id, technique_id, learned_increment)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE learned_increment = VALUES(learned_increment)
+                    """,
+                    (attendance_session_id, child_id, technique_id, learned_increment),
+                )
+                updates += 1
+        if progress:
+            progress(position * 100 // len(technique_plan), f"{position} of {len(technique_plan)} students")
+    return updates
+
+
+def _attendance_technique_plan(present_child_ids, bulk_technique_ids, student_technique_ids, increments):
+    # {child_id: (technique_ids, increment)} for present students with at least one technique.
+    technique_plan = {}
+    for child_id in present_child_ids:
+        technique_ids = sorted(set(student_technique_ids.get(child_id, ())).union(bulk_technique_ids))
+        if technique_ids:
+            technique_plan[child_id] = (technique_ids, increments.get(child_id) or 1)
+    return technique_plan
+
+
+def _queue_attendance_techniques(cur, academy_id, attendance_session_id, class_row, technique_plan,
+                                 staff_user_id):
+    return enqueue_job(
+        cur,
+        "apply_attendance_techniques",
+        {
+            "academy_id": academy_id,
+            "attendance_session_id": attendance_session_id,
+            "staff_user_id": staff_user_id,
+            "technique_plan": {
+                str(child_id): [ids, increment]
+                for child_id, (ids, increment) in technique_plan.items()
+            },
+        },
+        user_id=staff_user_id,
+        label=f"Apply techniques for {class_row['class_name']} {class_row['class_date']}",
+    )
+
+
+def _parse_sync_session(raw):
+    # Normalize one session queued by an offline device; returns (entry, error).
+    if not isinstance(raw, dict):
+        return None, "Malformed session."
+    client_id = str(raw.get("client_id") or "").strip()
+    if not CLIENT_ID_PATTERN.match(client_id):
+        return None, "Missing or invalid client_id."
+    entry = {"client_id": client_id}
+    try:
+        entry["offering_id"] = int(raw.get("offering_id"))
+    except (TypeError, ValueError):
+        return entry, "Missing class."
+    entry["action"] = raw.get("action") or "save_attendance"
+    if entry["action"] not in ("save_attendance", "close_and_apply"):
+        return entry, f"Unknown action {entry['action']!r}."
+
+    def id_set(values):
+        return {int(value) for value in (values if isinstance(values, list) else []) if str(value).isdigit()}
+
+    entry["present_child_ids"] = id_set(raw.get("present_child_ids"))
+    entry["bulk_technique_ids"] = id_set(raw.get("bulk_technique_ids"))
+    entry["student_technique_ids"] = {}
+    entry["increments"] = {}
+    students = raw.get("students") if isinstance(raw.get("students"), dict) else {}
+    for child_key, marks in students.items():
+        if not str(child_key).isdigit() or not isinstance(marks, dict):
+            continue
+        child_id = int(child_key)
+        entry["student_technique_ids"][child_id] = id_set(marks.get("technique_ids"))
+        increment = str(marks.get("increment") or "1")
+        entry["increments"][child_id] = max(1, min(int(increment) if increment.isdigit() else 1, LEARNED_TARGET))
+    return entry, None
+
+
+@traced
+def _sync_attendance_sessions(cur, academy_id, staff_user_id, entries):
+    # Record queued offline sessions on the caller's transaction; returns {client_id: result}.
+    # Sessions already recorded under the same client_id come back as duplicates. Each session
+    # is written under its own savepoint, so one that fails is rejected without losing the rest.
+    results = {}
+    if not entries:
+        return results
+    placeholders = ", ".join(["%s"] * len(entries))
+    cur.execute(
+        f"SELECT id, client_id FROM attendance_sessions WHERE academy_id = %s AND client_id IN ({placeholders})",
+        (academy_id, *[entry["client_id"] for entry in entries]),
+    )
+    for row in cur.fetchall():
+        results[row["client_id"]] = {"status": "duplicate", "session_id": row["id"]}
+    pending = []
+    for entry in entries:
+        if entry["client_id"] not in results:
+            results[entry["client_id"]] = None
+            pending.append(entry)
+    if not pending:
+        return results
+
+    offering_ids = sorted({entry["offering_id"] for entry in pending})
+    placeholders = ", ".join(["%s"] * len(offering_ids))
+    cur.execute(
+        f"""
+        SELECT id, class_name, class_date, start_time, end_time
+        FROM class_offerings
+        WHERE academy_id = %s AND id IN ({placeholders})
+        """,
+        (academy_id, *offering_ids),
+    )
+    offerings = {row["id"]: row for row in cur.fetchall()}
+    cur.execute(
+        f"SELECT offering_id, child_id FROM class_enrollments WHERE offering_id IN ({placeholders})",
+        tuple(offering_ids),
+    )
+    rosters = {}
+    for row in cur.fetchall():
+        rosters.setdefault(row["offering_id"], set()).add(row["child_id"])
+
+    accepted = []
+    for entry in pending:
+        client_id = entry["client_id"]
+        class_row = offerings.get(entry["offering_id"])
+        enrolled_ids = rosters.get(entry["offering_id"], set())
+        present_child_ids = entry["present_child_ids"] & enrolled_ids
+        if not class_row:
+            results[client_id] = {"status": "rejected", "error": "Class not found."}
+            continue
+        if not enrolled_ids:
+            results[client_id] = {"status": "rejected", "error": "No students are enrolled in this class."}
+            continue
+        technique_plan = {}
+        if entry["action"] == "close_and_apply":
+            if not present_child_ids:
+                results[client_id] = {
+                    "status": "rejected",
+                    "error": "No students were marked present to apply techniques.",
+                }
+                continue
+            technique_plan = _attendance_technique_plan(
+                present_child_ids,
+                entry["bulk_technique_ids"],
+                entry["student_technique_ids"],
+                entry["increments"],
+            )
+            if not technique_plan:
+                results[client_id] = {"status": "rejected", "error": NO_TECHNIQUES_APPLIED}
+                continue
+        accepted.append((entry, class_row, enrolled_ids, present_child_ids, technique_plan))
+
+    # Same split as the attendance form: small batches apply inline, large ones go to the workers.
+    entry_count = sum(
+        len(ids) for *_, technique_plan in accepted for ids, _ in technique_plan.values()
+    )
+    applied_inline = False
+    for entry, class_row, enrolled_ids, present_child_ids, technique_plan in accepted:
+        client_id = entry["client_id"]
+        cur.execute("SAVEPOINT sync_session")
+        try:
+            result = _record_synced_session(
+                cur, academy_id, staff_user_id, client_id, class_row, enrolled_ids, present_child_ids,
+                technique_plan, inline=entry_count <= INLINE_ATTENDANCE_ENTRY_LIMIT,
+            )
+        except Exception:
+            # A deadlock rolls back the whole transaction; rolling back to the savepoint then
+            # fails too and the batch is answered with an error for the device to retry.
+            cur.execute("ROLLBACK TO SAVEPOINT sync_session")
+            app.logger.exception("Could not record synced attendance session %s.", client_id)
+            results[client_id] = {"status": "rejected", "error": "The server could not record this session."}
+            continue
+        if result.get("technique_updates") == 0:
+            # Same rule as the attendance form: a close that applies nothing is not recorded.
+            cur.execute("ROLLBACK TO SAVEPOINT sync_session")
+            results[client_id] = {"status": "rejected", "error": NO_TECHNIQUES_APPLIED}
+            continue
+        cur.execute("RELEASE SAVEPOINT sync_session")
+        results[client_id] = result
+        applied_inline = applied_inline or "technique_updates" in result
+    if applied_inline:
+        enqueue_job(cur, "refresh_readiness", user_id=staff_user_id, label="Refresh test readiness")
+    return results
+
+
+def _record_synced_session(cur, academy_id, staff_user_id, client_id, class_row, enrolled_ids,
+                           present_child_ids, technique_plan, inline):
+    # Write one validated offline session with its roster and techniques; returns its sync result.
+    cur.execute(
+        """
+        INSERT IGNORE INTO attendance_sessions
+          (academy_id, offering_id, client_id, class_name, class_date, start_time, end_time, staff_user_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (
+            academy_id,
+            class_row["id"],
+            client_id,
+            class_row["class_name"],
+            class_row["class_date"],
+            class_row["start_time"],
+            class_row["end_time"],
+            staff_user_id,
+        ),
+    )
+    if not cur.rowcount:
+        # A concurrent sync of the same queue recorded it first.
+        cur.execute(
+            "SELECT id FROM attendance_sessions WHERE academy_id = %s AND client_id = %s",
+            (academy_id, client_id),
+        )
+        existing = cur.fetchone()
+        return {"status": "duplicate", "session_id": existing["id"] if existing else None}
+    attendance_session_id = cur.lastrowid
+    cur.executemany(
+        """
+        INSERT INTO attendance_students (attendance_session_id, child_id, is_present)
+        VALUES (%s, %s, %s)
+        """,
+        [
+            (attendance_session_id, child_id, 1 if child_id in present_child_ids else 0)
+            for child_id in sorted(enrolled_ids)
+        ],
+    )
+    result = {
+        "status": "recorded",
+        "session_id": attendance_session_id,
+        "present": len(present_child_ids),
+        "absent": len(enrolled_ids) - len(present_child_ids),
+    }
+    if technique_plan and inline:
+        result["technique_updates"] = _apply_attendance_techniques(
+            cur, academy_id, attendance_session_id, class_row, technique_plan, staff_user_id
+        )
+    elif technique_plan:
+        result["technique_job_id"] = _queue_attendance_techniques(
+            cur, academy_id, attendance_session_id, class_row, technique_plan, staff_user_id
+        )
+    return result
+
+
+def _parse_time_value(value):
+    try:
+        return datetime.strptime((value or "").strip(), "%H:%M").time()
+    except ValueError:
+        return None
+
+
+def _is_valid_time_window(start_time_value, end_time_value):
+    start_time = _parse_time_value(start_time_value)
+    end_time = _parse_time_value(end_time_value)
+    if not start_time or not end_time:
+        return False
+    return start_time < end_time
+
+
+def _assign_shift(cur, shift_id, employee_id):
+    # Hand a shift to whoever works it now: a covered shift changes its cover and keeps
+    # employee_user_id as the employee it was scheduled for.
+    cur.execute(
+        """
+        UPDATE shifts
+        SET employee_user_id = IF(coverage_status = 'covered', employee_user_id, %s),
+            covering_employee_id = IF(coverage_status = 'covered', %s, covering_employee_id)
+        WHERE id = %s AND academy_id = %s
+        """,
+        (employee_id, employee_id, shift_id, current_academy_id()),
+    )
+
+
+def _ensure_parent_notes_table(cur):
+    # Ensure parent notes table exists so note features work on existing databases.
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS parent_notes (
@@ -445,6 +1757,7 @@ def _ensure_parent_notes_table(cur):
     )
 
 
+@traced
 def _fetch_parent_notes_rows(cur, child_ids):
     # Return staff-authored notes to parents grouped by child id.
     if not child_ids:
@@ -475,6 +1788,109 @@ def _fetch_parent_notes_rows(cur, child_ids):
     return grouped
 
 
+@traced
+def _promote_eligible_students(cur, academy_id, promoted_by_user_id, program_track=None, offering_id=None,
+                               child_ids=None):
+    # Promote every student in the set who has learned all active techniques of their belt.
+    # Eligibility is one aggregate query; history rows and belt updates are set-based writes
+    # on the caller's transaction. Returns the promoted students.
+    batch_key = secrets.token_hex(16)
+    query = """
+        INSERT INTO belt_promotions
+          (academy_id, child_id, program_track, from_belt_index, to_belt_index, promoted_by_user_id, batch_key)
+        SELECT c.academy_id, c.id, c.program_track, c.belt_index, c.belt_index + 1, %s, %s
+        FROM children c
+        JOIN (
+            SELECT program_track, belt_index, COUNT(*) AS belt_total
+            FROM techniques
+            WHERE academy_id = %s AND is_active = 1
+            GROUP BY program_track, belt_index
+        ) bt ON bt.program_track = c.program_track AND bt.belt_index = c.belt_index
+        LEFT JOIN (
+            SELECT csp.child_id, t.program_track, t.belt_index, COUNT(DISTINCT csp.technique_id) AS learned_total
+            FROM child_skill_progress csp
+            JOIN techniques t ON t.id = csp.technique_id
+            WHERE t.academy_id = %s
+              AND (csp.learned_count >= %s OR csp.completed = 1)
+            GROUP BY csp.child_id, t.program_track, t.belt_index
+        ) lt ON lt.child_id = c.id AND lt.program_track = c.program_track AND lt.belt_index = c.belt_index
+        WHERE c.academy_id = %s
+          AND c.belt_index < %s
+          AND COALESCE(lt.learned_total, 0) >= bt.belt_total
+    """
+    params = (
+        promoted_by_user_id,
+        batch_key,
+        academy_id,
+        academy_id,
+        LEARNED_TARGET,
+        academy_id,
+        len(BELT_SEQUENCE) - 1,
+    )
+    if program_track:
+        query += " AND c.program_track = %s"
+        params += (program_track,)
+    if offering_id:
+        query += " AND c.id IN (SELECT child_id FROM class_enrollments WHERE offering_id = %s)"
+        params += (offering_id,)
+    if child_ids is not None:
+        if not child_ids:
+            return []
+        query += f" AND c.id IN ({', '.join(['%s'] * len(child_ids))})"
+        params += tuple(child_ids)
+    cur.execute(query, params)
+    if not cur.rowcount:
+        return []
+
+    cur.execute(
+        """
+        UPDATE children c
+        JOIN belt_promotions bp ON bp.child_id = c.id
+        SET c.belt_index = bp.to_belt_index
+        WHERE bp.batch_key = %s AND c.belt_index = bp.from_belt_index
+        """,
+        (batch_key,),
+    )
+    cur.execute(
+        """
+        SELECT bp.child_id, c.child_name, bp.program_track, bp.from_belt_index, bp.to_belt_index
+        FROM belt_promotions bp
+        JOIN children c ON c.id = bp.child_id
+        WHERE bp.batch_key = %s
+        ORDER BY c.child_name
+        """,
+        (batch_key,),
+    )
+    promoted = cur.fetchall()
+    for row in promoted:
+        row["from_belt"] = _belt_name_for_index(row["from_belt_index"])
+        row["to_belt"] = _belt_name_for_index(row["to_belt_index"])
+    return promoted
+
+
+@traced
+def _fetch_promotions_per_month(cur, academy_id, months=12):
+    # Monthly promotion counts from the history table, newest month first.
+    # First day of the oldest month shown: the current month plus the months - 1 before it.
+    since = shift_start("month", date.today(), -(months - 1))
+    cur.execute(
+        """
+        SELECT DATE_FORMAT(created_at, '%Y-%m') AS month, to_belt_index, COUNT(*) AS promotions
+        FROM belt_promotions
+        WHERE academy_id = %s AND created_at >= %s
+        GROUP BY month, to_belt_index
+        ORDER BY month DESC, to_belt_index
+        """,
+        (academy_id, since),
+    )
+    report = {}
+    for row in cur.fetchall():
+        month = report.setdefault(row["month"], {"month": row["month"], "promotions": 0, "by_belt": []})
+        month["promotions"] += int(row["promotions"])
+        month["by_belt"].append((_belt_name_for_index(row["to_belt_index"]), int(row["promotions"])))
+    return list(report.values())
+
+
 def hash_password(raw_password: str) -> str:
     # Store passwords as a prefixed SHA256 digest used across auth flows.
     digest = hashlib.sha256(raw_password.encode("utf-8")).hexdigest()
@@ -500,6 +1916,11 @@ def track_label_filter(value):
     return _track_label(value)
 
 
+@app.template_filter("belt_label")
+def belt_label_filter(value):
+    return _belt_name_for_index(value)
+
+
 @app.context_processor
 def inject_track_metadata():
     return {
@@ -508,6 +1929,270 @@ def inject_track_metadata():
     }
 
 
+@app.template_global("idempotency_key")
+def idempotency_key():
+    # A fresh key per rendered form; resubmitting the same form reuses it.
+    return secrets.token_hex(16)
+
+
+# -----------------------------
+# Background jobs
+# -----------------------------
+@job_handler("refresh_readiness")
+def _refresh_readiness_job(ctx, payload):
+    return refresh_readiness(
+        ctx.db, BELT_SEQUENCE, PROGRAM_TRACKS, LEARNED_TARGET, full=bool(payload.get("full")),
+        commit=ctx.commit,
+    )
+
+
+@job_handler("assign_instructors")
+def _assign_instructors_job(ctx, payload):
+    return _run_instructor_assignment(
+        ctx.db,
+        payload.get("academy_id", DEFAULT_ACADEMY_ID),
+        payload["run_id"],
+        date.fromisoformat(payload["month_start"]),
+        commit=ctx.commit,
+    )
+
+
+@job_handler("create_recurring_classes")
+def _create_recurring_classes_job(ctx, payload):
+    cur = ctx.db.cursor(dictionary=True)
+    try:
+        return _create_weekly_offerings(
+            cur,
+            payload.get("academy_id", DEFAULT_ACADEMY_ID),
+            payload["program_track"],
+            payload["class_name"],
+            date.fromisoformat(payload["start_day"]),
+            date.fromisoformat(payload["end_day"]),
+            payload["start_time"],
+            payload["end_time"],
+            payload.get("instructor_user_id"),
+            payload["created_by_user_id"],
+            progress=ctx.progress,
+            capacity=payload.get("capacity"),
+        )
+    finally:
+        cur.close()
+
+
+@job_handler("bulk_enroll")
+def _bulk_enroll_job(ctx, payload):
+    cur = ctx.db.cursor(dictionary=True)
+    try:
+        cur.execute(
+            "SELECT id, program_track, week_key FROM class_offerings WHERE id = %s AND academy_id = %s",
+            (payload["offering_id"], payload.get("academy_id", DEFAULT_ACADEMY_ID)),
+        )
+        offering = cur.fetchone()
+        if not offering:
+            raise ValueError(f"Class offering {payload['offering_id']} not found.")
+        added, waitlisted = _enroll_children(
+            cur,
+            offering,
+            payload["child_ids"],
+            payload["enrolled_by_user_id"],
+            progress=ctx.progress,
+        )
+        return {"added": added, "waitlisted": waitlisted}
+    finally:
+        cur.close()
+
+
+@job_handler("apply_attendance_techniques")
+def _apply_attendance_techniques_job(ctx, payload):
+    academy_id = payload.get("academy_id", DEFAULT_ACADEMY_ID)
+    cur = ctx.db.cursor(dictionary=True)
+    try:
+        cur.execute(
+            "SELECT id, class_name, class_date FROM attendance_sessions WHERE id = %s AND academy_id = %s",
+            (payload["attendance_session_id"], academy_id),
+        )
+        class_row = cur.fetchone()
+        if not class_row:
+            raise ValueError(f"Attendance session {payload['attendance_session_id']} not found.")
+        technique_plan = {
+            int(child_id): (technique_ids, increment)
+            for child_id, (technique_ids, increment) in payload["technique_plan"].items()
+        }
+        updates = _apply_attendance_techniques(
+            cur,
+            academy_id,
+            class_row["id"],
+            class_row,
+            technique_plan,
+            payload["staff_user_id"],
+            progress=ctx.progress,
+        )
+        enqueue_job(cur, "refresh_readiness", user_id=payload["staff_user_id"], label="Refresh test readiness")
+        return {"updates": updates}
+    finally:
+        cur.close()
+
+
+@maintenance_task
+def _purge_expired_idempotency_keys(db):
+    cur = db.cursor()
+    cur.execute(
+        "DELETE FROM idempotency_keys WHERE expires_at < CURRENT_TIMESTAMP LIMIT 1000"
+    )
+    cur.close()
+
+
+@maintenance_task
+def _purge_old_live_events(db):
+    cur = db.cursor()
+    cur.execute(
+        "DELETE FROM live_events WHERE created_at < CURRENT_TIMESTAMP - INTERVAL 10 MINUTE LIMIT 5000"
+    )
+    cur.close()
+
+
+@app.cli.command("refresh-readiness")
+@click.option("--full", is_flag=True, help="Rebuild learning stats from all attendance sessions.")
+@click.option("--academy", type=int, default=None, help="Academy whose database to refresh.")
+def refresh_readiness_command(full, academy):
+    """Fold new attendance into test-readiness predictions."""
+    db = connect_db(academy)
+    try:
+        result = refresh_readiness(db, BELT_SEQUENCE, PROGRAM_TRACKS, LEARNED_TARGET, full=full)
+    finally:
+        db.close()
+    click.echo(
+        f"Processed sessions through #{result['sessions_through']}: "
+        f"{result['children']} student(s), {result['rows']} progress row(s) updated."
+    )
+
+
+@app.cli.command("rebuild-progress")
+@click.option("--batch", default=500, show_default=True, help="Students replayed per transaction.")
+@click.option("--academy", type=int, default=None, help="Academy whose database to rebuild.")
+def rebuild_progress_command(batch, academy):
+    """Rebuild child_skill_progress by replaying the progress ledger."""
+    db = connect_db(academy)
+    try:
+        cur = db.cursor(dictionary=True)
+        _ensure_feature_schema(cur, academy or DEFAULT_ACADEMY_ID)
+        db.commit()
+        cur.close()
+        started = time.perf_counter()
+        result = rebuild_progress_projection(db, LEARNED_TARGET, batch_size=batch)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f"Replayed {result['events']} event(s) for {result['children']} student(s) in {elapsed:.2f}s: "
+        f"{result['rows']} progress row(s) written, {result['removed']} removed."
+    )
+
+
+@app.cli.command("jobs-worker")
+@click.option("--processes", default=os.cpu_count() or 1, show_default=True, help="Worker processes.")
+@click.option("--academy", type=int, default=None, help="Poll the database of a routed academy.")
+def jobs_worker_command(processes, academy):
+    """Run background job workers until interrupted."""
+    click.echo(f"Starting {processes} job worker process(es).")
+    run_worker_pool(processes, handler_module=__name__, academy_id=academy)
+
+
+# -----------------------------
+# Serving
+# -----------------------------
+def warm_up():
+    # Pay first-request costs before traffic arrives: migrations, template compilation, routing.
+    started = time.perf_counter()
+    # Academies on their own database instance are migrated alongside the default database.
+    for academy_id in [DEFAULT_ACADEMY_ID] + routed_academy_ids():
+        db = connect_db(academy_id)
+        try:
+            cur = db.cursor(dictionary=True)
+            _ensure_feature_schema(cur, academy_id)
+            _ensure_parent_notes_table(cur)
+            db.commit()
+            cur.close()
+        finally:
+            db.close()
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+    app.url_map.bind("localhost").match("/healthz")
+    app.config["WARM_UP_SECONDS"] = round(time.perf_counter() - started, 3)
+
+
+def warm_worker():
+    # Per-process warm-up after fork: open the connection pool and run one request end to end.
+    prime_pool()
+    with app.test_client() as client:
+        client.get("/readyz")
+
+
+def create_app(warm=True):
+    """Configure the app for production serving and optionally warm it up."""
+    app.config.update(
+        TEMPLATES_AUTO_RELOAD=False,
+        SESSION_COOKIE_HTTPONLY=True,
+        SESSION_COOKIE_SAMESITE="Lax",
+        SESSION_COOKIE_SECURE=os.getenv("SESSION_COOKIE_SECURE", "0") == "1",
+    )
+    app.jinja_env.auto_reload = False
+    if app.secret_key == "dev-change-me":
+        app.logger.warning("FLASK_SECRET_KEY is not set; sessions use the development key.")
+    if warm:
+        warm_up()
+    return app
+
+
+@app.route("/healthz")
+def healthz():
+    # Liveness: answers without touching the database.
+    return jsonify(
+        status="ok",
+        pid=os.getpid(),
+        schema_ready=database_route() in _feature_schema_routes,
+        pool=pool_status(),
+        warm_up_seconds=app.config.get("WARM_UP_SECONDS"),
+    )
+
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: the database must answer and the feature schema must be in place.
+    database_ok = False
+    error = None
+    try:
+        db = get_db()
+        cur = db.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchall()
+        cur.close()
+        database_ok = True
+    except Exception as exc:
+        error = str(exc)
+    schema_ready = database_route(current_academy_id()) in _feature_schema_routes
+    ready = database_ok and schema_ready
+    payload = {
+        "status": "ready" if ready else "not_ready",
+        "database": database_ok,
+        "schema_ready": schema_ready,
+        "pool": pool_status(),
+    }
+    if error:
+        payload["error"] = error
+    return jsonify(payload), 200 if ready else 503
+
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus scrape target; set METRICS_TOKEN to require `Authorization: Bearer <token>`.
+    token = os.getenv("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return Response("Unauthorized.", status=401)
+    body, content_type = latest_metrics()
+    return Response(body, content_type=content_type)
+
+
 # -----------------------------
 # Auth helpers
 # -----------------------------
@@ -538,6 +2223,99 @@ def role_required(*allowed_roles):
     return decorator
 
 
+@message_flashed.connect_via(app)
+def _record_idempotent_flash(sender, message, category, **extra):
+    flashed = g.get("idempotent_flashes")
+    if flashed is not None:
+        flashed.append((category, message))
+
+
+def _claim_idempotency_key(cur, key, scope):
+    # Insert the key on the request transaction so it commits or rolls back with the view's writes.
+    # A concurrent duplicate blocks on the row lock, then sees the committed original.
+    for _ in range(2):
+        try:
+            cur.execute(
+                """
+                INSERT INTO idempotency_keys (idem_key, user_id, scope, expires_at)
+                VALUES (%s, %s, %s, CURRENT_TIMESTAMP + INTERVAL %s HOUR)
+                """,
+                (key, session["user_id"], scope, IDEMPOTENCY_KEY_TTL_HOURS),
+            )
+            return None
+        except IntegrityError:
+            cur.execute(
+                """
+                SELECT user_id, scope, response_location, flashes, completed_at,
+                       expires_at <= CURRENT_TIMESTAMP AS expired
+                FROM idempotency_keys
+                WHERE idem_key = %s
+                """,
+                (key,),
+            )
+            existing = cur.fetchone()
+            if existing and not existing["expired"]:
+                return existing
+            cur.execute(
+                "DELETE FROM idempotency_keys WHERE idem_key = %s AND expires_at <= CURRENT_TIMESTAMP",
+                (key,),
+            )
+    return None
+
+
+def _replay_submission(existing, scope):
+    if existing["user_id"] != session["user_id"] or existing["scope"] != scope:
+        flash("This form can no longer be submitted. Please reload the page.", "error")
+        return redirect(request.path)
+    if existing["completed_at"] is None:
+        flash("This form was already submitted and is still being processed.", "error")
+        return redirect(request.referrer or request.path)
+    for category, message in json.loads(existing["flashes"] or "[]"):
+        flash(message, category)
+    return redirect(existing["response_location"] or request.path)
+
+
+def idempotent_submission(scope):
+    # Replay the stored redirect and flashes when a form's idempotency key was already used.
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            key = (request.form.get("idempotency_key") or "").strip().lower()
+            if request.method != "POST" or not IDEMPOTENCY_KEY_PATTERN.match(key):
+                return view(*args, **kwargs)
+
+            db = get_db()
+            cur = db.cursor(dictionary=True)
+            _ensure_feature_schema(cur)
+            existing = _claim_idempotency_key(cur, key, scope)
+            if existing is not None:
+                db.rollback()
+                cur.close()
+                return _replay_submission(existing, scope)
+
+            g.idempotent_flashes = []
+            response = app.make_response(view(*args, **kwargs))
+
+            # The key row survives only if the view committed, so failed submissions stay retryable.
+            db.rollback()
+            location = response.location if 300 <= response.status_code < 400 else None
+            cur.execute(
+                """
+                UPDATE idempotency_keys
+                SET response_location = %s, flashes = %s, completed_at = CURRENT_TIMESTAMP
+                WHERE idem_key = %s
+                """,
+                (location, json.dumps(g.pop("idempotent_flashes")), key),
+            )
+            db.commit()
+            cur.close()
+            return response
+
+        return wrapped
+
+    return decorator
+
+
 @app.route("/")
 def index():
     if "user_id" in session:
@@ -545,38 +2323,75 @@ def index():
     return redirect(url_for("login"))
 
 
+def _academy_choices():
+    # Locations offered at sign-in; the directory lives in the default database.
+    select_academy(DEFAULT_ACADEMY_ID)
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    cur.execute("SELECT id, academy_name FROM academies ORDER BY academy_name")
+    academies = cur.fetchall()
+    cur.close()
+    return academies
+
+
+def _select_form_academy(academies):
+    # Switch the request to the academy picked on the form; single-location installs show no picker.
+    try:
+        academy_id = int(request.form.get("academy_id") or DEFAULT_ACADEMY_ID)
+    except ValueError:
+        return None
+    if academy_id not in {academy["id"] for academy in academies}:
+        return None
+    select_academy(academy_id)
+    return academy_id
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     # Authenticate user and initialize session state.
+    academies = _academy_choices()
     if request.method == "POST":
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "")
+        academy_id = _select_form_academy(academies)
+        if academy_id is None:
+            flash("Choose a valid location.", "error")
+            return render_template("login.html", academies=academies)
 
         db = get_db()
         cur = db.cursor(dictionary=True)
+        _ensure_feature_schema(cur)
         cur.execute(
-            "SELECT id, username, password_hash, role FROM users WHERE LOWER(TRIM(username)) = LOWER(%s)",
-            (username,),
+            """
+            SELECT id, username, password_hash, role
+            FROM users
+            WHERE academy_id = %s
+              AND LOWER(TRIM(username)) = LOWER(%s)
+            """,
+            (academy_id, username),
         )
         user = cur.fetchone()
         cur.close()
 
         if not user or not verify_password(user["password_hash"], password):
             flash("Invalid username or password.", "error")
-            return render_template("login.html")
+            return render_template("login.html", academies=academies)
 
         session.clear()
         session["user_id"] = user["id"]
         session["username"] = user["username"]
         session["role"] = user["role"]
+        session["academy_id"] = academy_id
         return redirect(url_for("dashboard"))
 
-    return render_template("login.html")
+    return render_template("login.html", academies=academies)
 
 
 @app.route("/register", methods=["GET", "POST"])
 def register():
     # Create employee/parent accounts with validation and optional child record.
+    academies = _academy_choices()
     if request.method == "POST":
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "")
@@ -587,47 +2402,54 @@ def register():
 
         if len(username) < 3:
             flash("Username must be at least 3 characters.", "error")
-            return render_template("register.html")
+            return render_template("register.html", academies=academies)
 
         if len(password) < 6:
             flash("Password must be at least 6 characters.", "error")
-            return render_template("register.html")
+            return render_template("register.html", academies=academies)
 
         if password != confirm_password:
             flash("Passwords do not match.", "error")
-            return render_template("register.html")
+            return render_template("register.html", academies=academies)
 
         if role not in {"employee", "parent"}:
             flash("Invalid role selected.", "error")
-            return render_template("register.html")
+            return render_template("register.html", academies=academies)
 
         if role == "employee" and employee_access_password != "test":
             flash("Invalid employee access password.", "error")
-            return render_template("register.html")
+            return render_template("register.html", academies=academies)
 
         if role == "parent" and not child_name:
             flash("Parent registration requires a student name.", "error")
-            return render_template("register.html")
+            return render_template("register.html", academies=academies)
+
+        academy_id = _select_form_academy(academies)
+        if academy_id is None:
+            flash("Choose a valid location.", "error")
+            return render_template("register.html", academies=academies)
 
         db = get_db()
         cur = db.cursor(dictionary=True)
+        _ensure_feature_schema(cur)
+        # Usernames stay unique per database so sign-in never has to guess between accounts.
         cur.execute("SELECT id FROM users WHERE username = %s", (username,))
         existing = cur.fetchone()
         if existing:
             cur.close()
             flash("Username already exists. Choose a different username.", "error")
-            return render_template("register.html")
+            return render_template("register.html", academies=academies)
 
         cur.execute(
-            "INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s)",
-            (username, hash_password(password), role),
+            "INSERT INTO users (academy_id, username, password_hash, role) VALUES (%s, %s, %s, %s)",
+            (academy_id, username, hash_password(password), role),
         )
         user_id = cur.lastrowid
 
         if role == "parent":
             cur.execute(
-                "INSERT INTO children (child_name, parent_user_id) VALUES (%s, %s)",
-                (child_name, user_id),
+                "INSERT INTO children (academy_id, child_name, parent_user_id) VALUES (%s, %s, %s)",
+                (academy_id, child_name, user_id),
             )
 
         db.commit()
@@ -636,7 +2458,7 @@ def register():
         flash("Registration successful. Please login.", "success")
         return redirect(url_for("login"))
 
-    return render_template("register.html")
+    return render_template("register.html", academies=academies)
 
 
 @app.route("/logout")
@@ -665,6 +2487,78 @@ def dashboard():
 # -----------------------------
 # Employee views
 # -----------------------------
+def _employee_dashboard_queries(user_id, calendar_start):
+    # Independent reads behind the employee dashboard, shared by the sync and async views.
+    calendar_first, calendar_last = calendar_window("two_week", calendar_start)
+    return {
+        "my_shifts": (
+            """
+            SELECT s.id, s.shift_date, s.start_time, s.end_time, s.class_name, u.username AS assigned_to
+            FROM shifts s
+            JOIN users u ON u.id = COALESCE(s.covering_employee_id, s.employee_user_id)
+            WHERE s.academy_id = %s
+              AND COALESCE(s.covering_employee_id, s.employee_user_id) = %s
+              AND s.coverage_status <> 'called_out'
+            ORDER BY s.shift_date, s.start_time
+            """,
+            (current_academy_id(), user_id),
+        ),
+        "my_requests": (
+            """
+            SELECT r.id, r.request_type, r.status, r.reason, r.created_at,
+                   r.switch_target_status,
+                   s.shift_date, s.start_time, s.end_time, s.class_name,
+                   u.username AS requested_employee
+            FROM requests r
+            LEFT JOIN shifts s ON s.id = r.shift_id
+            LEFT JOIN users u ON u.id = r.requested_employee_id
+            WHERE r.requester_user_id = %s
+            ORDER BY r.created_at DESC
+            """,
+            (user_id,),
+        ),
+        "incoming_switch_requests": (
+            """
+            SELECT
+                r.id,
+                r.reason,
+                r.created_at,
+                req.username AS requester,
+                s.shift_date,
+                s.start_time,
+                s.end_time,
+                s.class_name
+            FROM requests r
+            JOIN users req ON req.id = r.requester_user_id
+            JOIN shifts s ON s.id = r.shift_id
+            WHERE r.request_type = 'switch'
+              AND r.requested_employee_id = %s
+              AND r.switch_target_status = 'pending'
+              AND r.status = 'pending'
+            ORDER BY r.created_at DESC
+            """,
+            (user_id,),
+        ),
+        "upcoming_shifts": shifts_query(current_academy_id(), calendar_first, calendar_last, employee_user_id=user_id),
+        "upcoming_classes": classes_query(
+            current_academy_id(), calendar_first, calendar_last, instructor_user_id=user_id
+        ),
+        "my_jobs": recent_jobs_query(user_id=user_id, limit=5),
+    }
+
+
+def _employee_dashboard_context(results, calendar_start):
+    return {
+        "my_shifts": results["my_shifts"],
+        "my_requests": results["my_requests"],
+        "incoming_switch_requests": results["incoming_switch_requests"],
+        "calendar_weeks": _build_calendar(
+            "two_week", calendar_start, results["upcoming_shifts"], results["upcoming_classes"]
+        ),
+        "my_jobs": decode_jobs(results["my_jobs"]),
+    }
+
+
 @app.route("/employee")
 @login_required
 @role_required("employee")
@@ -673,85 +2567,13 @@ def employee_dashboard():
     db = get_db()
     cur = db.cursor(dictionary=True)
     _ensure_feature_schema(cur)
-    cur.execute(
-        """
-        SELECT s.id, s.shift_date, s.start_time, s.end_time, s.class_name, u.username AS assigned_to
-        FROM shifts s
-        JOIN users u ON u.id = s.employee_user_id
-        WHERE s.employee_user_id = %s
-        ORDER BY s.shift_date, s.start_time
-        """,
-        (session["user_id"],),
-    )
-    my_shifts = cur.fetchall()
-
-    cur.execute(
-        """
-        SELECT r.id, r.request_type, r.status, r.reason, r.created_at,
-               r.switch_target_status,
-               s.shift_date, s.start_time, s.end_time, s.class_name,
-               u.username AS requested_employee
-        FROM requests r
-        LEFT JOIN shifts s ON s.id = r.shift_id
-        LEFT JOIN users u ON u.id = r.requested_employee_id
-        WHERE r.requester_user_id = %s
-        ORDER BY r.created_at DESC
-        """,
-        (session["user_id"],),
-    )
-    my_requests = cur.fetchall()
-
-    cur.execute(
-        """
-        SELECT
-            r.id,
-            r.reason,
-            r.created_at,
-            req.username AS requester,
-            s.shift_date,
-            s.start_time,
-            s.end_time,
-            s.class_name
-        FROM requests r
-        JOIN users req ON req.id = r.requester_user_id
-        JOIN shifts s ON s.id = r.shift_id
-        WHERE r.request_type = 'switch'
-          AND r.requested_employee_id = %s
-          AND r.switch_target_status = 'pending'
-          AND r.status = 'pending'
-        ORDER BY r.created_at DESC
-        """,
-        (session["user_id"],),
-    )
-    incoming_switch_requests = cur.fetchall()
-
-    calendar_start = date.today()
-    calendar_end = calendar_start + timedelta(days=13)
-    cur.execute(
-        """
-        SELECT
-            s.id,
-            s.shift_date,
-            s.class_name,
-            TIME_FORMAT(s.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(s.end_time, '%H:%i') AS end_label
-        FROM shifts s
-        WHERE s.employee_user_id = %s
-          AND s.shift_date BETWEEN %s AND %s
-        ORDER BY s.shift_date, s.start_time
-        """,
-        (session["user_id"], calendar_start, calendar_end),
-    )
-    upcoming_shifts = cur.fetchall()
-    calendar_weeks = _build_two_week_calendar(calendar_start, upcoming_shifts)
     cur.close()
 
+    calendar_start = date.today()
+    results = run_query_batch(_employee_dashboard_queries(session["user_id"], calendar_start))
     return render_template(
         "employee_dashboard.html",
-        my_shifts=my_shifts,
-        my_requests=my_requests,
-        incoming_switch_requests=incoming_switch_requests,
-        calendar_weeks=calendar_weeks,
+        **_employee_dashboard_context(results, calendar_start),
     )
 
 
@@ -766,10 +2588,12 @@ def employee_schedule():
         """
         SELECT s.shift_date, s.start_time, s.end_time, s.class_name
         FROM shifts s
-        WHERE s.employee_user_id = %s
+        WHERE s.academy_id = %s
+          AND COALESCE(s.covering_employee_id, s.employee_user_id) = %s
+          AND s.coverage_status <> 'called_out'
         ORDER BY s.shift_date, s.start_time
         """,
-        (session["user_id"],),
+        (current_academy_id(), session["user_id"]),
     )
     my_shifts = cur.fetchall()
     cur.close()
@@ -786,10 +2610,112 @@ def employee_progress():
 @app.route("/employee/attendance", methods=["GET", "POST"])
 @login_required
 @role_required("employee")
+@idempotent_submission("attendance")
 def employee_attendance():
     return _staff_attendance_screen("Attendance (Staff)")
 
 
+def _live_channel(name):
+    # Live update channels are per academy; user ids can repeat across routed databases.
+    return f"academy:{current_academy_id()}:{name}"
+
+
+def _request_queue_ops(row):
+    # Map a request's current state onto upsert/remove ops for each live queue that lists it.
+    pending = row["status"] == "pending"
+    managers = _live_channel("managers")
+    ops = []
+    if row["request_type"] == "switch":
+        if pending and row["switch_target_status"] == "accepted":
+            ops.append((managers, "pending_switches", "manager_switch_row"))
+        else:
+            ops.append((managers, "pending_switches", None))
+        if row["requested_employee_id"]:
+            target_channel = _live_channel(f"user:{row['requested_employee_id']}")
+            if pending and row["switch_target_status"] == "pending":
+                ops.append((target_channel, "incoming_switches", "incoming_switch_row"))
+            else:
+                ops.append((target_channel, "incoming_switches", None))
+    else:
+        ops.append((managers, "pending_callouts", "manager_callout_row" if pending else None))
+        ops.append((managers, "recent_callouts", "recent_callout_row"))
+    ops.append((_live_channel(f"user:{row['requester_user_id']}"), "my_requests", "my_request_row"))
+
+    by_channel = {}
+    for channel, queue_name, macro in ops:
+        op = {"queue": queue_name, "id": row["id"], "action": "upsert" if macro else "remove"}
+        if macro:
+            op["html"] = str(get_template_attribute("_request_rows.html", macro)(row))
+        by_channel.setdefault(channel, []).append(op)
+    return by_channel
+
+
+def _publish_request_update(db, request_id):
+    # Push the committed state of one request to open dashboards; a failed push never fails the write.
+    try:
+        cur = db.cursor(dictionary=True)
+        cur.execute(
+            """
+            SELECT r.id, r.request_type, r.status, r.reason, r.created_at, r.shift_id,
+                   r.switch_target_status, r.requester_user_id, r.requested_employee_id,
+                   req.username AS requester,
+                   target.username AS requested_employee,
+                   s.shift_date, s.start_time, s.end_time, s.class_name, s.coverage_status
+            FROM requests r
+            JOIN users req ON req.id = r.requester_user_id
+            LEFT JOIN users target ON target.id = r.requested_employee_id
+            LEFT JOIN shifts s ON s.id = r.shift_id
+            WHERE r.id = %s
+              AND req.academy_id = %s
+            """,
+            (request_id, current_academy_id()),
+        )
+        row = cur.fetchone()
+        cur.close()
+        if not row:
+            return
+        get_event_bus().publish(
+            db,
+            [(channel, "queue", {"ops": ops}) for channel, ops in _request_queue_ops(row).items()],
+        )
+    except Exception:
+        app.logger.exception("Could not publish live update for request %s.", request_id)
+
+
+def _live_stream_channels():
+    # Channels the signed-in user's stream subscribes to; None for roles without live updates.
+    role = session.get("role")
+    if role == "manager":
+        return [_live_channel("managers")]
+    if role == "employee":
+        return [_live_channel(f"user:{session['user_id']}")]
+    return None
+
+
+@app.route("/events/stream")
+@login_required
+def events_stream():
+    # Server-Sent Events feed of request queue changes for the signed-in manager or employee.
+    # asgi.py serves this route on its event loop; this threaded version is capped per worker.
+    channels = _live_stream_channels()
+    if channels is None:
+        # 204 tells EventSource to stop reconnecting.
+        return Response(status=204)
+
+    bus = get_event_bus()
+    slot = bus.reserve_stream(MAX_STREAMS)
+    if slot is None:
+        return Response("Too many live streams.", status=503, headers={"Retry-After": "30"})
+    response = Response(
+        stream_events(bus, channels, academy_id=current_academy_id(), slot=slot),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Frees the slot even when the client is gone before the stream is first iterated.
+    response.call_on_close(slot.release)
+    return response
+
+
 @app.route("/employee/request-switch", methods=["GET", "POST"])
 @login_required
 @role_required("employee")
@@ -804,8 +2730,13 @@ def request_switch():
         reason = request.form.get("reason", "").strip()
 
         cur.execute(
-            "SELECT id FROM shifts WHERE id = %s AND employee_user_id = %s",
-            (shift_id, session["user_id"]),
+            """
+            SELECT id FROM shifts
+            WHERE id = %s AND academy_id = %s
+              AND COALESCE(covering_employee_id, employee_user_id) = %s
+              AND coverage_status <> 'called_out'
+            """,
+            (shift_id, current_academy_id(), session["user_id"]),
         )
         owned_shift = cur.fetchone()
         if not owned_shift:
@@ -813,6 +2744,15 @@ def request_switch():
             cur.close()
             return redirect(url_for("request_switch"))
 
+        cur.execute(
+            "SELECT id FROM users WHERE id = %s AND academy_id = %s AND role = 'employee'",
+            (requested_employee_id, current_academy_id()),
+        )
+        if not cur.fetchone():
+            flash("Choose an employee at your location.", "error")
+            cur.close()
+            return redirect(url_for("request_switch"))
+
         cur.execute(
             """
             INSERT INTO requests (request_type, requester_user_id, shift_id, requested_employee_id, reason, status, switch_target_status)
@@ -820,8 +2760,10 @@ def request_switch():
             """,
             (session["user_id"], shift_id, requested_employee_id, reason),
         )
+        new_request_id = cur.lastrowid
         db.commit()
         cur.close()
+        _publish_request_update(db, new_request_id)
 
         flash("Shift switch request submitted.", "success")
         return redirect(url_for("employee_dashboard"))
@@ -830,10 +2772,12 @@ def request_switch():
         """
         SELECT id, shift_date, start_time, end_time, class_name
         FROM shifts
-        WHERE employee_user_id = %s AND shift_date >= %s
+        WHERE academy_id = %s AND shift_date >= %s
+          AND COALESCE(covering_employee_id, employee_user_id) = %s
+          AND coverage_status <> 'called_out'
         ORDER BY shift_date, start_time
         """,
-        (session["user_id"], date.today()),
+        (current_academy_id(), date.today(), session["user_id"]),
     )
     my_upcoming_shifts = cur.fetchall()
     shift_ids = {row["id"] for row in my_upcoming_shifts}
@@ -848,8 +2792,13 @@ def request_switch():
                 break
 
     cur.execute(
-        "SELECT id, username FROM users WHERE role = 'employee' AND id != %s ORDER BY username",
-        (session["user_id"],),
+        """
+        SELECT id, username
+        FROM users
+        WHERE academy_id = %s AND role = 'employee' AND id != %s
+        ORDER BY username
+        """,
+        (current_academy_id(), session["user_id"]),
     )
     employees = cur.fetchall()
     cur.close()
@@ -875,8 +2824,13 @@ def request_callout():
         reason = request.form.get("reason", "").strip()
 
         cur.execute(
-            "SELECT id FROM shifts WHERE id = %s AND employee_user_id = %s",
-            (shift_id, session["user_id"]),
+            """
+            SELECT id FROM shifts
+            WHERE id = %s AND academy_id = %s
+              AND COALESCE(covering_employee_id, employee_user_id) = %s
+              AND coverage_status <> 'called_out'
+            """,
+            (shift_id, current_academy_id(), session["user_id"]),
         )
         owned_shift = cur.fetchone()
         if not owned_shift:
@@ -891,8 +2845,10 @@ def request_callout():
             """,
             (session["user_id"], shift_id, reason),
         )
+        new_request_id = cur.lastrowid
         db.commit()
         cur.close()
+        _publish_request_update(db, new_request_id)
 
         flash("Call-out request submitted.", "success")
         return redirect(url_for("employee_dashboard"))
@@ -901,10 +2857,12 @@ def request_callout():
         """
         SELECT id, shift_date, start_time, end_time, class_name
         FROM shifts
-        WHERE employee_user_id = %s AND shift_date >= %s
+        WHERE academy_id = %s AND shift_date >= %s
+          AND COALESCE(covering_employee_id, employee_user_id) = %s
+          AND coverage_status <> 'called_out'
         ORDER BY shift_date, start_time
         """,
-        (session["user_id"], date.today()),
+        (current_academy_id(), date.today(), session["user_id"]),
     )
     my_upcoming_shifts = cur.fetchall()
     shift_ids = {row["id"] for row in my_upcoming_shifts}
@@ -985,6 +2943,7 @@ def respond_switch_request(request_id, action):
         flash("You rejected the shift takeover request.", "info")
 
     cur.close()
+    _publish_request_update(db, request_id)
     return redirect(url_for("employee_dashboard"))
 
 
@@ -1001,8 +2960,8 @@ def _staff_progress_screen(page_title):
         if action == "promote_belt":
             child_id = request.form.get("child_id", type=int)
             cur.execute(
-                "SELECT id, belt_index, program_track FROM children WHERE id = %s",
-                (child_id,),
+                "SELECT id, belt_index, program_track FROM children WHERE id = %s AND academy_id = %s",
+                (child_id, current_academy_id()),
             )
             child = cur.fetchone()
             if not child:
@@ -1010,33 +2969,63 @@ def _staff_progress_screen(page_title):
                 cur.close()
                 return redirect(request.path)
 
-            belt_index = int(child.get("belt_index") or 0)
-            track = _normalize_track(child.get("program_track"))
-            current_belt = _belt_name_for_index(belt_index)
-            learned_total, belt_total = _get_child_belt_progress(
-                cur, child_id, track, current_belt
-            )
-            if belt_total == 0 or learned_total < belt_total:
-                flash("Student has not completed all techniques for this belt.", "error")
-                cur.close()
-                return redirect(request.path)
-            if belt_index >= len(BELT_SEQUENCE) - 1:
-                flash("Student is already at the final belt.", "info")
+            if not _promote_eligible_students(
+                cur, current_academy_id(), session["user_id"], child_ids=[child_id]
+            ):
+                db.rollback()
+                if int(child.get("belt_index") or 0) >= len(BELT_SEQUENCE) - 1:
+                    flash("Student is already at the final belt.", "info")
+                else:
+                    flash("Student has not completed all techniques for this belt.", "error")
                 cur.close()
                 return redirect(request.path)
-
-            cur.execute(
-                "UPDATE children SET belt_index = %s WHERE id = %s",
-                (belt_index + 1, child_id),
-            )
             db.commit()
             flash("Student promoted to next belt.", "success")
 
+        elif action == "promote_eligible":
+            program_track = request.form.get("program_track", "").strip()
+            if program_track and program_track not in PROGRAM_TRACKS:
+                flash("Please choose a valid track.", "error")
+                cur.close()
+                return redirect(request.path)
+            offering_id = request.form.get("offering_id", type=int)
+            if offering_id:
+                cur.execute(
+                    "SELECT id FROM class_offerings WHERE id = %s AND academy_id = %s",
+                    (offering_id, current_academy_id()),
+                )
+                if not cur.fetchone():
+                    flash("Class not found.", "error")
+                    cur.close()
+                    return redirect(request.path)
+            try:
+                promoted = _promote_eligible_students(
+                    cur,
+                    current_academy_id(),
+                    session["user_id"],
+                    program_track=program_track or None,
+                    offering_id=offering_id,
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                flash("Promotions could not be saved; no students were promoted.", "error")
+                cur.close()
+                return redirect(request.path)
+            if promoted:
+                names = ", ".join(f"{row['child_name']} ({row['to_belt']})" for row in promoted)
+                flash(f"Promoted {len(promoted)} student(s): {names}.", "success")
+            else:
+                flash("No students in that group are eligible for promotion.", "info")
+
         elif action == "send_parent_note":
             child_id = request.form.get("child_id", type=int)
             parent_note = request.form.get("parent_note", "").strip()
 
-            cur.execute("SELECT id FROM children WHERE id = %s", (child_id,))
+            cur.execute(
+                "SELECT id FROM children WHERE id = %s AND academy_id = %s",
+                (child_id, current_academy_id()),
+            )
             child = cur.fetchone()
             if not child or not parent_note:
                 flash("Please choose a valid student and write a note.", "error")
@@ -1062,8 +3051,10 @@ def _staff_progress_screen(page_title):
         """
         SELECT id, child_name, program_track, belt_index
         FROM children
+        WHERE academy_id = %s
         ORDER BY child_name
-        """
+        """,
+        (current_academy_id(),),
     )
     children = cur.fetchall()
     for child in children:
@@ -1073,15 +3064,29 @@ def _staff_progress_screen(page_title):
     # Keep full technique list for row edits.
     cur.execute(
         """
-        SELECT id, technique_name, is_active, program_track, belt_name
+        SELECT id, technique_name, is_active, program_track, belt_index
         FROM techniques
-        ORDER BY program_track, belt_name, technique_name
-        """
+        WHERE academy_id = %s
+        ORDER BY program_track, belt_index, technique_name
+        """,
+        (current_academy_id(),),
     )
     all_techniques = cur.fetchall()
     child_summary = _fetch_child_progress_summary(cur)
     child_progress_rows = _fetch_child_progress_rows(cur, [c["id"] for c in child_summary])
     child_parent_notes = _fetch_parent_notes_rows(cur, [c["id"] for c in child_summary])
+    cur.execute(
+        """
+        SELECT id, class_name, class_date, program_track
+        FROM class_offerings
+        WHERE academy_id = %s
+          AND class_date BETWEEN %s AND %s
+        ORDER BY class_date, start_time, class_name
+        """,
+        (current_academy_id(), date.today() - timedelta(days=14), date.today() + timedelta(days=14)),
+    )
+    promotion_classes = cur.fetchall()
+    promotions_per_month = _fetch_promotions_per_month(cur, current_academy_id())
     cur.close()
     return render_template(
         "progress_screen.html",
@@ -1092,6 +3097,8 @@ def _staff_progress_screen(page_title):
         child_summary=child_summary,
         child_progress_rows=child_progress_rows,
         child_parent_notes=child_parent_notes,
+        promotion_classes=promotion_classes,
+        promotions_per_month=promotions_per_month,
     )
 
 
@@ -1130,9 +3137,9 @@ def _staff_attendance_screen(page_title):
             """
             SELECT id, class_name, class_date, start_time, end_time
             FROM class_offerings
-            WHERE id = %s
+            WHERE id = %s AND academy_id = %s
             """,
-            (offering_id,),
+            (offering_id, current_academy_id()),
         )
         class_row = cur.fetchone()
         if not class_row:
@@ -1157,10 +3164,11 @@ def _staff_attendance_screen(page_title):
         cur.execute(
             """
             INSERT INTO attendance_sessions
-              (offering_id, class_name, class_date, start_time, end_time, staff_user_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
+              (academy_id, offering_id, class_name, class_date, start_time, end_time, staff_user_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
             """,
             (
+                current_academy_id(),
                 offering_id,
                 class_row["class_name"],
                 class_row["class_date"],
@@ -1193,47 +3201,56 @@ def _staff_attendance_screen(page_title):
                 for value in request.form.getlist("bulk_technique_ids")
                 if (value or "").isdigit()
             }
-            updates = 0
-            for child_id in present_child_ids:
-                per_student_technique_ids = {
-                    int(value)
-                    for value in request.form.getlist(f"technique_ids_{child_id}")
-                    if (value or "").isdigit()
-                }
-                technique_ids = sorted(per_student_technique_ids.union(bulk_technique_ids))
-                learned_increment = request.form.get(
-                    f"learned_increment_{child_id}",
-                    type=int,
-                ) or 1
-                for technique_id in technique_ids:
-                    if _apply_learning_entry(
-                        cur,
-                        child_id,
-                        technique_id,
-                        session["user_id"],
-                        increment=learned_increment,
-                        notes_text=f"Attendance: {class_row['class_name']} {class_row['class_date']}",
-                    ):
-                        cur.execute(
-                            """
-                            INSERT INTO attendance_technique_logs
-                              (attendance_session_id, child_id, technique_id, learned_increment)
-                            VALUES (%s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE learned_increment = VALUES(learned_increment)
-                            """,
-                            (
-                                attendance_session_id,
-                                child_id,
-                                technique_id,
-                                learned_increment,
-                            ),
-                        )
-                        updates += 1
+            technique_plan = _attendance_technique_plan(
+                present_child_ids,
+                bulk_technique_ids,
+                {
+                    child_id: {
+                        int(value)
+                        for value in request.form.getlist(f"technique_ids_{child_id}")
+                        if (value or "").isdigit()
+                    }
+                    for child_id in present_child_ids
+                },
+                {
+                    child_id: request.form.get(f"learned_increment_{child_id}", type=int)
+                    for child_id in present_child_ids
+                },
+            )
+
+            entry_count = sum(len(ids) for ids, _ in technique_plan.values())
+            if entry_count > INLINE_ATTENDANCE_ENTRY_LIMIT:
+                # Attendance rows are committed now; technique increments follow in a job.
+                job_id = _queue_attendance_techniques(
+                    cur,
+                    current_academy_id(),
+                    attendance_session_id,
+                    class_row,
+                    technique_plan,
+                    session["user_id"],
+                )
+                db.commit()
+                cur.close()
+                flash(
+                    f"Attendance saved. {entry_count} technique updates are being applied in the background (job #{job_id}).",
+                    "success",
+                )
+                return redirect(url_for("attendance_summary", session_id=attendance_session_id))
+
+            updates = _apply_attendance_techniques(
+                cur,
+                current_academy_id(),
+                attendance_session_id,
+                class_row,
+                technique_plan,
+                session["user_id"],
+            )
             if updates == 0:
-                flash("No per-student techniques were selected to apply.", "error")
+                flash(NO_TECHNIQUES_APPLIED, "error")
                 db.rollback()
                 cur.close()
                 return redirect(url_for(attendance_endpoint, class_ref=class_ref))
+            enqueue_job(cur, "refresh_readiness", user_id=session["user_id"], label="Refresh test readiness")
             db.commit()
             cur.close()
             return redirect(
@@ -1264,14 +3281,13 @@ def _staff_attendance_screen(page_title):
             co.class_date,
             TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
             TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
-            COUNT(ce.id) AS enrolled_count
+            co.enrolled_count
         FROM class_offerings co
-        LEFT JOIN class_enrollments ce ON ce.offering_id = co.id
-        WHERE co.class_date >= %s
-        GROUP BY co.id, co.program_track, co.class_name, co.class_date, co.start_time, co.end_time
+        WHERE co.academy_id = %s
+          AND co.class_date >= %s
         ORDER BY co.class_date, co.start_time, co.class_name
         """,
-        (date.today(),),
+        (current_academy_id(), date.today()),
     )
     current_classes = cur.fetchall()
     if not selected_class_ref and current_classes:
@@ -1283,28 +3299,39 @@ def _staff_attendance_screen(page_title):
     if selected_offering_id:
         cur.execute(
             """
-            SELECT id, program_track, class_name, class_date,
+            SELECT id, program_track, class_name, class_date, start_time,
                    TIME_FORMAT(start_time, '%H:%i') AS start_label,
                    TIME_FORMAT(end_time, '%H:%i') AS end_label
             FROM class_offerings
-            WHERE id = %s
+            WHERE id = %s AND academy_id = %s
             """,
-            (selected_offering_id,),
+            (selected_offering_id, current_academy_id()),
         )
         selected_class_info = cur.fetchone()
         if selected_class_info:
             selected_class_info["program_track"] = _normalize_track(
                 selected_class_info.get("program_track")
             )
+            previous_id, next_id = neighbouring_offerings(
+                cur,
+                current_academy_id(),
+                selected_class_info["class_date"],
+                selected_class_info["start_time"],
+                selected_class_info["id"],
+                on_lookup=lambda hit: record_cache("class_schedule", hit),
+            )
+            selected_class_info["previous_class_ref"] = f"offering:{previous_id}" if previous_id else None
+            selected_class_info["next_class_ref"] = f"offering:{next_id}" if next_id else None
         cur.execute(
             """
             SELECT c.id, c.child_name, c.program_track, c.belt_index
             FROM class_enrollments ce
             JOIN children c ON c.id = ce.child_id
             WHERE ce.offering_id = %s
+              AND c.academy_id = %s
             ORDER BY c.child_name
             """,
-            (selected_offering_id,),
+            (selected_offering_id, current_academy_id()),
         )
         child_summary = cur.fetchall()
         for child in child_summary:
@@ -1313,36 +3340,57 @@ def _staff_attendance_screen(page_title):
             belt_index = max(0, min(belt_index, len(BELT_SEQUENCE) - 1))
             current_belt = _belt_name_for_index(belt_index)
             completed_skills, total_skills = _get_child_belt_progress(
-                cur, child["id"], track, current_belt
+                cur, child["id"], track, belt_index
             )
             child["program_track"] = track
+            child["belt_index"] = belt_index
             child["current_belt"] = current_belt
             child["belt_progress_count"] = completed_skills
             child["total_skills"] = total_skills
 
     if selected_class_info and selected_class_info.get("program_track"):
+        # Every technique up to the highest belt on the roster: one range scan on
+        # idx_techniques_academy_track_belt. Rows only offer their own belt's techniques.
+        roster_belt = max(
+            (int(child.get("belt_index") or 0) for child in child_summary), default=len(BELT_SEQUENCE) - 1
+        )
         cur.execute(
             """
-            SELECT id, technique_name, program_track, belt_name
+            SELECT id, technique_name, program_track, belt_index
             FROM techniques
-            WHERE is_active = 1
+            WHERE academy_id = %s
               AND program_track = %s
-            ORDER BY belt_name, technique_name
+              AND belt_index <= %s
+              AND is_active = 1
+            ORDER BY belt_index, technique_name
             """,
-            (selected_class_info["program_track"],),
+            (current_academy_id(), selected_class_info["program_track"], roster_belt),
         )
     else:
         cur.execute(
             """
-            SELECT id, technique_name, program_track, belt_name
+            SELECT id, technique_name, program_track, belt_index
             FROM techniques
-            WHERE is_active = 1
-            ORDER BY program_track, belt_name, technique_name
-            """
+            WHERE academy_id = %s
+              AND is_active = 1
+            ORDER BY program_track, belt_index, technique_name
+            """,
+            (current_academy_id(),),
         )
     active_techniques = cur.fetchall()
     cur.close()
 
+    # Kept on the device so sessions queued while offline can be named in the pending message.
+    offline_roster = None
+    if selected_class_info:
+        offline_roster = {
+            "offering_id": selected_class_info["id"],
+            "label": (
+                f"{selected_class_info['class_date']} {selected_class_info['start_label']}-"
+                f"{selected_class_info['end_label']} {selected_class_info['class_name']}"
+            ),
+        }
+
     return render_template(
         "attendance.html",
         page_title=page_title,
@@ -1351,6 +3399,7 @@ def _staff_attendance_screen(page_title):
         selected_class_info=selected_class_info,
         roster_students=child_summary,
         active_techniques=active_techniques,
+        offline_roster=offline_roster,
         belt_sequence=BELT_SEQUENCE,
         program_tracks=PROGRAM_TRACKS,
     )
@@ -1359,6 +3408,108 @@ def _staff_attendance_screen(page_title):
 # -----------------------------
 # Manager views
 # -----------------------------
+def _manager_dashboard_queries(calendar_start):
+    # Independent reads behind the manager dashboard, shared by the sync and async views.
+    calendar_first, calendar_last = calendar_window("two_week", calendar_start)
+    academy_id = current_academy_id()
+    return {
+        "all_shifts": (
+            """
+            SELECT s.id, s.shift_date, s.start_time, s.end_time, s.class_name, u.username AS employee
+            FROM shifts s
+            JOIN users u ON u.id = COALESCE(s.covering_employee_id, s.employee_user_id)
+            WHERE s.academy_id = %s
+            ORDER BY s.shift_date, s.start_time
+            """,
+            (academy_id,),
+        ),
+        "pending_switch_requests": (
+            """
+            SELECT r.id, r.status, r.reason, r.created_at,
+                   req.username AS requester,
+                   target.username AS requested_employee,
+                   s.shift_date, s.start_time, s.end_time, s.class_name
+            FROM requests r
+            JOIN users req ON req.id = r.requester_user_id
+            LEFT JOIN users target ON target.id = r.requested_employee_id
+            LEFT JOIN shifts s ON s.id = r.shift_id
+            WHERE r.request_type = 'switch'
+              AND r.status = 'pending'
+              AND r.switch_target_status = 'accepted'
+              AND req.academy_id = %s
+            ORDER BY r.created_at ASC
+            """,
+            (academy_id,),
+        ),
+        "pending_callout_requests": (
+            """
+            SELECT r.id, r.status, r.reason, r.created_at,
+                   req.username AS requester,
+                   s.shift_date, s.start_time, s.end_time, s.class_name
+            FROM requests r
+            JOIN users req ON req.id = r.requester_user_id
+            LEFT JOIN shifts s ON s.id = r.shift_id
+            WHERE r.request_type = 'callout'
+              AND r.status = 'pending'
+              AND req.academy_id = %s
+            ORDER BY r.created_at ASC
+            """,
+            (academy_id,),
+        ),
+        "recent_callouts": (
+            """
+            SELECT r.id, r.status, r.reason, r.created_at, r.shift_id,
+                   req.username AS requester,
+                   s.shift_date, s.start_time, s.end_time, s.class_name, s.coverage_status
+            FROM requests r
+            JOIN users req ON req.id = r.requester_user_id
+            LEFT JOIN shifts s ON s.id = r.shift_id
+            WHERE r.request_type = 'callout'
+              AND req.academy_id = %s
+            ORDER BY r.created_at DESC
+            LIMIT 25
+            """,
+            (academy_id,),
+        ),
+        "upcoming_shifts": shifts_query(academy_id, calendar_first, calendar_last),
+        "upcoming_classes": classes_query(academy_id, calendar_first, calendar_last),
+        # Range read on idx_shifts_coverage_date.
+        "uncovered_shifts": (
+            """
+            SELECT
+                s.id,
+                s.shift_date,
+                s.class_name,
+                u.username AS employee,
+                TIME_FORMAT(s.start_time, '%H:%i') AS start_label,
+                TIME_FORMAT(s.end_time, '%H:%i') AS end_label
+            FROM shifts s
+            JOIN users u ON u.id = s.employee_user_id
+            WHERE s.coverage_status = 'called_out'
+              AND s.shift_date BETWEEN %s AND %s
+              AND s.academy_id = %s
+            ORDER BY s.shift_date, s.start_time
+            """,
+            (*iso_week_bounds(calendar_start), academy_id),
+        ),
+        "recent_jobs": recent_jobs_query(academy_id=academy_id),
+    }
+
+
+def _manager_dashboard_context(results, calendar_start):
+    return {
+        "all_shifts": results["all_shifts"],
+        "pending_switch_requests": results["pending_switch_requests"],
+        "pending_callout_requests": results["pending_callout_requests"],
+        "recent_callouts": results["recent_callouts"],
+        "uncovered_shifts": results["uncovered_shifts"],
+        "calendar_weeks": _build_calendar(
+            "two_week", calendar_start, results["upcoming_shifts"], results["upcoming_classes"]
+        ),
+        "recent_jobs": decode_jobs(results["recent_jobs"]),
+    }
+
+
 @app.route("/manager")
 @login_required
 @role_required("manager")
@@ -1367,121 +3518,173 @@ def manager_dashboard():
     db = get_db()
     cur = db.cursor(dictionary=True)
     _ensure_feature_schema(cur)
+    cur.close()
 
-    cur.execute(
-        """
-        SELECT s.id, s.shift_date, s.start_time, s.end_time, s.class_name, u.username AS employee
-        FROM shifts s
-        JOIN users u ON u.id = s.employee_user_id
-        ORDER BY s.shift_date, s.start_time
-        """
+    calendar_start = date.today()
+    results = run_query_batch(_manager_dashboard_queries(calendar_start))
+    return render_template(
+        "manager_dashboard.html",
+        **_manager_dashboard_context(results, calendar_start),
     )
-    all_shifts = cur.fetchall()
 
-    cur.execute(
-        """
-        SELECT r.id, r.status, r.reason, r.created_at,
-               req.username AS requester,
-               target.username AS requested_employee,
-               s.shift_date, s.start_time, s.end_time, s.class_name
-        FROM requests r
-        JOIN users req ON req.id = r.requester_user_id
-        LEFT JOIN users target ON target.id = r.requested_employee_id
-        LEFT JOIN shifts s ON s.id = r.shift_id
-        WHERE r.request_type = 'switch'
-          AND r.status = 'pending'
-          AND r.switch_target_status = 'accepted'
-        ORDER BY r.created_at ASC
-        """
-    )
-    pending_switch_requests = cur.fetchall()
 
-    cur.execute(
-        """
-        SELECT r.id, r.status, r.reason, r.created_at,
-               req.username AS requester,
-               s.shift_date, s.start_time, s.end_time, s.class_name
-        FROM requests r
-        JOIN users req ON req.id = r.requester_user_id
-        LEFT JOIN shifts s ON s.id = r.shift_id
-        WHERE r.request_type = 'callout'
-          AND r.status = 'pending'
-        ORDER BY r.created_at ASC
-        """
-    )
-    pending_callout_requests = cur.fetchall()
+def _parse_report_day(raw_value, default):
+    try:
+        return datetime.strptime(raw_value or "", "%Y-%m-%d").date()
+    except ValueError:
+        return default
 
-    cur.execute(
-        """
-        SELECT r.id, r.status, r.reason, r.created_at,
-               req.username AS requester,
-               s.shift_date, s.start_time, s.end_time, s.class_name
-        FROM requests r
-        JOIN users req ON req.id = r.requester_user_id
-        LEFT JOIN shifts s ON s.id = r.shift_id
-        WHERE r.request_type = 'callout'
-        ORDER BY r.created_at DESC
-        LIMIT 25
-        """
-    )
-    recent_callouts = cur.fetchall()
 
-    calendar_start = date.today()
-    calendar_end = calendar_start + timedelta(days=13)
-    cur.execute(
-        """
-        SELECT
-            s.id,
-            s.shift_date,
-            s.class_name,
-            u.username AS employee,
-            TIME_FORMAT(s.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(s.end_time, '%H:%i') AS end_label
-        FROM shifts s
-        JOIN users u ON u.id = s.employee_user_id
-        WHERE s.shift_date BETWEEN %s AND %s
-        ORDER BY s.shift_date, s.start_time
-        """,
-        (calendar_start, calendar_end),
+@app.route("/manager/attendance/analytics")
+@login_required
+@role_required("manager")
+def manager_attendance_analytics():
+    # Attendance rollups for a date range, cached until another session is closed.
+    end_date = _parse_report_day(request.args.get("end"), date.today())
+    start_date = _parse_report_day(request.args.get("start"), end_date - timedelta(days=89))
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    program_track = request.args.get("track", "").strip()
+    if program_track not in PROGRAM_TRACKS:
+        program_track = ""
+
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    cur.close()
+    cur = db.cursor()
+    analytics = attendance_analytics(
+        cur,
+        current_academy_id(),
+        start_date,
+        end_date,
+        program_track or None,
+        on_lookup=lambda hit: record_cache("attendance_analytics", hit),
     )
-    upcoming_shifts = cur.fetchall()
-    calendar_weeks = _build_two_week_calendar(calendar_start, upcoming_shifts)
     cur.close()
+    return render_template("attendance_analytics.html", analytics=analytics, selected_track=program_track)
 
-    return render_template(
-        "manager_dashboard.html",
-        all_shifts=all_shifts,
-        pending_switch_requests=pending_switch_requests,
-        pending_callout_requests=pending_callout_requests,
-        recent_callouts=recent_callouts,
-        calendar_weeks=calendar_weeks,
+
+@app.route("/manager/reports/instructor-hours")
+@login_required
+@role_required("manager")
+def instructor_hours_report():
+    # Scheduled vs worked hours per employee per ISO week; ?format=csv or json (default).
+    end_date = _parse_report_day(request.args.get("end"), date.today())
+    start_date = _parse_report_day(request.args.get("start"), end_date - timedelta(weeks=8))
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    weeks = weeks_between(start_date, end_date)
+    if len(weeks) > INSTRUCTOR_HOURS_MAX_WEEKS:
+        return jsonify({"error": f"Choose at most {INSTRUCTOR_HOURS_MAX_WEEKS} weeks."}), 400
+    output = request.args.get("format", "json")
+    if output not in ("csv", "json"):
+        return jsonify({"error": "format must be csv or json."}), 400
+
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    cur.close()
+    academy_id = current_academy_id()
+    rebuilt = refresh_week_hours(db, academy_id, weeks, PROGRAM_TRACKS)
+    rows = week_hours_rows(db, academy_id, weeks[0], weeks[-1], PROGRAM_TRACKS)
+    columns = (
+        ["iso_week", "week_start", "employee_user_id", "employee"]
+        + list(HOUR_COLUMNS)
+        + [f"teaching_{track}_hours" for track in PROGRAM_TRACKS]
+        + ["teaching_hours", "utilization"]
     )
 
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+            if buffer.tell() > 8192:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_json():
+        yield '{{"start": "{}", "end": "{}", "weeks_rebuilt": {}, "rows": ['.format(
+            weeks[0].isoformat(), (weeks[-1] + timedelta(days=6)).isoformat(), rebuilt
+        )
+        for position, row in enumerate(rows):
+            record = {column: row[column] for column in columns}
+            yield ("," if position else "") + json.dumps(record, default=_json_number)
+        yield "]}"
+
+    if output == "csv":
+        filename = f"instructor-hours-{weeks[0].isoformat()}.csv"
+        return Response(
+            stream_with_context(generate_csv()),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+    return Response(stream_with_context(generate_json()), mimetype="application/json")
+
+
+def _json_number(value):
+    # DECIMAL columns arrive as Decimal; dates as date.
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return float(value)
+
+
+@app.route("/manager/profiles")
+@login_required
+@role_required("manager")
+def manager_profiles():
+    # Recent request profiles, captured on demand (X-Profile: 1 / ?_profile=1) or by sampling.
+    return render_template("profiles.html", profiles=list_profiles())
+
+
+@app.route("/manager/profiles/<name>.prof")
+@login_required
+@role_required("manager")
+def download_profile(name):
+    if not PROFILE_NAME_PATTERN.match(name):
+        flash("Profile not found.", "error")
+        return redirect(url_for("manager_profiles"))
+    return send_from_directory(profile_dir(), f"{name}.prof", as_attachment=True)
+
 
 @app.route("/manager/schedule", methods=["GET", "POST"])
 @login_required
 @role_required("manager")
 def manager_schedule():
-    # Calendar editor for next 14 days with shift assignment and creation.
+    # Week, two-week or month calendar editor with shift assignment and creation.
     db = get_db()
     cur = db.cursor(dictionary=True)
 
-    calendar_start = date.today()
-    calendar_end = calendar_start + timedelta(days=13)
+    view = request.values.get("view", "two_week").strip()
+    if view not in CALENDAR_VIEWS:
+        view = "two_week"
+    try:
+        calendar_start = datetime.strptime(request.values.get("start", "").strip(), "%Y-%m-%d").date()
+    except ValueError:
+        calendar_start = date.today()
+    calendar_start = normalize_start(view, calendar_start)
+    calendar_first, calendar_last = calendar_window(view, calendar_start)
+    default_day = date.today() if calendar_first <= date.today() <= calendar_last else calendar_start
 
     def parse_selected_day(raw_value):
         if not raw_value:
-            return calendar_start
+            return default_day
         try:
             parsed = datetime.strptime(raw_value, "%Y-%m-%d").date()
         except ValueError:
-            return calendar_start
-        if parsed < calendar_start or parsed > calendar_end:
-            return calendar_start
+            return default_day
+        if parsed < calendar_first or parsed > calendar_last:
+            return default_day
         return parsed
 
     def schedule_redirect(day_value):
-        return redirect(url_for("manager_schedule", day=day_value.isoformat()))
+        return redirect(
+            url_for("manager_schedule", view=view, start=calendar_start.isoformat(), day=day_value.isoformat())
+        )
 
     if request.method == "POST":
         action = request.form.get("action", "").strip()
@@ -1504,14 +3707,20 @@ def manager_schedule():
                 cur.close()
                 return schedule_redirect(selected_day)
 
-            cur.execute("SELECT id FROM shifts WHERE id = %s", (shift_id,))
+            cur.execute(
+                "SELECT id, shift_date FROM shifts WHERE id = %s AND academy_id = %s",
+                (shift_id, current_academy_id()),
+            )
             shift = cur.fetchone()
             if not shift:
                 flash("Shift not found.", "error")
                 cur.close()
                 return schedule_redirect(selected_day)
 
-            cur.execute("SELECT id FROM users WHERE id = %s AND role = 'employee'", (employee_id,))
+            cur.execute(
+                "SELECT id FROM users WHERE id = %s AND academy_id = %s AND role = 'employee'",
+                (employee_id, current_academy_id()),
+            )
             employee = cur.fetchone()
             if not employee:
                 flash("Employee not found.", "error")
@@ -1522,13 +3731,15 @@ def manager_schedule():
                 """
                 SELECT id
                 FROM shifts
-                WHERE employee_user_id = %s
+                WHERE academy_id = %s
                   AND shift_date = %s
+                  AND COALESCE(covering_employee_id, employee_user_id) = %s
+                  AND coverage_status <> 'called_out'
                   AND id != %s
                   AND NOT (end_time <= %s OR start_time >= %s)
                 LIMIT 1
                 """,
-                (employee_id, selected_day, shift_id, start_time, end_time),
+                (current_academy_id(), selected_day, employee_id, shift_id, start_time, end_time),
             )
             overlap = cur.fetchone()
             if overlap:
@@ -1539,14 +3750,15 @@ def manager_schedule():
             cur.execute(
                 """
                 UPDATE shifts
-                SET employee_user_id = %s,
-                    start_time = %s,
+                SET start_time = %s,
                     end_time = %s,
                     class_name = %s
-                WHERE id = %s
+                WHERE id = %s AND academy_id = %s
                 """,
-                (employee_id, start_time, end_time, class_name, shift_id),
+                (start_time, end_time, class_name, shift_id, current_academy_id()),
             )
+            _assign_shift(cur, shift_id, employee_id)
+            mark_weeks_dirty(cur, current_academy_id(), [shift["shift_date"]])
             db.commit()
             flash("Shift updated.", "success")
             cur.close()
@@ -1569,7 +3781,10 @@ def manager_schedule():
                 cur.close()
                 return schedule_redirect(selected_day)
 
-            cur.execute("SELECT id FROM users WHERE id = %s AND role = 'employee'", (employee_id,))
+            cur.execute(
+                "SELECT id FROM users WHERE id = %s AND academy_id = %s AND role = 'employee'",
+                (employee_id, current_academy_id()),
+            )
             employee = cur.fetchone()
             if not employee:
                 flash("Employee not found.", "error")
@@ -1580,12 +3795,14 @@ def manager_schedule():
                 """
                 SELECT id
                 FROM shifts
-                WHERE employee_user_id = %s
+                WHERE academy_id = %s
                   AND shift_date = %s
+                  AND COALESCE(covering_employee_id, employee_user_id) = %s
+                  AND coverage_status <> 'called_out'
                   AND NOT (end_time <= %s OR start_time >= %s)
                 LIMIT 1
                 """,
-                (employee_id, shift_date, start_time, end_time),
+                (current_academy_id(), shift_date, employee_id, start_time, end_time),
             )
             overlap = cur.fetchone()
             if overlap:
@@ -1595,11 +3812,12 @@ def manager_schedule():
 
             cur.execute(
                 """
-                INSERT INTO shifts (employee_user_id, shift_date, start_time, end_time, class_name)
-                VALUES (%s, %s, %s, %s, %s)
+                INSERT INTO shifts (academy_id, employee_user_id, shift_date, start_time, end_time, class_name)
+                VALUES (%s, %s, %s, %s, %s, %s)
                 """,
-                (employee_id, shift_date, start_time, end_time, class_name),
+                (current_academy_id(), employee_id, shift_date, start_time, end_time, class_name),
             )
+            mark_weeks_dirty(cur, current_academy_id(), [selected_day])
             db.commit()
             flash("Shift created.", "success")
             cur.close()
@@ -1612,33 +3830,19 @@ def manager_schedule():
     selected_day = parse_selected_day(request.args.get("day", "").strip())
 
     cur.execute(
-        "SELECT id, username FROM users WHERE role = 'employee' ORDER BY username"
+        "SELECT id, username FROM users WHERE academy_id = %s AND role = 'employee' ORDER BY username",
+        (current_academy_id(),),
     )
     employees = cur.fetchall()
 
-    cur.execute(
-        """
-        SELECT
-            s.id,
-            s.employee_user_id,
-            s.shift_date,
-            s.start_time,
-            s.end_time,
-            s.class_name,
-            TIME_FORMAT(s.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(s.end_time, '%H:%i') AS end_label,
-            u.username AS employee
-        FROM shifts s
-        JOIN users u ON u.id = s.employee_user_id
-        WHERE s.shift_date BETWEEN %s AND %s
-        ORDER BY s.shift_date, s.start_time
-        """,
-        (calendar_start, calendar_end),
-    )
+    # One range read per source covers every day of the window, month views included.
+    cur.execute(*shifts_query(current_academy_id(), calendar_first, calendar_last))
     shifts = cur.fetchall()
+    cur.execute(*classes_query(current_academy_id(), calendar_first, calendar_last))
+    classes = cur.fetchall()
     cur.close()
 
-    calendar_weeks = _build_two_week_calendar(calendar_start, shifts)
+    calendar_weeks = _build_calendar(view, calendar_start, shifts, classes)
     selected_day_key = selected_day.isoformat()
     selected_day_shifts = []
     for week in calendar_weeks:
@@ -1650,6 +3854,11 @@ def manager_schedule():
     return render_template(
         "manager_schedule.html",
         calendar_weeks=calendar_weeks,
+        calendar_view=view,
+        calendar_views=CALENDAR_VIEWS,
+        calendar_start=calendar_start,
+        previous_start=shift_start(view, calendar_start, -1),
+        next_start=shift_start(view, calendar_start, 1),
         employees=employees,
         selected_day=selected_day,
         selected_day_shifts=selected_day_shifts,
@@ -1667,6 +3876,7 @@ def manager_progress():
 @app.route("/manager/attendance", methods=["GET", "POST"])
 @login_required
 @role_required("manager")
+@idempotent_submission("attendance")
 def manager_attendance():
     return _staff_attendance_screen("Attendance (Manager)")
 
@@ -1674,6 +3884,7 @@ def manager_attendance():
 @app.route("/manager/enroll", methods=["GET", "POST"])
 @login_required
 @role_required("manager")
+@idempotent_submission("enroll")
 def manager_enroll():
     # Manager enrollment of students into class rosters.
     db = get_db()
@@ -1697,8 +3908,8 @@ def manager_enroll():
                 return redirect(url_for("manager_enroll"))
 
             cur.execute(
-                "SELECT id FROM users WHERE id = %s AND role = 'parent'",
-                (parent_user_id,),
+                "SELECT id FROM users WHERE id = %s AND academy_id = %s AND role = 'parent'",
+                (parent_user_id, current_academy_id()),
             )
             parent_user = cur.fetchone()
             if not parent_user:
@@ -1709,10 +3920,12 @@ def manager_enroll():
             cur.execute(
                 """
                 INSERT INTO children
-                  (child_name, parent_user_id, program_track, belt_index, guardian_name, contact_phone)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                  (academy_id, child_name, parent_user_id, program_track, belt_index, guardian_name,
+                   contact_phone)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """,
                 (
+                    current_academy_id(),
                     child_name,
                     parent_user_id,
                     program_track,
@@ -1723,8 +3936,38 @@ def manager_enroll():
             )
             db.commit()
             cur.close()
-            flash("Student profile created.", "success")
-            return redirect(url_for("manager_enroll"))
+            flash("Student profile created.", "success")
+            return redirect(url_for("manager_enroll"))
+
+        if action == "remove_student":
+            offering_id = request.form.get("offering_id", type=int)
+            child_id = request.form.get("child_id", type=int)
+            cur.execute(
+                """
+                SELECT id, program_track, week_key
+                FROM class_offerings
+                WHERE id = %s AND academy_id = %s
+                """,
+                (offering_id, current_academy_id()),
+            )
+            offering = cur.fetchone()
+            if not offering:
+                flash("Class not found.", "error")
+                cur.close()
+                return redirect(url_for("manager_enroll"))
+            removed_from, promoted = _withdraw_from_class(cur, offering, child_id)
+            db.commit()
+            cur.close()
+            if removed_from == "enrolled":
+                message = "Student removed from class roster."
+                if promoted:
+                    message += f" {len(promoted)} student(s) moved up from the waitlist."
+                flash(message, "success")
+            elif removed_from == "waitlisted":
+                flash("Student removed from the waitlist.", "success")
+            else:
+                flash("Student is not on this class roster.", "error")
+            return redirect(url_for("manager_enroll", offering_id=offering_id))
 
         offering_id = request.form.get("offering_id", type=int)
         child_ids = [
@@ -1743,11 +3986,11 @@ def manager_enroll():
 
         cur.execute(
             """
-            SELECT id, program_track
+            SELECT id, program_track, week_key
             FROM class_offerings
-            WHERE id = %s
+            WHERE id = %s AND academy_id = %s
             """,
-            (offering_id,),
+            (offering_id, current_academy_id()),
         )
         offering = cur.fetchone()
         if not offering:
@@ -1755,27 +3998,43 @@ def manager_enroll():
             cur.close()
             return redirect(url_for("manager_enroll"))
 
-        added = 0
-        for child_id in child_ids:
-            cur.execute(
-                """
-                INSERT IGNORE INTO class_enrollments (offering_id, child_id, enrolled_by_user_id)
-                VALUES (%s, %s, %s)
-                """,
-                (offering_id, child_id, session["user_id"]),
-            )
-            added += cur.rowcount
-            cur.execute(
-                "UPDATE children SET program_track = %s WHERE id = %s",
-                (offering["program_track"], child_id),
+        placeholders = ", ".join(["%s"] * len(child_ids))
+        cur.execute(
+            f"SELECT id FROM children WHERE academy_id = %s AND id IN ({placeholders})",
+            (current_academy_id(), *child_ids),
+        )
+        local_ids = {row["id"] for row in cur.fetchall()}
+        child_ids = [child_id for child_id in child_ids if child_id in local_ids]
+
+        if len(child_ids) > INLINE_BULK_LIMIT:
+            job_id = enqueue_job(
+                cur,
+                "bulk_enroll",
+                {
+                    "academy_id": current_academy_id(),
+                    "offering_id": offering_id,
+                    "child_ids": child_ids,
+                    "enrolled_by_user_id": session["user_id"],
+                },
+                user_id=session["user_id"],
+                label=f"Enroll {len(child_ids)} students in class #{offering_id}",
             )
+            db.commit()
+            flash(f"Enrolling {len(child_ids)} students in the background (job #{job_id}).", "success")
+            cur.close()
+            return redirect(url_for("manager_enroll", offering_id=offering_id))
 
+        added, waitlisted = _enroll_children(cur, offering, child_ids, session["user_id"])
         db.commit()
-        flash(f"Added {added} student(s) to class roster.", "success")
+        message = f"Added {added} student(s) to class roster."
+        if waitlisted:
+            message += f" The class is full; {waitlisted} student(s) were added to the waitlist."
+        flash(message, "success")
         cur.close()
         return redirect(url_for("manager_enroll", offering_id=offering_id))
 
     selected_offering_id = request.args.get("offering_id", type=int)
+    # Roster counts come from the stored seat counter, so one listing serves both tables.
     cur.execute(
         """
         SELECT
@@ -1784,18 +4043,22 @@ def manager_enroll():
             co.class_name,
             co.class_date,
             TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(co.end_time, '%H:%i') AS end_label
+            TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
+            co.enrolled_count,
+            co.capacity
         FROM class_offerings co
-        WHERE co.class_date >= %s
+        WHERE co.academy_id = %s
+          AND co.class_date >= %s
         ORDER BY co.class_date, co.start_time
         """,
-        (date.today(),),
+        (current_academy_id(), date.today()),
     )
     offerings = cur.fetchall()
     if not selected_offering_id and offerings:
         selected_offering_id = offerings[0]["id"]
 
     selected_roster = []
+    selected_waitlist = []
     if selected_offering_id:
         cur.execute(
             """
@@ -1803,22 +4066,37 @@ def manager_enroll():
             FROM class_enrollments ce
             JOIN children c ON c.id = ce.child_id
             WHERE ce.offering_id = %s
+              AND c.academy_id = %s
             ORDER BY c.child_name
             """,
-            (selected_offering_id,),
+            (selected_offering_id, current_academy_id()),
         )
         selected_roster = cur.fetchall()
         for child in selected_roster:
             child["program_track"] = _normalize_track(child.get("program_track"))
             child["current_belt"] = _belt_name_for_index(child.get("belt_index"))
+        cur.execute(
+            """
+            SELECT c.id, c.child_name, c.program_track, cw.created_at AS waitlisted_at
+            FROM class_waitlist cw
+            JOIN children c ON c.id = cw.child_id
+            WHERE cw.offering_id = %s
+              AND c.academy_id = %s
+            ORDER BY cw.id
+            """,
+            (selected_offering_id, current_academy_id()),
+        )
+        selected_waitlist = cur.fetchall()
 
     cur.execute(
         """
         SELECT c.id, c.child_name, c.program_track, c.belt_index, u.username AS parent_username
         FROM children c
         JOIN users u ON u.id = c.parent_user_id
+        WHERE c.academy_id = %s
         ORDER BY c.child_name
-        """
+        """,
+        (current_academy_id(),),
     )
     all_students = cur.fetchall()
     for child in all_students:
@@ -1827,40 +4105,22 @@ def manager_enroll():
 
     enrolled_ids = {child["id"] for child in selected_roster}
     cur.execute(
-        "SELECT id, username FROM users WHERE role = 'parent' ORDER BY username"
+        "SELECT id, username FROM users WHERE academy_id = %s AND role = 'parent' ORDER BY username",
+        (current_academy_id(),),
     )
     parent_accounts = cur.fetchall()
-    cur.execute(
-        """
-        SELECT
-            co.id,
-            co.program_track,
-            co.class_name,
-            co.class_date,
-            TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
-            COUNT(ce.id) AS enrolled_count
-        FROM class_offerings co
-        LEFT JOIN class_enrollments ce ON ce.offering_id = co.id
-        WHERE co.class_date >= %s
-        GROUP BY co.id, co.program_track, co.class_name, co.class_date, co.start_time, co.end_time
-        ORDER BY co.class_date, co.start_time
-        """
-        ,
-        (date.today(),),
-    )
-    class_roster_counts = cur.fetchall()
     cur.close()
     return render_template(
         "manager_enroll.html",
         offerings=offerings,
         selected_offering_id=selected_offering_id,
         selected_roster=selected_roster,
+        selected_waitlist=selected_waitlist,
         all_students=all_students,
         parent_accounts=parent_accounts,
         belt_sequence=BELT_SEQUENCE,
         enrolled_ids=enrolled_ids,
-        class_roster_counts=class_roster_counts,
+        class_roster_counts=offerings,
     )
 
 
@@ -1884,6 +4144,7 @@ def manager_classes():
         instructor_user_id = request.form.get("instructor_user_id", type=int)
         is_recurring_weekly = request.form.get("is_recurring_weekly") == "on"
         recurrence_end_date = request.form.get("recurrence_end_date", "").strip()
+        capacity = request.form.get("capacity", type=int)
 
         if not (class_name and class_date and start_time and end_time):
             flash("Class name, date, and time are required.", "error")
@@ -1897,6 +4158,10 @@ def manager_classes():
             flash("Please provide an end date for weekly recurring classes.", "error")
             cur.close()
             return redirect(url_for("manager_classes"))
+        if capacity is not None and capacity < 1:
+            flash("Capacity must be at least 1 (leave it blank for no limit).", "error")
+            cur.close()
+            return redirect(url_for("manager_classes"))
 
         try:
             start_day = datetime.strptime(class_date, "%Y-%m-%d").date()
@@ -1923,85 +4188,66 @@ def manager_classes():
             flash("Cannot create class offerings in the past.", "error")
             cur.close()
             return redirect(url_for("manager_classes"))
-
-        inserted_count = 0
-        skipped_count = 0
-        day_cursor = start_day
-        while day_cursor <= end_day:
+        if instructor_user_id:
             cur.execute(
-                """
-                SELECT id
-                FROM class_offerings
-                WHERE class_name = %s
-                  AND program_track = %s
-                  AND class_date = %s
-                  AND start_time = %s
-                  AND end_time = %s
-                  AND (instructor_user_id <=> %s)
-                LIMIT 1
-                """,
-                (class_name, program_track, day_cursor, start_time, end_time, instructor_user_id),
+                "SELECT id FROM users WHERE id = %s AND academy_id = %s AND role = 'employee'",
+                (instructor_user_id, current_academy_id()),
             )
-            exists = cur.fetchone()
-            if exists:
-                skipped_count += 1
-            else:
-                if instructor_user_id:
-                    cur.execute(
-                        """
-                        SELECT id
-                        FROM class_offerings
-                        WHERE instructor_user_id = %s
-                          AND class_date = %s
-                          AND NOT (end_time <= %s OR start_time >= %s)
-                        LIMIT 1
-                        """,
-                        (instructor_user_id, day_cursor, start_time, end_time),
-                    )
-                    overlapping = cur.fetchone()
-                    if overlapping:
-                        skipped_count += 1
-                        if is_recurring_weekly:
-                            day_cursor += timedelta(days=7)
-                            continue
-                        flash("Instructor already has an overlapping class at that time.", "error")
-                        cur.close()
-                        return redirect(url_for("manager_classes"))
-                cur.execute(
-                    """
-                    INSERT INTO class_offerings
-                      (program_track, class_name, class_date, start_time, end_time, instructor_user_id, created_by_user_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        program_track,
-                        class_name,
-                        day_cursor,
-                        start_time,
-                        end_time,
-                        instructor_user_id,
-                        session["user_id"],
-                    ),
-                )
-                inserted_count += 1
-
-            if not is_recurring_weekly:
-                break
-            day_cursor += timedelta(days=7)
+            if not cur.fetchone():
+                flash("Instructor not found.", "error")
+                cur.close()
+                return redirect(url_for("manager_classes"))
 
-        db.commit()
         if is_recurring_weekly:
-            flash(
-                f"Recurring classes added: {inserted_count}. Skipped duplicates: {skipped_count}.",
-                "success",
+            job_id = enqueue_job(
+                cur,
+                "create_recurring_classes",
+                {
+                    "academy_id": current_academy_id(),
+                    "program_track": program_track,
+                    "class_name": class_name,
+                    "start_day": start_day.isoformat(),
+                    "end_day": end_day.isoformat(),
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "instructor_user_id": instructor_user_id,
+                    "created_by_user_id": session["user_id"],
+                    "capacity": capacity,
+                },
+                user_id=session["user_id"],
+                label=f"Weekly {class_name} until {end_day.isoformat()}",
             )
-        else:
-            flash("Class offering added.", "success")
+            db.commit()
+            cur.close()
+            flash(f"Recurring classes are being created in the background (job #{job_id}).", "success")
+            return redirect(url_for("manager_classes"))
+
+        counts = _create_weekly_offerings(
+            cur,
+            current_academy_id(),
+            program_track,
+            class_name,
+            start_day,
+            end_day,
+            start_time,
+            end_time,
+            instructor_user_id,
+            session["user_id"],
+            capacity=capacity,
+        )
+        if counts["overlaps"]:
+            db.rollback()
+            flash("Instructor already has an overlapping class at that time.", "error")
+            cur.close()
+            return redirect(url_for("manager_classes"))
+        db.commit()
+        flash("Class offering added.", "success")
         cur.close()
         return redirect(url_for("manager_classes"))
 
     cur.execute(
-        "SELECT id, username FROM users WHERE role = 'employee' ORDER BY username"
+        "SELECT id, username FROM users WHERE academy_id = %s AND role = 'employee' ORDER BY username",
+        (current_academy_id(),),
     )
     employees = cur.fetchall()
     cur.execute(
@@ -2013,20 +4259,158 @@ def manager_classes():
             co.class_date,
             TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
             TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
+            co.enrolled_count,
+            co.capacity,
             u.username AS instructor_name
         FROM class_offerings co
         LEFT JOIN users u ON u.id = co.instructor_user_id
+        WHERE co.academy_id = %s
         ORDER BY co.class_date, co.start_time
-        """
+        """,
+        (current_academy_id(),),
     )
     offerings = cur.fetchall()
+    cur.execute(
+        """
+        SELECT id, month_start, status, score, summary, created_at, finished_at
+        FROM instructor_assignment_runs
+        WHERE academy_id = %s
+        ORDER BY id DESC
+        LIMIT 10
+        """,
+        (current_academy_id(),),
+    )
+    assignment_runs = cur.fetchall()
+    for run in assignment_runs:
+        run["summary"] = json.loads(run["summary"]) if run.get("summary") else {}
     cur.close()
     return render_template(
         "manager_classes.html",
         employees=employees,
         offerings=offerings,
         selected_track=current_track,
+        assignment_runs=assignment_runs,
+    )
+
+
+@app.route("/manager/classes/<int:offering_id>/capacity", methods=["POST"])
+@login_required
+@role_required("manager")
+def update_class_capacity(offering_id):
+    # Change a class's seat limit; raising it moves waitlisted students into the new seats.
+    raw_capacity = request.form.get("capacity", "").strip()
+    capacity = int(raw_capacity) if raw_capacity.isdigit() else None
+    if raw_capacity and not capacity:
+        flash("Capacity must be at least 1 (leave it blank for no limit).", "error")
+        return redirect(url_for("manager_classes"))
+
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    cur.execute(
+        """
+        SELECT id, program_track, week_key
+        FROM class_offerings
+        WHERE id = %s AND academy_id = %s
+        FOR UPDATE
+        """,
+        (offering_id, current_academy_id()),
+    )
+    offering = cur.fetchone()
+    if not offering:
+        db.rollback()
+        cur.close()
+        flash("Class not found.", "error")
+        return redirect(url_for("manager_classes"))
+    cur.execute("UPDATE class_offerings SET capacity = %s WHERE id = %s", (capacity, offering_id))
+    promoted = _promote_waitlist(cur, offering)
+    db.commit()
+    cur.close()
+
+    message = "Class capacity updated."
+    if promoted:
+        message += f" {len(promoted)} student(s) moved up from the waitlist."
+    flash(message, "success")
+    return redirect(url_for("manager_classes"))
+
+
+@app.route("/manager/classes/auto-assign", methods=["POST"])
+@login_required
+@role_required("manager")
+def auto_assign_instructors():
+    # Queue a background solver run that fills unassigned instructors for one month.
+    try:
+        month_start = datetime.strptime(request.form.get("month", "").strip(), "%Y-%m").date()
+    except ValueError:
+        flash("Please choose a valid month.", "error")
+        return redirect(url_for("manager_classes"))
+
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    cur.execute(
+        """
+        INSERT INTO instructor_assignment_runs (academy_id, month_start, status, created_by_user_id)
+        VALUES (%s, %s, 'queued', %s)
+        """,
+        (current_academy_id(), month_start, session["user_id"]),
     )
+    run_id = cur.lastrowid
+    enqueue_job(
+        cur,
+        "assign_instructors",
+        {"academy_id": current_academy_id(), "run_id": run_id, "month_start": month_start.isoformat()},
+        user_id=session["user_id"],
+        label=f"Auto-assign instructors for {month_start.strftime('%Y-%m')}",
+        max_attempts=1,
+    )
+    db.commit()
+    cur.close()
+
+    flash("Instructor auto-assignment queued. Refresh to see the result.", "success")
+    return redirect(url_for("manager_classes"))
+
+
+def _techniques_filter(args):
+    selected_track = _normalize_track(args.get("track", "kids_martial_arts"))
+    requested_belt = (args.get("belt", BELT_SEQUENCE[0]) or "").strip()
+    selected_belt = requested_belt if requested_belt in BELT_SEQUENCE else BELT_SEQUENCE[0]
+    return selected_track, selected_belt
+
+
+def _techniques_queries(selected_track, selected_belt):
+    return {
+        "technique_list": (
+            """
+            SELECT
+                t.id,
+                t.technique_name,
+                t.description,
+                t.is_active,
+                t.created_at,
+                t.program_track,
+                t.belt_index,
+                u.username AS created_by
+            FROM techniques t
+            LEFT JOIN users u ON u.id = t.created_by_user_id
+            WHERE t.academy_id = %s
+              AND t.program_track = %s
+              AND t.belt_index = %s
+            ORDER BY t.technique_name
+            """,
+            (current_academy_id(), selected_track, BELT_SEQUENCE.index(selected_belt)),
+        ),
+    }
+
+
+def _techniques_context(results, selected_track, selected_belt):
+    return {
+        "technique_list": results["technique_list"],
+        "selected_track": selected_track,
+        "selected_belt": selected_belt,
+        "belt_sequence": BELT_SEQUENCE,
+        "program_tracks": PROGRAM_TRACKS,
+    }
 
 
 @app.route("/techniques", methods=["GET", "POST"])
@@ -2038,9 +4422,7 @@ def techniques():
     cur = db.cursor(dictionary=True)
     _ensure_feature_schema(cur)
 
-    selected_track = _normalize_track(request.args.get("track", "kids_martial_arts"))
-    requested_belt = (request.args.get("belt", BELT_SEQUENCE[0]) or "").strip()
-    selected_belt = requested_belt if requested_belt in BELT_SEQUENCE else BELT_SEQUENCE[0]
+    selected_track, selected_belt = _techniques_filter(request.args)
 
     if request.method == "POST":
         technique_name = request.form.get("technique_name", "").strip()
@@ -2065,10 +4447,17 @@ def techniques():
             cur.execute(
                 """
                 INSERT INTO techniques
-                  (technique_name, description, created_by_user_id, program_track, belt_name)
-                VALUES (%s, %s, %s, %s, %s)
+                  (academy_id, technique_name, description, created_by_user_id, program_track, belt_index)
+                VALUES (%s, %s, %s, %s, %s, %s)
                 """,
-                (technique_name, description or "", session["user_id"], program_track, belt_name),
+                (
+                    current_academy_id(),
+                    technique_name,
+                    description or "",
+                    session["user_id"],
+                    program_track,
+                    BELT_SEQUENCE.index(belt_name),
+                ),
             )
             db.commit()
             flash("Technique added.", "success")
@@ -2076,35 +4465,12 @@ def techniques():
             db.rollback()
             flash("Technique already exists or could not be added.", "error")
 
-    cur.execute(
-        """
-        SELECT
-            t.id,
-            t.technique_name,
-            t.description,
-            t.is_active,
-            t.created_at,
-            t.program_track,
-            t.belt_name,
-            u.username AS created_by
-        FROM techniques t
-        LEFT JOIN users u ON u.id = t.created_by_user_id
-        WHERE t.program_track = %s
-          AND t.belt_name = %s
-        ORDER BY t.technique_name
-        """
-        ,
-        (selected_track, selected_belt),
-    )
+    cur.execute(*_techniques_queries(selected_track, selected_belt)["technique_list"])
     technique_list = cur.fetchall()
     cur.close()
     return render_template(
         "techniques.html",
-        technique_list=technique_list,
-        selected_track=selected_track,
-        selected_belt=selected_belt,
-        belt_sequence=BELT_SEQUENCE,
-        program_tracks=PROGRAM_TRACKS,
+        **_techniques_context({"technique_list": technique_list}, selected_track, selected_belt),
     )
 
 
@@ -2139,36 +4505,68 @@ def edit_technique(technique_id):
         cur.close()
         return redirect(url_for("techniques", track=program_track, belt=BELT_SEQUENCE[0]))
 
-    cur.execute("SELECT id, description FROM techniques WHERE id = %s", (technique_id,))
+    cur.execute(
+        """
+        SELECT id, technique_name, description, is_active, program_track, belt_index
+        FROM techniques
+        WHERE id = %s AND academy_id = %s
+        """,
+        (technique_id, current_academy_id()),
+    )
     existing = cur.fetchone()
     if not existing:
         cur.close()
         flash("Technique not found.", "error")
         return redirect(url_for("techniques"))
 
-    final_description = description
-    if extra_comment:
-        # Append a simple audit-style comment line into description text.
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-        comment_line = f"[{timestamp} {session['username']}] {extra_comment}"
-        if final_description:
-            final_description = f"{final_description}\n{comment_line}"
-        else:
-            final_description = comment_line
+    updated = {
+        "technique_name": technique_name,
+        "description": description,
+        "is_active": is_active,
+        "program_track": program_track,
+        "belt_index": BELT_SEQUENCE.index(belt_name),
+    }
+    changes = {
+        field: {"from": existing[field], "to": updated[field]}
+        for field in TECHNIQUE_REVISION_FIELDS
+        if existing[field] != updated[field]
+    }
 
     try:
-        cur.execute(
-            """
-            UPDATE techniques
-            SET technique_name = %s,
-                description = %s,
-                is_active = %s,
-                program_track = %s,
-                belt_name = %s
-            WHERE id = %s
-            """,
-            (technique_name, final_description, is_active, program_track, belt_name, technique_id),
-        )
+        if changes:
+            cur.execute(
+                """
+                UPDATE techniques
+                SET technique_name = %s,
+                    description = %s,
+                    is_active = %s,
+                    program_track = %s,
+                    belt_index = %s
+                WHERE id = %s AND academy_id = %s
+                """,
+                (
+                    technique_name,
+                    description,
+                    is_active,
+                    program_track,
+                    BELT_SEQUENCE.index(belt_name),
+                    technique_id,
+                    current_academy_id(),
+                ),
+            )
+        if changes or extra_comment:
+            cur.execute(
+                """
+                INSERT INTO technique_revisions (technique_id, changed_by_user_id, changes, comment)
+                VALUES (%s, %s, %s, %s)
+                """,
+                (
+                    technique_id,
+                    session["user_id"],
+                    json.dumps(changes) if changes else None,
+                    extra_comment or None,
+                ),
+            )
         db.commit()
         flash("Technique updated.", "success")
     except Exception:
@@ -2180,6 +4578,57 @@ def edit_technique(technique_id):
     return redirect(url_for("techniques", track=program_track, belt=belt_name))
 
 
+@app.route("/techniques/<int:technique_id>/revisions")
+@login_required
+@role_required("employee", "manager")
+def technique_revisions(technique_id):
+    # Page through a technique's edit history, newest first (?before=<revision id> for older pages).
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    cur.execute(
+        """
+        SELECT id, technique_name, program_track, belt_index
+        FROM techniques
+        WHERE id = %s AND academy_id = %s
+        """,
+        (technique_id, current_academy_id()),
+    )
+    technique = cur.fetchone()
+    if not technique:
+        cur.close()
+        flash("Technique not found.", "error")
+        return redirect(url_for("techniques"))
+
+    before_id = request.args.get("before", type=int)
+    query = """
+        SELECT tr.id, tr.changes, tr.comment, tr.created_at, u.username AS changed_by
+        FROM technique_revisions tr
+        LEFT JOIN users u ON u.id = tr.changed_by_user_id
+        WHERE tr.technique_id = %s
+    """
+    params = [technique_id]
+    if before_id:
+        query += " AND tr.id < %s"
+        params.append(before_id)
+    query += " ORDER BY tr.id DESC LIMIT %s"
+    params.append(TECHNIQUE_REVISIONS_PER_PAGE + 1)
+    cur.execute(query, tuple(params))
+    revisions = cur.fetchall()
+    cur.close()
+
+    has_more = len(revisions) > TECHNIQUE_REVISIONS_PER_PAGE
+    revisions = revisions[:TECHNIQUE_REVISIONS_PER_PAGE]
+    for revision in revisions:
+        revision["changes"] = json.loads(revision["changes"]) if revision["changes"] else {}
+    return render_template(
+        "technique_revisions.html",
+        technique=technique,
+        revisions=revisions,
+        next_before=revisions[-1]["id"] if has_more else None,
+    )
+
+
 @app.route("/techniques/<int:technique_id>/delete", methods=["POST"])
 @login_required
 @role_required("employee", "manager")
@@ -2188,7 +4637,10 @@ def delete_technique(technique_id):
     db = get_db()
     cur = db.cursor(dictionary=True)
     try:
-        cur.execute("DELETE FROM techniques WHERE id = %s", (technique_id,))
+        cur.execute(
+            "DELETE FROM techniques WHERE id = %s AND academy_id = %s",
+            (technique_id, current_academy_id()),
+        )
         if cur.rowcount == 0:
             flash("Technique not found.", "error")
         else:
@@ -2203,6 +4655,34 @@ def delete_technique(technique_id):
     return redirect(request.referrer or url_for("techniques"))
 
 
+def _find_progress_row(cur, progress_id):
+    # Lock a progress row of the current academy for a ledger write, child row first.
+    cur.execute(
+        """
+        SELECT csp.child_id
+        FROM child_skill_progress csp
+        JOIN children c ON c.id = csp.child_id
+        WHERE csp.id = %s AND c.academy_id = %s
+        """,
+        (progress_id, current_academy_id()),
+    )
+    owner = cur.fetchone()
+    if not owner or not lock_children(cur, [owner["child_id"]]):
+        return None
+    cur.execute(
+        """
+        SELECT csp.id, csp.child_id, csp.technique_id, csp.assigned_by_user_id, csp.assigned_at,
+               csp.learned_count, csp.completed, csp.completed_at, csp.notes
+        FROM child_skill_progress csp
+        JOIN children c ON c.id = csp.child_id
+        WHERE csp.id = %s AND c.academy_id = %s
+        FOR UPDATE
+        """,
+        (progress_id, current_academy_id()),
+    )
+    return cur.fetchone()
+
+
 @app.route("/progress/<int:progress_id>/toggle", methods=["POST"])
 @login_required
 @role_required("employee", "manager")
@@ -2211,27 +4691,24 @@ def toggle_progress(progress_id):
     db = get_db()
     cur = db.cursor(dictionary=True)
     _ensure_feature_schema(cur)
-    cur.execute(
-        "SELECT id, learned_count FROM child_skill_progress WHERE id = %s",
-        (progress_id,),
-    )
-    row = cur.fetchone()
+    row = _find_progress_row(cur, progress_id)
     if not row:
         cur.close()
         flash("Progress item not found.", "error")
         return redirect(url_for("dashboard"))
 
-    new_count = min(LEARNED_TARGET, int(row.get("learned_count") or 0) + 1)
-    new_completed = 1 if new_count >= LEARNED_TARGET else 0
-    cur.execute(
-        """
-        UPDATE child_skill_progress
-        SET learned_count = %s,
-            completed = %s,
-            completed_at = CASE WHEN %s = 1 THEN CURRENT_TIMESTAMP ELSE NULL END
-        WHERE id = %s
-        """,
-        (new_count, new_completed, new_completed, progress_id),
+    record_progress_event(
+        cur,
+        {
+            "event_type": "learned",
+            "progress_id": progress_id,
+            "child_id": row["child_id"],
+            "technique_id": row["technique_id"],
+            "learned_delta": 1,
+            "actor_user_id": session["user_id"],
+        },
+        LEARNED_TARGET,
+        current=row,
     )
     db.commit()
     cur.close()
@@ -2257,31 +4734,36 @@ def edit_progress(progress_id):
         flash("Technique is required.", "error")
         return redirect(request.referrer or url_for("dashboard"))
 
-    cur.execute("SELECT id FROM techniques WHERE id = %s", (technique_id,))
+    cur.execute(
+        "SELECT id FROM techniques WHERE id = %s AND academy_id = %s",
+        (technique_id, current_academy_id()),
+    )
     technique = cur.fetchone()
     if not technique:
         cur.close()
         flash("Technique not found.", "error")
         return redirect(request.referrer or url_for("dashboard"))
 
-    completed = 1 if learned_count >= LEARNED_TARGET else 0
-    cur.execute(
-        """
-        UPDATE child_skill_progress
-        SET technique_id = %s,
-            notes = %s,
-            learned_count = %s,
-            completed = %s,
-            completed_at = CASE WHEN %s = 1 THEN COALESCE(completed_at, CURRENT_TIMESTAMP) ELSE NULL END
-        WHERE id = %s
-        """,
-        (technique_id, notes or None, learned_count, completed, completed, progress_id),
-    )
-    if cur.rowcount == 0:
+    row = _find_progress_row(cur, progress_id)
+    if not row:
         cur.close()
         flash("Progress item not found.", "error")
         return redirect(request.referrer or url_for("dashboard"))
 
+    record_progress_event(
+        cur,
+        {
+            "event_type": "corrected",
+            "progress_id": progress_id,
+            "child_id": row["child_id"],
+            "technique_id": technique_id,
+            "learned_count": learned_count,
+            "notes": notes,
+            "actor_user_id": session["user_id"],
+        },
+        LEARNED_TARGET,
+        current=row,
+    )
     db.commit()
     cur.close()
     flash("Progress row updated.", "success")
@@ -2295,12 +4777,25 @@ def delete_progress(progress_id):
     # Remove an assigned student progress row.
     db = get_db()
     cur = db.cursor(dictionary=True)
-    cur.execute("DELETE FROM child_skill_progress WHERE id = %s", (progress_id,))
-    if cur.rowcount == 0:
+    _ensure_feature_schema(cur)
+    row = _find_progress_row(cur, progress_id)
+    if not row:
         cur.close()
         flash("Progress item not found.", "error")
         return redirect(request.referrer or url_for("dashboard"))
 
+    record_progress_event(
+        cur,
+        {
+            "event_type": "removed",
+            "progress_id": progress_id,
+            "child_id": row["child_id"],
+            "technique_id": row["technique_id"],
+            "actor_user_id": session["user_id"],
+        },
+        LEARNED_TARGET,
+        current=row,
+    )
     db.commit()
     cur.close()
     flash("Progress row deleted.", "success")
@@ -2322,11 +4817,14 @@ def process_request(request_id, action):
 
     cur.execute(
         """
-        SELECT id, request_type, shift_id, requested_employee_id, status, switch_target_status
-        FROM requests
-        WHERE id = %s
+        SELECT r.id, r.request_type, r.shift_id, r.requested_employee_id, r.status, r.switch_target_status,
+               s.shift_date
+        FROM requests r
+        JOIN users req ON req.id = r.requester_user_id
+        JOIN shifts s ON s.id = r.shift_id
+        WHERE r.id = %s AND req.academy_id = %s
         """,
-        (request_id,),
+        (request_id, current_academy_id()),
     )
     req = cur.fetchone()
 
@@ -2352,95 +4850,171 @@ def process_request(request_id, action):
     # Apply schedule changes only on approval.
     if action == "approve":
         if req["request_type"] == "switch" and req["requested_employee_id"]:
-            cur.execute(
-                "UPDATE shifts SET employee_user_id = %s WHERE id = %s",
-                (req["requested_employee_id"], req["shift_id"]),
-            )
+            _assign_shift(cur, req["shift_id"], req["requested_employee_id"])
         elif req["request_type"] == "callout":
             cur.execute(
-                "UPDATE shifts SET class_name = CONCAT(class_name, ' (CALL-OUT)') WHERE id = %s",
-                (req["shift_id"],),
+                """
+                UPDATE shifts
+                SET coverage_status = 'called_out',
+                    covering_employee_id = NULL
+                WHERE id = %s AND academy_id = %s
+                """,
+                (req["shift_id"], current_academy_id()),
             )
+        mark_weeks_dirty(cur, current_academy_id(), [req["shift_date"]])
 
     db.commit()
     cur.close()
+    _publish_request_update(db, request_id)
 
     flash(f"Request {new_status}.", "success")
+    if action == "approve" and req["request_type"] == "callout":
+        return redirect(url_for("manager_shift_coverage", shift_id=req["shift_id"]))
     return redirect(url_for("manager_dashboard"))
 
-
-# -----------------------------
-# Parent views
-# -----------------------------
-@app.route("/attendance/session/<int:session_id>/summary")
+
+@app.route("/manager/shifts/<int:shift_id>/coverage", methods=["GET", "POST"])
 @login_required
-@role_required("employee", "manager")
-def attendance_summary(session_id):
-    # Show post-class save confirmation with student attendance and techniques summary.
+@role_required("manager")
+def manager_shift_coverage(shift_id):
+    # Suggest free employees for a called-out shift and reassign it in one click.
     db = get_db()
     cur = db.cursor(dictionary=True)
-    _ensure_feature_schema(cur)
 
     cur.execute(
         """
-        SELECT
-            ats.id,
-            ats.offering_id,
-            ats.class_name,
-            ats.class_date,
-            ats.start_time,
-            ats.end_time,
-            TIME_FORMAT(ats.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(ats.end_time, '%H:%i') AS end_label,
-            ats.created_at,
-            u.username AS staff_username
-        FROM attendance_sessions ats
-        JOIN users u ON u.id = ats.staff_user_id
-        WHERE ats.id = %s
+        SELECT s.id, s.academy_id, s.employee_user_id, s.covering_employee_id, s.shift_date,
+               s.start_time, s.end_time, s.class_name, s.coverage_status,
+               TIME_FORMAT(s.start_time, '%H:%i') AS start_label,
+               TIME_FORMAT(s.end_time, '%H:%i') AS end_label,
+               u.username AS employee
+        FROM shifts s
+        JOIN users u ON u.id = s.employee_user_id
+        WHERE s.id = %s AND s.academy_id = %s
         """,
-        (session_id,),
+        (shift_id, current_academy_id()),
     )
-    session_row = cur.fetchone()
-    if not session_row:
+    shift = cur.fetchone()
+    if not shift:
         cur.close()
-        flash("Attendance session not found.", "error")
-        return redirect(url_for("dashboard"))
+        flash("Shift not found.", "error")
+        return redirect(url_for("manager_dashboard"))
 
-    cur.execute(
-        """
-        SELECT
-            ast.child_id,
-            c.child_name,
-            c.program_track,
-            c.belt_index,
-            ast.is_present
-        FROM attendance_students ast
-        JOIN children c ON c.id = ast.child_id
-        WHERE ast.attendance_session_id = %s
-        ORDER BY c.child_name
-        """,
-        (session_id,),
+    if request.method == "POST":
+        employee_id = request.form.get("employee_user_id", type=int)
+        candidate_ids = {c["id"] for c in suggest_coverage(cur, shift)}
+        if employee_id not in candidate_ids:
+            cur.close()
+            flash("That employee is no longer free for this shift.", "error")
+            return redirect(url_for("manager_shift_coverage", shift_id=shift_id))
+
+        cur.execute(
+            """
+            UPDATE shifts
+            SET covering_employee_id = %s,
+                coverage_status = 'covered'
+            WHERE id = %s AND academy_id = %s
+            """,
+            (employee_id, shift_id, current_academy_id()),
+        )
+        mark_weeks_dirty(cur, current_academy_id(), [shift["shift_date"]])
+        db.commit()
+        cur.close()
+        flash("Shift reassigned to cover the call-out.", "success")
+        return redirect(url_for("manager_dashboard"))
+
+    candidates = suggest_coverage(cur, shift)
+    cur.close()
+    return render_template(
+        "shift_coverage.html",
+        shift=shift,
+        candidates=candidates,
+        is_called_out=shift["coverage_status"] == "called_out",
     )
-    students = cur.fetchall()
 
-    cur.execute(
-        """
-        SELECT
-            atl.child_id,
-            t.technique_name,
-            t.program_track,
-            t.belt_name,
-            atl.learned_increment
-        FROM attendance_technique_logs atl
-        JOIN techniques t ON t.id = atl.technique_id
-        WHERE atl.attendance_session_id = %s
-        ORDER BY t.technique_name
-        """,
-        (session_id,),
+
+# -----------------------------
+# Parent views
+# -----------------------------
+def _attendance_summary_queries(session_id):
+    # The schedule lookup reads the session's day through a subquery so all four reads are independent.
+    academy_id = current_academy_id()
+    session_day_sql = "(SELECT class_date FROM attendance_sessions WHERE id = %s AND academy_id = %s)"
+    return {
+        "session_row": (
+            """
+            SELECT
+                ats.id,
+                ats.offering_id,
+                ats.class_name,
+                ats.class_date,
+                ats.start_time,
+                ats.end_time,
+                TIME_FORMAT(ats.start_time, '%H:%i') AS start_label,
+                TIME_FORMAT(ats.end_time, '%H:%i') AS end_label,
+                ats.created_at,
+                u.username AS staff_username
+            FROM attendance_sessions ats
+            JOIN users u ON u.id = ats.staff_user_id
+            WHERE ats.id = %s AND ats.academy_id = %s
+            """,
+            (session_id, academy_id),
+        ),
+        "students": (
+            """
+            SELECT
+                ast.child_id,
+                c.child_name,
+                c.program_track,
+                c.belt_index,
+                ast.is_present
+            FROM attendance_students ast
+            JOIN children c ON c.id = ast.child_id
+            WHERE ast.attendance_session_id = %s
+            ORDER BY c.child_name
+            """,
+            (session_id,),
+        ),
+        "logs": (
+            """
+            SELECT
+                atl.child_id,
+                t.technique_name,
+                t.program_track,
+                t.belt_index,
+                atl.learned_increment
+            FROM attendance_technique_logs atl
+            JOIN techniques t ON t.id = atl.technique_id
+            WHERE atl.attendance_session_id = %s
+            ORDER BY t.technique_name
+            """,
+            (session_id,),
+        ),
+        "schedule_days": schedule_days_query(academy_id, session_day_sql, (session_id, academy_id)),
+    }
+
+
+def _attendance_schedule_queries(results):
+    # Follow-up read for the previous/next class links: only days missing from the schedule cache.
+    lists, missing = cached_days(
+        current_academy_id(),
+        results["schedule_days"],
+        on_lookup=lambda hit: record_cache("class_schedule", hit),
     )
-    logs = cur.fetchall()
+    results["schedule_lists"] = lists
+    if not missing:
+        return {}
+    return {"schedule_rows": day_offerings_query(current_academy_id(), missing)}
+
+
+def _attendance_summary_context(results, role):
+    # Returns None when the session does not exist.
+    if not results["session_row"]:
+        return None
+    session_row = results["session_row"][0]
+    students = results["students"]
     logs_by_child = {}
-    for row in logs:
+    for row in results["logs"]:
         logs_by_child.setdefault(row["child_id"], []).append(row)
 
     for student in students:
@@ -2448,60 +5022,111 @@ def attendance_summary(session_id):
         student["current_belt"] = _belt_name_for_index(student.get("belt_index"))
         student["techniques"] = logs_by_child.get(student["child_id"], [])
 
-    next_class_ref = None
-    if session_row.get("offering_id"):
-        cur.execute(
-            """
-            SELECT CONCAT('offering:', co.id) AS class_ref
-            FROM class_offerings co
-            WHERE (co.class_date > %s)
-               OR (co.class_date = %s AND co.start_time > %s)
-            ORDER BY co.class_date, co.start_time
-            LIMIT 1
-            """,
-            (
-                session_row["class_date"],
-                session_row["class_date"],
-                session_row["start_time"],
-            ),
+    lists = dict(results.get("schedule_lists") or {})
+    if results.get("schedule_rows") is not None:
+        loaded_days = [row for row in results["schedule_days"] if row["class_date"] not in lists]
+        lists.update(store_days(current_academy_id(), loaded_days, results["schedule_rows"]))
+    previous_id = next_id = None
+    if session_row["offering_id"] is not None:
+        previous_id, next_id = adjacent_offerings(
+            lists, session_row["class_date"], session_row["start_time"], session_row["offering_id"]
+        )
+    attendance_endpoint = "manager_attendance" if role == "manager" else "employee_attendance"
+    return {
+        "session_row": session_row,
+        "students": students,
+        "next_class_url": (
+            url_for(attendance_endpoint, class_ref=f"offering:{next_id}")
+            if next_id
+            else url_for(attendance_endpoint)
+        ),
+        "previous_class_url": (
+            url_for(attendance_endpoint, class_ref=f"offering:{previous_id}") if previous_id else None
+        ),
+    }
+
+
+@app.route("/attendance/sync", methods=["POST"])
+@login_required
+@role_required("employee", "manager")
+def attendance_sync():
+    # Batch endpoint for attendance queued on a device while the dojo network was down.
+    # Body: {"sessions": [...]}; every session gets a result keyed by its client_id.
+    payload = request.get_json(silent=True) or {}
+    raw_sessions = payload.get("sessions")
+    if not isinstance(raw_sessions, list):
+        return jsonify({"error": "Expected a JSON body with a sessions list."}), 400
+    if len(raw_sessions) > ATTENDANCE_SYNC_MAX_SESSIONS:
+        return jsonify({"error": f"Send at most {ATTENDANCE_SYNC_MAX_SESSIONS} sessions per request."}), 413
+
+    parsed = [_parse_sync_session(raw) for raw in raw_sessions]
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    try:
+        synced = _sync_attendance_sessions(
+            cur,
+            current_academy_id(),
+            session["user_id"],
+            [entry for entry, error in parsed if error is None],
         )
-        next_row = cur.fetchone()
-        if next_row:
-            next_class_ref = next_row["class_ref"]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+
+    results = []
+    for entry, error in parsed:
+        client_id = (entry or {}).get("client_id")
+        if error is not None:
+            results.append({"client_id": client_id, "status": "rejected", "error": error})
+            continue
+        result = dict(synced[client_id], client_id=client_id)
+        if result.get("session_id"):
+            result["summary_url"] = url_for("attendance_summary", session_id=result["session_id"])
+        results.append(result)
+    return jsonify({"results": results})
+
+
+@app.route("/attendance/session/<int:session_id>/summary")
+@login_required
+@role_required("employee", "manager")
+def attendance_summary(session_id):
+    # Show post-class save confirmation with student attendance and techniques summary.
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
     cur.close()
 
-    attendance_endpoint = (
-        "manager_attendance" if session.get("role") == "manager" else "employee_attendance"
-    )
-    next_class_url = (
-        url_for(attendance_endpoint, class_ref=next_class_ref)
-        if next_class_ref
-        else url_for(attendance_endpoint)
-    )
-    return render_template(
-        "attendance_summary.html",
-        session_row=session_row,
-        students=students,
-        next_class_url=next_class_url,
-    )
+    results = run_query_batch(_attendance_summary_queries(session_id))
+    if results["session_row"]:
+        results.update(run_query_batch(_attendance_schedule_queries(results)))
+    context = _attendance_summary_context(results, session.get("role"))
+    if context is None:
+        flash("Attendance session not found.", "error")
+        return redirect(url_for("dashboard"))
+    return render_template("attendance_summary.html", **context)
 
 
 @app.route("/parent/signup/<int:offering_id>/<int:child_id>", methods=["POST"])
 @login_required
 @role_required("parent")
+@idempotent_submission("parent_signup")
 def parent_signup(offering_id, child_id):
-    # Parent signup with 3-classes-per-week validation.
+    # Parent signup with 3-classes-per-week validation; full classes put the child on the waitlist.
     db = get_db()
     cur = db.cursor(dictionary=True)
     _ensure_feature_schema(cur)
 
     cur.execute(
         """
-        SELECT id, class_date, program_track
+        SELECT id, class_date, program_track, week_key
         FROM class_offerings
-        WHERE id = %s
+        WHERE id = %s AND academy_id = %s
         """,
-        (offering_id,),
+        (offering_id, current_academy_id()),
     )
     offering = cur.fetchone()
     if not offering:
@@ -2514,8 +5139,12 @@ def parent_signup(offering_id, child_id):
         return redirect(url_for("parent_dashboard"))
 
     cur.execute(
-        "SELECT id, program_track FROM children WHERE id = %s AND parent_user_id = %s",
-        (child_id, session["user_id"]),
+        """
+        SELECT id, program_track
+        FROM children
+        WHERE id = %s AND academy_id = %s AND parent_user_id = %s
+        """,
+        (child_id, current_academy_id(), session["user_id"]),
     )
     child = cur.fetchone()
     if not child:
@@ -2523,26 +5152,26 @@ def parent_signup(offering_id, child_id):
         flash("Student not found for this parent account.", "error")
         return redirect(url_for("parent_dashboard"))
 
-    cur.execute(
-        """
-        SELECT COUNT(*) AS weekly_count
-        FROM class_enrollments ce
-        JOIN class_offerings co ON co.id = ce.offering_id
-        WHERE ce.child_id = %s
-          AND YEARWEEK(co.class_date, 1) = YEARWEEK(%s, 1)
-        """,
-        (child_id, offering["class_date"]),
-    )
-    week_count = int((cur.fetchone() or {}).get("weekly_count") or 0)
-    if week_count >= MAX_CLASSES_PER_WEEK:
-        cur.close()
-        flash(
-            f"Weekly limit reached: a student can only sign up for {MAX_CLASSES_PER_WEEK} classes.",
-            "error",
-        )
-        return redirect(url_for("parent_dashboard"))
-
     try:
+        # Counter updates and enrollment share one transaction so a failed insert
+        # releases the reserved seat and weekly slot on rollback.
+        if not _take_class_seats(cur, offering_id, 1):
+            # Nothing was written yet, so the waitlist entry commits on its own.
+            position = _join_waitlist(cur, offering_id, child_id, session["user_id"])
+            if position is None:
+                db.rollback()
+                flash("Student is already enrolled in this class.", "error")
+                return redirect(url_for("parent_dashboard"))
+            db.commit()
+            flash(f"This class is full. Added to the waitlist at position {position}.", "success")
+            return redirect(url_for("parent_dashboard"))
+        if not _reserve_weekly_signup(cur, child_id, offering["week_key"]):
+            db.rollback()
+            flash(
+                f"Weekly limit reached: a student can only sign up for {MAX_CLASSES_PER_WEEK} classes.",
+                "error",
+            )
+            return redirect(url_for("parent_dashboard"))
         cur.execute(
             """
             INSERT INTO class_enrollments (offering_id, child_id, enrolled_by_user_id)
@@ -2550,6 +5179,10 @@ def parent_signup(offering_id, child_id):
             """,
             (offering_id, child_id, session["user_id"]),
         )
+        cur.execute(
+            "DELETE FROM class_waitlist WHERE offering_id = %s AND child_id = %s",
+            (offering_id, child_id),
+        )
         cur.execute(
             "UPDATE children SET program_track = %s WHERE id = %s",
             (offering["program_track"], child_id),
@@ -2564,87 +5197,139 @@ def parent_signup(offering_id, child_id):
     return redirect(url_for("parent_dashboard"))
 
 
-@app.route("/parent")
+@app.route("/parent/signup/<int:offering_id>/<int:child_id>/cancel", methods=["POST"])
 @login_required
 @role_required("parent")
-def parent_dashboard():
-    # Show parent-facing academy schedule, class signups, attendance, and instructor notes.
+@idempotent_submission("parent_cancel_signup")
+def parent_cancel_signup(offering_id, child_id):
+    # Drop a signup or waitlist entry; a freed seat goes to the first child on the waitlist.
     db = get_db()
     cur = db.cursor(dictionary=True)
     _ensure_feature_schema(cur)
 
     cur.execute(
         """
-        SELECT id, child_name, program_track, belt_index
-        FROM children
-        WHERE parent_user_id = %s
-        ORDER BY child_name
+        SELECT id, class_date, program_track, week_key
+        FROM class_offerings
+        WHERE id = %s AND academy_id = %s
         """,
-        (session["user_id"],),
+        (offering_id, current_academy_id()),
     )
-    children = cur.fetchall()
-    for child in children:
-        child["program_track"] = _normalize_track(child.get("program_track"))
-        child["current_belt"] = _belt_name_for_index(child.get("belt_index"))
+    offering = cur.fetchone()
+    if not offering:
+        cur.close()
+        flash("Class offering not found.", "error")
+        return redirect(url_for("parent_dashboard"))
+    if offering["class_date"] < date.today():
+        cur.close()
+        flash("Cannot cancel a class that already happened.", "error")
+        return redirect(url_for("parent_dashboard"))
 
-    calendar_start = date.today()
-    calendar_end = calendar_start + timedelta(days=13)
     cur.execute(
-        """
-        SELECT
-            s.shift_date,
-            s.start_time,
-            s.end_time,
-            s.class_name,
-            u.username AS employee
-        FROM shifts s
-        JOIN users u ON u.id = s.employee_user_id
-        ORDER BY s.shift_date, s.start_time
-        """
+        "SELECT id FROM children WHERE id = %s AND academy_id = %s AND parent_user_id = %s",
+        (child_id, current_academy_id(), session["user_id"]),
     )
-    academy_schedule = cur.fetchall()
+    if not cur.fetchone():
+        cur.close()
+        flash("Student not found for this parent account.", "error")
+        return redirect(url_for("parent_dashboard"))
 
-    cur.execute(
-        """
-        SELECT
-            s.shift_date,
-            s.class_name,
-            u.username AS employee,
-            TIME_FORMAT(s.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(s.end_time, '%H:%i') AS end_label
-        FROM shifts s
-        JOIN users u ON u.id = s.employee_user_id
-        WHERE s.shift_date BETWEEN %s AND %s
-        ORDER BY s.shift_date, s.start_time
-        """,
-        (calendar_start, calendar_end),
-    )
-    academy_calendar_weeks = _build_two_week_calendar(calendar_start, cur.fetchall())
+    try:
+        removed_from, _ = _withdraw_from_class(cur, offering, child_id)
+        db.commit()
+        if removed_from == "enrolled":
+            flash("Class signup cancelled.", "success")
+        elif removed_from == "waitlisted":
+            flash("Removed from the waitlist.", "success")
+        else:
+            flash("Student is not signed up for this class.", "error")
+    except Exception:
+        db.rollback()
+        flash("Could not cancel the class signup. Please try again.", "error")
+    finally:
+        cur.close()
+    return redirect(url_for("parent_dashboard"))
 
-    cur.execute(
-        """
-        SELECT
-            co.id,
-            co.program_track,
-            co.class_name,
-            co.class_date,
-            TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
-            TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
-            u.username AS instructor_name
-        FROM class_offerings co
-        LEFT JOIN users u ON u.id = co.instructor_user_id
-        WHERE co.class_date >= %s
-        ORDER BY co.class_date, co.start_time
-        """,
-        (date.today(),),
-    )
-    signup_classes = cur.fetchall()
-    child_ids = [c["id"] for c in children]
-    signed_up_classes_by_child = {child_id: [] for child_id in child_ids}
-    if child_ids:
-        placeholders = ", ".join(["%s"] * len(child_ids))
-        cur.execute(
-            f"""
+
+def _parent_dashboard_queries(parent_user_id, calendar_start):
+    # Signup, attendance and note rows filter on the parent directly so every query can run at once.
+    calendar_first, calendar_last = calendar_window("two_week", calendar_start)
+    academy_id = current_academy_id()
+    return {
+        "children": (
+            """
+            SELECT id, child_name, program_track, belt_index
+            FROM children
+            WHERE academy_id = %s
+              AND parent_user_id = %s
+            ORDER BY child_name
+            """,
+            (academy_id, parent_user_id),
+        ),
+        "academy_schedule": (
+            """
+            SELECT
+                s.shift_date,
+                s.start_time,
+                s.end_time,
+                s.class_name,
+                u.username AS employee
+            FROM shifts s
+            JOIN users u ON u.id = COALESCE(s.covering_employee_id, s.employee_user_id)
+            WHERE s.academy_id = %s
+            ORDER BY s.shift_date, s.start_time
+            """,
+            (academy_id,),
+        ),
+        "calendar_shifts": shifts_query(academy_id, calendar_first, calendar_last),
+        "signup_classes": (
+            """
+            SELECT
+                co.id,
+                co.program_track,
+                co.class_name,
+                co.class_date,
+                TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
+                TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
+                co.enrolled_count,
+                co.capacity,
+                u.username AS instructor_name
+            FROM class_offerings co
+            LEFT JOIN users u ON u.id = co.instructor_user_id
+            WHERE co.academy_id = %s
+              AND co.class_date >= %s
+            ORDER BY co.class_date, co.start_time
+            """,
+            (academy_id, date.today()),
+        ),
+        "waitlist_rows": (
+            """
+            SELECT
+                cw.child_id,
+                co.id AS offering_id,
+                co.program_track,
+                co.class_name,
+                co.class_date,
+                TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
+                TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
+                (
+                    SELECT COUNT(*)
+                    FROM class_waitlist ahead
+                    WHERE ahead.offering_id = cw.offering_id
+                      AND ahead.id <= cw.id
+                ) AS position
+            FROM class_waitlist cw
+            JOIN children c ON c.id = cw.child_id
+            JOIN class_offerings co ON co.id = cw.offering_id
+            WHERE c.academy_id = %s
+              AND c.parent_user_id = %s
+              AND co.class_date >= %s
+            ORDER BY co.class_date, co.start_time
+            """,
+            (academy_id, parent_user_id, date.today()),
+        ),
+        "signup_rows": (
+            """
             SELECT
                 ce.child_id,
                 co.id AS offering_id,
@@ -2656,59 +5341,134 @@ def parent_dashboard():
                 u.username AS instructor_name,
                 ce.created_at AS enrolled_at
             FROM class_enrollments ce
+            JOIN children c ON c.id = ce.child_id
             JOIN class_offerings co ON co.id = ce.offering_id
             LEFT JOIN users u ON u.id = co.instructor_user_id
-            WHERE ce.child_id IN ({placeholders})
+            WHERE c.academy_id = %s
+              AND c.parent_user_id = %s
             ORDER BY co.class_date DESC, co.start_time DESC
             """,
-            tuple(child_ids),
-        )
-        signup_rows = cur.fetchall()
-        for row in signup_rows:
-            row["attendance_status"] = "Not Recorded"
-            signed_up_classes_by_child[row["child_id"]].append(row)
-
-        cur.execute(
-            f"""
+            (academy_id, parent_user_id),
+        ),
+        "attendance_rows": (
+            """
             SELECT
                 ast.child_id,
                 ats.offering_id,
                 ast.is_present,
                 ats.created_at
             FROM attendance_students ast
+            JOIN children c ON c.id = ast.child_id
             JOIN attendance_sessions ats ON ats.id = ast.attendance_session_id
-            WHERE ast.child_id IN ({placeholders})
+            WHERE c.academy_id = %s
+              AND c.parent_user_id = %s
               AND ats.offering_id IS NOT NULL
             ORDER BY ats.created_at DESC
             """,
-            tuple(child_ids),
-        )
-        attendance_rows = cur.fetchall()
-        attendance_lookup = {}
-        for row in attendance_rows:
-            key = (row["child_id"], row["offering_id"])
-            if key not in attendance_lookup:
-                attendance_lookup[key] = "Present" if row["is_present"] else "Absent"
-
-        for child_id, rows in signed_up_classes_by_child.items():
-            for row in rows:
-                status = attendance_lookup.get((child_id, row["offering_id"]))
-                if status:
-                    row["attendance_status"] = status
-
-    child_parent_notes = _fetch_parent_notes_rows(cur, child_ids)
+            (academy_id, parent_user_id),
+        ),
+        "parent_notes": (
+            """
+            SELECT
+                pn.id,
+                pn.child_id,
+                pn.note_text,
+                pn.created_at,
+                u.username AS author_username,
+                u.role AS author_role
+            FROM parent_notes pn
+            JOIN children c ON c.id = pn.child_id
+            JOIN users u ON u.id = pn.author_user_id
+            WHERE c.academy_id = %s
+              AND c.parent_user_id = %s
+            ORDER BY pn.created_at DESC
+            """,
+            (academy_id, parent_user_id),
+        ),
+    }
+
+
+def _parent_dashboard_context(results, calendar_start):
+    children = results["children"]
+    for child in children:
+        child["program_track"] = _normalize_track(child.get("program_track"))
+        child["current_belt"] = _belt_name_for_index(child.get("belt_index"))
+
+    child_ids = [c["id"] for c in children]
+    signed_up_classes_by_child = {child_id: [] for child_id in child_ids}
+    for row in results["signup_rows"]:
+        row["attendance_status"] = "Not Recorded"
+        signed_up_classes_by_child.setdefault(row["child_id"], []).append(row)
+
+    attendance_lookup = {}
+    for row in results["attendance_rows"]:
+        key = (row["child_id"], row["offering_id"])
+        if key not in attendance_lookup:
+            attendance_lookup[key] = "Present" if row["is_present"] else "Absent"
+
+    for child_id, rows in signed_up_classes_by_child.items():
+        for row in rows:
+            status = attendance_lookup.get((child_id, row["offering_id"]))
+            if status:
+                row["attendance_status"] = status
+
+    waitlist_by_child = {child_id: [] for child_id in child_ids}
+    for row in results["waitlist_rows"]:
+        waitlist_by_child.setdefault(row["child_id"], []).append(row)
+
+    child_parent_notes = {child_id: [] for child_id in child_ids} if child_ids else {}
+    for row in results["parent_notes"]:
+        child_parent_notes.setdefault(row["child_id"], []).append(row)
+
+    # signup_classes already holds every class from today on; the calendar takes its window from
+    # those rows and marks the ones this parent's children are signed up for.
+    calendar_first, calendar_last = calendar_window("two_week", calendar_start)
+    child_names = {child["id"]: child["child_name"] for child in children}
+    class_marks = {}
+    for row in results["signup_rows"]:
+        if calendar_first <= row["class_date"] <= calendar_last:
+            class_marks.setdefault(row["offering_id"], []).append(child_names.get(row["child_id"], ""))
+    calendar_classes = [
+        row for row in results["signup_classes"] if calendar_first <= row["class_date"] <= calendar_last
+    ]
+
+    return {
+        "children": children,
+        "academy_schedule": results["academy_schedule"],
+        "academy_calendar_weeks": _build_calendar(
+            "two_week", calendar_start, results["calendar_shifts"], calendar_classes, class_marks
+        ),
+        "signup_classes": results["signup_classes"],
+        "signed_up_classes_by_child": signed_up_classes_by_child,
+        "waitlist_by_child": waitlist_by_child,
+        "today": date.today(),
+        "max_classes_per_week": MAX_CLASSES_PER_WEEK,
+        "child_parent_notes": child_parent_notes,
+    }
+
+
+@app.route("/parent")
+@login_required
+@role_required("parent")
+def parent_dashboard():
+    # Show parent-facing academy schedule, class signups, attendance, and instructor notes.
+    db = get_db()
+    cur = db.cursor(dictionary=True)
+    _ensure_feature_schema(cur)
+    _ensure_parent_notes_table(cur)
     cur.close()
+
+    calendar_start = date.today()
+    results = run_query_batch(_parent_dashboard_queries(session["user_id"], calendar_start))
     return render_template(
         "parent_dashboard.html",
-        children=children,
-        academy_schedule=academy_schedule,
-        academy_calendar_weeks=academy_calendar_weeks,
-        signup_classes=signup_classes,
-        signed_up_classes_by_child=signed_up_classes_by_child,
-        max_classes_per_week=MAX_CLASSES_PER_WEEK,
-        child_parent_notes=child_parent_notes,
+        **_parent_dashboard_context(results, calendar_start),
     )
 
 
 if __name__ == "__main__":
+    if os.getenv("JOBS_INLINE_WORKER", "1") != "0":
+        # Skip the reloader's watcher process so only the serving process polls the queue.
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            start_inline_worker(__name__)
     app.run(debug=True)
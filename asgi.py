@@ -0,0 +1,296 @@
+import asyncio
+import io
+import os
+import re
+import sys
+from datetime import date
+
+import aiomysql
+from asgiref.wsgi import WsgiToAsgi
+from flask import render_template, request, session
+from werkzeug.exceptions import HTTPException
+
+import app as karate_app
+from db import _connection_config, current_academy_id, database_route
+from events import ASYNC_MAX_STREAMS, get_event_bus, stream_events_async
+from metrics import start_request_timer
+
+# Optional async serving mode, e.g. `uvicorn asgi:app --workers 4`.
+# The read-heavy pages below are served natively on an aiomysql pool, and /events/stream runs
+# on the event loop so open streams hold no threads; every other route,
+# and any request those pages cannot serve (not logged in, wrong role, missing rows),
+# falls through to the unchanged Flask app running on a thread pool.
+flask_app = karate_app.create_app()
+wsgi_fallback = WsgiToAsgi(flask_app)
+
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+# PyMySQL formats parameters with `%`, so literal percent signs (TIME_FORMAT) need doubling.
+_LITERAL_PERCENT = re.compile(r"%(?!s)")
+
+
+async def _fetch_all(pool, sql, params):
+    if params:
+        sql = _LITERAL_PERCENT.sub("%%", sql)
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(sql, params or None)
+            return list(await cur.fetchall())
+
+
+async def run_query_batch_async(pool, queries):
+    # Async counterpart of db.run_query_batch: {name: (sql, params)} -> {name: rows}.
+    rows = await asyncio.gather(*(_fetch_all(pool, sql, params) for sql, params in queries.values()))
+    return dict(zip(queries, rows))
+
+
+async def _parent_dashboard(pool, view_args):
+    calendar_start = date.today()
+    results = await run_query_batch_async(
+        pool, karate_app._parent_dashboard_queries(session["user_id"], calendar_start)
+    )
+    return "parent_dashboard.html", karate_app._parent_dashboard_context(results, calendar_start)
+
+
+async def _employee_dashboard(pool, view_args):
+    calendar_start = date.today()
+    results = await run_query_batch_async(
+        pool, karate_app._employee_dashboard_queries(session["user_id"], calendar_start)
+    )
+    return "employee_dashboard.html", karate_app._employee_dashboard_context(results, calendar_start)
+
+
+async def _manager_dashboard(pool, view_args):
+    calendar_start = date.today()
+    results = await run_query_batch_async(pool, karate_app._manager_dashboard_queries(calendar_start))
+    return "manager_dashboard.html", karate_app._manager_dashboard_context(results, calendar_start)
+
+
+async def _techniques(pool, view_args):
+    selected_track, selected_belt = karate_app._techniques_filter(request.args)
+    results = await run_query_batch_async(
+        pool, karate_app._techniques_queries(selected_track, selected_belt)
+    )
+    return "techniques.html", karate_app._techniques_context(results, selected_track, selected_belt)
+
+
+async def _attendance_summary(pool, view_args):
+    results = await run_query_batch_async(
+        pool, karate_app._attendance_summary_queries(view_args["session_id"])
+    )
+    if results["session_row"]:
+        results.update(await run_query_batch_async(pool, karate_app._attendance_schedule_queries(results)))
+    context = karate_app._attendance_summary_context(results, session.get("role"))
+    if context is None:
+        return None
+    return "attendance_summary.html", context
+
+
+# endpoint -> (roles allowed by the sync view, async handler); GET only.
+ASYNC_VIEWS = {
+    "parent_dashboard": (("parent",), _parent_dashboard),
+    "employee_dashboard": (("employee",), _employee_dashboard),
+    "manager_dashboard": (("manager",), _manager_dashboard),
+    "techniques": (("employee", "manager"), _techniques),
+    "attendance_summary": (("employee", "manager"), _attendance_summary),
+}
+
+
+def _wsgi_environ(scope):
+    # Minimal WSGI environ for a bodiless request so Flask can load the session and build URLs.
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(b""),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+class AsyncDashboardApp:
+    def __init__(self):
+        # One aiomysql pool per database route; None is the default database.
+        self._pools = {}
+        self._pool_lock = asyncio.Lock()
+
+    async def get_pool(self, route=None):
+        if route not in self._pools:
+            async with self._pool_lock:
+                if route not in self._pools:
+                    config = _connection_config(route)
+                    self._pools[route] = await aiomysql.create_pool(
+                        host=config["host"],
+                        port=config["port"],
+                        user=config["user"],
+                        password=config.get("password", ""),
+                        db=config["database"],
+                        charset="utf8mb4",
+                        # Read-only views: autocommit keeps pooled connections off stale snapshots.
+                        autocommit=True,
+                        minsize=min(4, ASYNC_DB_POOL_SIZE),
+                        maxsize=ASYNC_DB_POOL_SIZE,
+                    )
+        return self._pools[route]
+
+    async def close_pool(self):
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+            await pool.wait_closed()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] == "http" and scope["method"] == "GET":
+            match = self._match_async_view(scope)
+            if match is not None and await self._serve_async_view(scope, send, *match):
+                return
+            if match is None and self._match_endpoint(scope) == "events_stream":
+                if await self._serve_events(scope, receive, send):
+                    return
+        await wsgi_fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.get_pool()
+                except Exception as exc:
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.close_pool()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _match_endpoint(self, scope):
+        adapter = flask_app.url_map.bind("localhost", script_name=scope.get("root_path") or None)
+        try:
+            return adapter.match(scope["path"], method="GET")[0]
+        except HTTPException:
+            return None
+
+    def _match_async_view(self, scope):
+        adapter = flask_app.url_map.bind("localhost", script_name=scope.get("root_path") or None)
+        try:
+            endpoint, view_args = adapter.match(scope["path"], method="GET")
+        except HTTPException:
+            return None
+        if endpoint not in ASYNC_VIEWS:
+            return None
+        return endpoint, view_args
+
+    async def _serve_events(self, scope, receive, send):
+        # Event-loop version of app.events_stream; False hands signed-out requests to Flask.
+        ctx = flask_app.request_context(_wsgi_environ(scope))
+        ctx.push()
+        try:
+            if "user_id" not in session:
+                return False
+            channels = karate_app._live_stream_channels()
+            academy_id = current_academy_id()
+        finally:
+            ctx.pop()
+
+        bus = get_event_bus()
+        slot = bus.reserve_stream(ASYNC_MAX_STREAMS) if channels is not None else None
+        if slot is None:
+            # 204 tells EventSource to stop reconnecting.
+            status, headers, body = 204, [], b""
+            if channels is not None:
+                status, headers, body = 503, [(b"retry-after", b"30")], b"Too many live streams."
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return True
+
+        async def wait_for_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect())
+        stream = stream_events_async(bus, channels, academy_id, slot=slot)
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream; charset=utf-8"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            async for chunk in stream:
+                if disconnected.done():
+                    break
+                await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+            if not disconnected.done():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            await stream.aclose()
+            # The stream releases its slot itself unless it never started.
+            slot.release()
+        return True
+
+    async def _serve_async_view(self, scope, send, endpoint, view_args):
+        # Returns False to hand the request to the sync app (auth redirects, not-found flashes).
+        roles, handler = ASYNC_VIEWS[endpoint]
+        ctx = flask_app.request_context(_wsgi_environ(scope))
+        ctx.push()
+        try:
+            # The session picks the academy, and with it the database these reads go to.
+            route = database_route(current_academy_id())
+            if route not in karate_app._feature_schema_routes:
+                return False
+            pool = await self.get_pool(route)
+            # process_response below records the request in /metrics (aiomysql queries are not counted).
+            start_request_timer()
+            if "user_id" not in session or session.get("role") not in roles:
+                return False
+            rendered = await handler(pool, view_args)
+            if rendered is None:
+                return False
+            template_name, context = rendered
+            response = flask_app.make_response(render_template(template_name, **context))
+            response = flask_app.process_response(response)
+        finally:
+            ctx.pop()
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in response.headers.items()
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": response.get_data()})
+        return True
+
+
+app = AsyncDashboardApp()
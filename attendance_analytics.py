@@ -0,0 +1,248 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+FETCH_CHUNK = 10000
+CACHE_ENTRIES = 64
+ID_CHUNK_SIZE = 1000
+
+# (academy_id, start, end, track) -> (session watermark, result). Sessions are append-only,
+# so a cached result stays valid until another session for the academy commits.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _chunks(values, size=ID_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def session_watermark(cur, academy_id):
+    # Index-only on (academy_id, id). Ids are assigned at insert rather than commit, so a
+    # session committing below the current MAX(id) only shows up in the count.
+    cur.execute(
+        "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM attendance_sessions WHERE academy_id = %s",
+        (academy_id,),
+    )
+    count, max_id = cur.fetchone()
+    return int(count), int(max_id)
+
+
+def _seconds(value):
+    # TIME columns arrive as timedelta.
+    return int(value.total_seconds()) if hasattr(value, "total_seconds") else 0
+
+
+def _load_rows(cur, academy_id, start_date, end_date, program_track):
+    # One streaming read of every roster row in range, encoded straight into integer columns.
+    query = """
+        SELECT ats.id, ats.class_name, ats.class_date, ats.start_time,
+               COALESCE(co.instructor_user_id, ats.staff_user_id), ast.child_id, ast.is_present
+        FROM attendance_sessions ats
+        JOIN attendance_students ast ON ast.attendance_session_id = ats.id
+        LEFT JOIN class_offerings co ON co.id = ats.offering_id
+        WHERE ats.academy_id = %s
+          AND ats.class_date BETWEEN %s AND %s
+    """
+    params = (academy_id, start_date, end_date)
+    if program_track:
+        query += " AND co.program_track = %s"
+        params += (program_track,)
+    query += " ORDER BY ats.class_date, ats.start_time, ats.id"
+    cur.execute(query, params)
+
+    class_codes = {}
+    columns = [[] for _ in range(7)]
+    while True:
+        rows = cur.fetchmany(FETCH_CHUNK)
+        if not rows:
+            break
+        for session_id, class_name, class_date, start_time, instructor_id, child_id, is_present in rows:
+            columns[0].append(session_id)
+            columns[1].append(class_codes.setdefault(class_name, len(class_codes)))
+            columns[2].append(class_date.toordinal())
+            columns[3].append(_seconds(start_time) // 3600)
+            columns[4].append(instructor_id or 0)
+            columns[5].append(child_id)
+            columns[6].append(1 if is_present else 0)
+    arrays = [np.array(column, dtype=np.int64) for column in columns]
+    class_names = sorted(class_codes, key=class_codes.get)
+    return arrays, class_names
+
+
+def _session_rows(session_ids):
+    # The ORDER BY keeps each session's roster contiguous: first row of each session, and each
+    # row's session position.
+    new_session = np.empty(len(session_ids), dtype=bool)
+    new_session[:1] = True
+    new_session[1:] = session_ids[1:] != session_ids[:-1]
+    return np.flatnonzero(new_session), np.cumsum(new_session) - 1
+
+
+def _class_rates(first_row, class_code, present, class_names):
+    class_count = len(class_names)
+    roster = np.bincount(class_code, minlength=class_count)
+    attended = np.bincount(class_code, weights=present, minlength=class_count)
+    sessions = np.bincount(class_code[first_row], minlength=class_count)
+    return sorted(
+        (
+            {
+                "class_name": class_names[code],
+                "sessions": int(sessions[code]),
+                "roster_entries": int(roster[code]),
+                "attended": int(attended[code]),
+                "attendance_rate": round(float(attended[code] / roster[code]) * 100, 1),
+            }
+            for code in range(class_count)
+            if roster[code]
+        ),
+        key=lambda row: row["class_name"],
+    )
+
+
+def _child_streaks(child_ids, present):
+    # Rows arrive in class order; sorting on (child, row position) keeps each child's history
+    # in order, and the unique keys let the faster default sort stand in for a stable one.
+    order = np.argsort(child_ids * len(child_ids) + np.arange(len(child_ids)))
+    child = child_ids[order]
+    attended = present[order]
+    new_child = np.empty(len(child), dtype=bool)
+    new_child[0] = True
+    new_child[1:] = child[1:] != child[:-1]
+    new_run = new_child.copy()
+    new_run[1:] |= attended[1:] != attended[:-1]
+    run_id = np.cumsum(new_run) - 1
+    run_start = np.flatnonzero(new_run)
+    run_length = np.diff(np.append(run_start, len(child)))
+    run_present = attended[run_start] == 1
+
+    child_start = np.flatnonzero(new_child)
+    unique_children = child[child_start]
+    row_pos = np.cumsum(new_child) - 1
+    child_pos = row_pos[run_start]
+    longest = np.zeros(len(unique_children), dtype=np.int64)
+    np.maximum.at(longest, child_pos[run_present], run_length[run_present])
+    last_run = run_id[np.append(child_start[1:], len(child)) - 1]
+    current = np.where(run_present[last_run], run_length[last_run], 0)
+    classes = np.diff(np.append(child_start, len(child)))
+    attended_total = np.bincount(row_pos, weights=attended, minlength=len(unique_children))
+    return [
+        {
+            "child_id": int(unique_children[pos]),
+            "classes": int(classes[pos]),
+            "attended": int(attended_total[pos]),
+            "absences": int(classes[pos] - attended_total[pos]),
+            "current_streak": int(current[pos]),
+            "longest_streak": int(longest[pos]),
+        }
+        for pos in range(len(unique_children))
+    ]
+
+
+def _no_show_grid(day_ordinal, hour, present):
+    # date.toordinal() is 1 on a Monday, so (ordinal - 1) % 7 is the Monday-based weekday.
+    cell = ((day_ordinal - 1) % 7) * 24 + hour
+    roster = np.bincount(cell, minlength=7 * 24)
+    missed = np.bincount(cell, weights=1 - present, minlength=7 * 24)
+    return [
+        {
+            "weekday": WEEKDAYS[code // 24],
+            "hour": int(code % 24),
+            "roster_entries": int(roster[code]),
+            "no_shows": int(missed[code]),
+            "no_show_rate": round(float(missed[code] / roster[code]) * 100, 1),
+        }
+        for code in np.flatnonzero(roster)
+    ]
+
+
+def _instructor_sizes(first_row, session_pos, instructor_ids, present):
+    class_size = np.bincount(session_pos, weights=present, minlength=len(first_row))
+    session_instructor = instructor_ids[first_row]
+    instructors, instructor_pos = np.unique(session_instructor, return_inverse=True)
+    count = np.bincount(instructor_pos, minlength=len(instructors))
+    total = np.bincount(instructor_pos, weights=class_size, minlength=len(instructors))
+    largest = np.zeros(len(instructors))
+    np.maximum.at(largest, instructor_pos, class_size)
+    return [
+        {
+            "instructor_id": int(instructors[pos]),
+            "sessions": int(count[pos]),
+            "average_size": round(float(total[pos] / count[pos]), 1),
+            "largest_size": int(largest[pos]),
+        }
+        for pos in range(len(instructors))
+        if instructors[pos]
+    ]
+
+
+def _names(cur, query, ids):
+    names = {}
+    for chunk in _chunks(sorted(ids)):
+        cur.execute(query.format(placeholders=", ".join(["%s"] * len(chunk))), tuple(chunk))
+        names.update((row[0], row[1]) for row in cur.fetchall())
+    return names
+
+
+def compute_attendance_analytics(cur, academy_id, start_date, end_date, program_track=None):
+    # `cur` must be a tuple (non-dictionary) cursor.
+    (session_ids, class_code, day, hour, instructor_ids, child_ids, present), class_names = _load_rows(
+        cur, academy_id, start_date, end_date, program_track
+    )
+    result = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "program_track": program_track,
+        "sessions": 0,
+        "roster_entries": int(len(session_ids)),
+        "classes": [],
+        "children": [],
+        "no_shows": [],
+        "instructors": [],
+    }
+    if not len(session_ids):
+        return result
+
+    first_row, session_pos = _session_rows(session_ids)
+    result["sessions"] = len(first_row)
+    result["classes"] = _class_rates(first_row, class_code, present, class_names)
+    result["children"] = _child_streaks(child_ids, present)
+    result["no_shows"] = _no_show_grid(day, hour, present)
+    result["instructors"] = _instructor_sizes(first_row, session_pos, instructor_ids, present)
+
+    child_names = _names(cur, "SELECT id, child_name FROM children WHERE id IN ({placeholders})",
+                         [row["child_id"] for row in result["children"]])
+    for row in result["children"]:
+        row["child_name"] = child_names.get(row["child_id"], f"#{row['child_id']}")
+    result["children"].sort(key=lambda row: (-row["absences"], row["child_name"]))
+    instructor_names = _names(cur, "SELECT id, username FROM users WHERE id IN ({placeholders})",
+                              [row["instructor_id"] for row in result["instructors"]])
+    for row in result["instructors"]:
+        row["instructor"] = instructor_names.get(row["instructor_id"], f"#{row['instructor_id']}")
+    result["instructors"].sort(key=lambda row: row["instructor"])
+    return result
+
+
+def attendance_analytics(cur, academy_id, start_date, end_date, program_track=None, on_lookup=None):
+    # Cached compute_attendance_analytics; a newly closed session for the academy invalidates it.
+    key = (academy_id, start_date, end_date, program_track or None)
+    watermark = session_watermark(cur, academy_id)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == watermark:
+            _cache.move_to_end(key)
+    hit = cached is not None and cached[0] == watermark
+    if on_lookup:
+        on_lookup(hit)
+    if hit:
+        return cached[1]
+
+    result = compute_attendance_analytics(cur, academy_id, start_date, end_date, program_track)
+    with _cache_lock:
+        _cache[key] = (watermark, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,155 @@
+"""Measure /attendance/sync throughput on a backlog of queued offline attendance sessions.
+
+The benchmark records real attendance, so point the app at a scratch copy of the seeded
+database. Then run from the repository root:
+
+    gunicorn -c gunicorn.conf.py -b 127.0.0.1:8000 wsgi:app
+    python benchmarks/bench_attendance_sync.py --sessions 500 --batch 100
+
+Sessions are generated from class rosters read straight from the database, the way a
+tablet would have queued them. Every batch is then sent a second time; the replay must
+come back entirely as duplicates.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import DEFAULT_ACADEMY_ID, connect_db  # noqa: E402
+
+
+def login(base_url, username, password):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    opener.open(f"{base_url}/login", data=body, timeout=30).read()
+    if not any(cookie.name == "session" for cookie in jar):
+        raise SystemExit(f"Login as {username!r} failed against {base_url}.")
+    return opener
+
+
+def load_rosters(academy_id):
+    db = connect_db(academy_id)
+    try:
+        cur = db.cursor()
+        cur.execute(
+            """
+            SELECT ce.offering_id, ce.child_id
+            FROM class_enrollments ce
+            JOIN class_offerings co ON co.id = ce.offering_id
+            WHERE co.academy_id = %s
+            ORDER BY ce.offering_id, ce.child_id
+            """,
+            (academy_id,),
+        )
+        rosters = {}
+        for offering_id, child_id in cur.fetchall():
+            rosters.setdefault(offering_id, []).append(child_id)
+        cur.execute("SELECT id FROM techniques WHERE academy_id = %s AND is_active = 1", (academy_id,))
+        technique_ids = [row[0] for row in cur.fetchall()]
+        cur.close()
+        return rosters, technique_ids
+    finally:
+        db.close()
+
+
+def generate_sessions(rosters, technique_ids, count, apply_share, seed):
+    rng = random.Random(seed)
+    offering_ids = sorted(rosters)
+    sessions = []
+    for _ in range(count):
+        offering_id = rng.choice(offering_ids)
+        roster = rosters[offering_id]
+        present = [child_id for child_id in roster if rng.random() < 0.85] or roster[:1]
+        apply = technique_ids and rng.random() < apply_share
+        sessions.append(
+            {
+                "client_id": str(uuid.uuid4()),
+                "offering_id": offering_id,
+                "action": "close_and_apply" if apply else "save_attendance",
+                "present_child_ids": present,
+                "bulk_technique_ids": [],
+                "students": {
+                    str(child_id): {
+                        "technique_ids": rng.sample(technique_ids, min(2, len(technique_ids))) if apply else [],
+                        "increment": 1,
+                    }
+                    for child_id in present
+                },
+            }
+        )
+    return sessions
+
+
+def post_batch(opener, base_url, batch, timeout):
+    request = urllib.request.Request(
+        f"{base_url}/attendance/sync",
+        data=json.dumps({"sessions": batch}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    started = time.perf_counter()
+    with opener.open(request, timeout=timeout) as response:
+        payload = json.loads(response.read())
+    return payload["results"], time.perf_counter() - started
+
+
+def run_pass(opener, base_url, sessions, batch_size, timeout):
+    statuses = {}
+    latencies = []
+    started = time.perf_counter()
+    for start in range(0, len(sessions), batch_size):
+        results, elapsed = post_batch(opener, base_url, sessions[start:start + batch_size], timeout)
+        latencies.append(elapsed)
+        for result in results:
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    return statuses, latencies, time.perf_counter() - started
+
+
+def report(label, session_count, statuses, latencies, wall_seconds):
+    print(
+        f"{label:<7} sessions={session_count} batches={len(latencies)} wall={wall_seconds:.2f}s "
+        f"throughput={session_count / wall_seconds if wall_seconds else 0:.1f} sessions/s "
+        f"batch_mean={statistics.fmean(latencies) * 1000 if latencies else 0:.0f}ms "
+        f"batch_max={max(latencies) * 1000 if latencies else 0:.0f}ms statuses={statuses}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", default="employee1")
+    parser.add_argument("--password", default="employee123")
+    parser.add_argument("--academy", type=int, default=DEFAULT_ACADEMY_ID)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=100, help="sessions per sync request")
+    parser.add_argument("--apply-share", type=float, default=0.3,
+                        help="share of sessions that close the class and apply techniques")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    rosters, technique_ids = load_rosters(args.academy)
+    if not rosters:
+        raise SystemExit("No class has enrolled students; seed the database first.")
+    sessions = generate_sessions(rosters, technique_ids, args.sessions, args.apply_share, args.seed)
+    opener = login(args.base_url, args.username, args.password)
+
+    statuses, latencies, wall_seconds = run_pass(opener, args.base_url, sessions, args.batch, args.timeout)
+    report("sync", len(sessions), statuses, latencies, wall_seconds)
+    statuses, latencies, wall_seconds = run_pass(opener, args.base_url, sessions, args.batch, args.timeout)
+    report("replay", len(sessions), statuses, latencies, wall_seconds)
+    print(f"replay_all_duplicates={statuses == {'duplicate': len(sessions)}}")
+
+
+if __name__ == "__main__":
+    main()
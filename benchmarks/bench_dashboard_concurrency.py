@@ -0,0 +1,129 @@
+"""Compare dashboard latency and throughput between the sync (WSGI) and async (ASGI) servers.
+
+Start both servers against the same seeded database, then run from the repository root:
+
+    gunicorn -c gunicorn.conf.py -b 127.0.0.1:8000 wsgi:app
+    uvicorn asgi:app --port 8001 --workers 4
+    python benchmarks/bench_dashboard_concurrency.py --clients 500 --path /parent
+
+Each client logs in once (sessions are shared per server) and then issues
+--requests GETs back to back; all clients start at the same time.
+"""
+import argparse
+import asyncio
+import http.cookiejar
+import statistics
+import time
+import urllib.parse
+import urllib.request
+
+
+def login(base_url, username, password):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    body = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    opener.open(f"{base_url}/login", data=body, timeout=30).read()
+    cookie = "; ".join(f"{c.name}={c.value}" for c in jar)
+    if "session=" not in cookie:
+        raise SystemExit(f"Login as {username!r} failed against {base_url}.")
+    return cookie
+
+
+async def fetch(host, port, path, cookie, timeout):
+    started = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(
+            (
+                f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nCookie: {cookie}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+        )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status = int(response.split(b" ", 2)[1]) if response.startswith(b"HTTP/") else 0
+    return status, time.perf_counter() - started
+
+
+async def client(host, port, path, cookie, request_count, timeout, start_event, latencies, errors):
+    await start_event.wait()
+    for _ in range(request_count):
+        try:
+            status, elapsed = await fetch(host, port, path, cookie, timeout)
+        except (OSError, asyncio.TimeoutError):
+            errors.append("connection")
+            continue
+        if status != 200:
+            errors.append(str(status))
+            continue
+        latencies.append(elapsed)
+
+
+async def run_load(base_url, path, cookie, clients, request_count, timeout):
+    parsed = urllib.parse.urlparse(base_url)
+    latencies = []
+    errors = []
+    start_event = asyncio.Event()
+    tasks = [
+        asyncio.create_task(
+            client(
+                parsed.hostname, parsed.port or 80, path, cookie,
+                request_count, timeout, start_event, latencies, errors,
+            )
+        )
+        for _ in range(clients)
+    ]
+    started = time.perf_counter()
+    start_event.set()
+    await asyncio.gather(*tasks)
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def report(label, latencies, errors, wall_seconds):
+    ok = len(latencies)
+    print(
+        f"{label:<6} ok={ok} errors={len(errors)} wall={wall_seconds:.2f}s "
+        f"throughput={ok / wall_seconds if wall_seconds else 0:.1f} req/s "
+        f"p50={percentile(latencies, 50) * 1000:.0f}ms p95={percentile(latencies, 95) * 1000:.0f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.0f}ms "
+        f"mean={statistics.fmean(latencies) * 1000 if latencies else 0:.0f}ms"
+    )
+    if errors:
+        kinds = {kind: errors.count(kind) for kind in set(errors)}
+        print(f"       error breakdown: {kinds}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sync-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--async-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--path", default="/parent")
+    parser.add_argument("--username", default="parent1")
+    parser.add_argument("--password", default="parent123")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5, help="requests per client")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"path={args.path} clients={args.clients} requests_per_client={args.requests}")
+    for label, base_url in (("sync", args.sync_url), ("async", args.async_url)):
+        if not base_url:
+            continue
+        cookie = login(base_url, args.username, args.password)
+        latencies, errors, wall_seconds = asyncio.run(
+            run_load(base_url, args.path, cookie, args.clients, args.requests, args.timeout)
+        )
+        report(label, latencies, errors, wall_seconds)
+
+
+if __name__ == "__main__":
+    main()
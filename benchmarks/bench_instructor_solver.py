@@ -0,0 +1,109 @@
+"""Benchmark the instructor assignment solver on generated monthly schedules.
+
+Run from the repository root:
+
+    python benchmarks/bench_instructor_solver.py --offerings 3000 --employees 60
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instructor_solver import solve_assignments  # noqa: E402
+
+TRACKS = ("little_dragons", "kids_martial_arts", "teen_martial_arts", "adult_martial_arts")
+
+
+def generate_month(offering_count, employee_count, fixed_ratio, seed):
+    rng = random.Random(seed)
+    month_start = date(2026, 3, 1)
+    employee_ids = list(range(1, employee_count + 1))
+    offerings = []
+    for offering_id in range(1, offering_count + 1):
+        class_date = month_start + timedelta(days=rng.randrange(28))
+        start_hour = rng.randrange(9, 20)
+        duration = rng.choice((45, 60, 90))
+        start_time = timedelta(hours=start_hour, minutes=rng.choice((0, 30)))
+        offerings.append(
+            {
+                "id": offering_id,
+                "class_date": class_date,
+                "start_time": start_time,
+                "end_time": start_time + timedelta(minutes=duration),
+                "program_track": rng.choice(TRACKS),
+                "instructor_user_id": None,
+            }
+        )
+
+    # Fix a share of offerings to instructors without creating overlaps.
+    taken = {}
+    for row in offerings:
+        if rng.random() >= fixed_ratio:
+            continue
+        employee_id = rng.choice(employee_ids)
+        key = (employee_id, row["class_date"])
+        window = (row["start_time"], row["end_time"])
+        if any(start < window[1] and end > window[0] for start, end in taken.get(key, [])):
+            continue
+        taken.setdefault(key, []).append(window)
+        row["instructor_user_id"] = employee_id
+
+    track_experience = {}
+    for employee_id in employee_ids:
+        for track in rng.sample(TRACKS, 2):
+            track_experience[(employee_id, track)] = rng.randrange(1, 20)
+    return offerings, employee_ids, track_experience
+
+
+def verify_no_overlaps(offerings, assignments):
+    slots = {}
+    for row in offerings:
+        employee_id = row["instructor_user_id"] or assignments.get(row["id"])
+        if employee_id is None:
+            continue
+        slots.setdefault((employee_id, row["class_date"]), []).append((row["start_time"], row["end_time"]))
+    for intervals in slots.values():
+        intervals.sort()
+        for (_, prev_end), (next_start, _) in zip(intervals, intervals[1:]):
+            if next_start < prev_end:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offerings", type=int, default=3000)
+    parser.add_argument("--employees", type=int, default=60)
+    parser.add_argument("--fixed-ratio", type=float, default=0.1)
+    parser.add_argument("--budget", type=float, default=5.0, help="local search seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    offerings, employee_ids, track_experience = generate_month(
+        args.offerings, args.employees, args.fixed_ratio, args.seed
+    )
+    started = time.perf_counter()
+    result = solve_assignments(
+        offerings,
+        employee_ids,
+        track_experience=track_experience,
+        time_budget=args.budget,
+        seed=args.seed,
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"offerings={result['offerings']} fixed={result['fixed']} employees={len(employee_ids)}")
+    print(f"greedy_score={result['greedy_score']} final_score={result['score']} accepted_moves={result['accepted_moves']}")
+    print(
+        f"assigned={result['assigned']} unassigned={result['unassigned']} "
+        f"track_matches={result['track_matches']} weekly_hours_stddev={result['weekly_hours_stddev']}"
+    )
+    print(f"no_overlaps={verify_no_overlaps(offerings, result['assignments'])} elapsed={elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark progress ledger replay on a generated event history.
+
+Run from the repository root:
+
+    python benchmarks/bench_progress_replay.py --children 20000 --events-per-child 60
+
+Only the fold is measured; `flask --app app rebuild-progress` prints end-to-end timings
+against a real database.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progress_ledger import REPLAY_CHILD_BATCH, fold_progress_events  # noqa: E402
+
+LEARNED_TARGET = 3
+
+
+def generate_ledger(child_count, events_per_child, technique_count, seed):
+    # Events in append (id) order, interleaving children the way classes do.
+    rng = random.Random(seed)
+    started = datetime(2025, 9, 1, 16, 0)
+    open_rows = {child_id: {} for child_id in range(1, child_count + 1)}
+    events = []
+    next_progress_id = 1
+    for step in range(events_per_child * child_count):
+        child_id = rng.randrange(1, child_count + 1)
+        rows = open_rows[child_id]
+        event = {
+            "id": step + 1,
+            "child_id": child_id,
+            "created_at": started + timedelta(minutes=step),
+            "actor_user_id": 2,
+            "learned_delta": 0,
+            "learned_count": None,
+            "completed": None,
+            "completed_at": None,
+            "notes": None,
+        }
+        roll = rng.random()
+        if not rows or roll < 0.15:
+            technique_id = rng.randrange(1, technique_count + 1)
+            event.update(event_type="assigned", progress_id=next_progress_id, technique_id=technique_id,
+                         learned_delta=rng.randint(1, 2))
+            rows[next_progress_id] = technique_id
+            next_progress_id += 1
+        else:
+            progress_id = rng.choice(list(rows))
+            event.update(progress_id=progress_id, technique_id=rows[progress_id])
+            if roll < 0.9:
+                event.update(event_type="learned", learned_delta=1, notes="Attendance")
+            elif roll < 0.97:
+                event.update(event_type="corrected", learned_count=rng.randint(0, LEARNED_TARGET), notes="Fixed")
+            else:
+                event.update(event_type="removed")
+                del rows[progress_id]
+        events.append(event)
+    return events
+
+
+def replay_in_batches(events, batch_size):
+    # Same order and batching as rebuild_progress_projection.
+    ordered = sorted(events, key=lambda event: (event["child_id"], event["progress_id"], event["id"]))
+    states = {}
+    batch, batch_children = [], set()
+    for event in ordered:
+        if event["child_id"] not in batch_children and len(batch_children) >= batch_size:
+            states.update(fold_progress_events(batch, LEARNED_TARGET))
+            batch, batch_children = [], set()
+        batch.append(event)
+        batch_children.add(event["child_id"])
+    states.update(fold_progress_events(batch, LEARNED_TARGET))
+    return states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--children", type=int, default=20000)
+    parser.add_argument("--events-per-child", type=int, default=60)
+    parser.add_argument("--techniques", type=int, default=120)
+    parser.add_argument("--batch", type=int, default=REPLAY_CHILD_BATCH)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    events = generate_ledger(args.children, args.events_per_child, args.techniques, args.seed)
+
+    started = time.perf_counter()
+    replayed = replay_in_batches(events, args.batch)
+    elapsed = time.perf_counter() - started
+
+    # The incremental path folds one event at a time in ledger order; replay must agree.
+    incremental = fold_progress_events(events, LEARNED_TARGET)
+
+    print(f"children={args.children} events={len(events)} rows={len(replayed)} batch={args.batch}")
+    print(f"elapsed={elapsed:.2f}s events_per_second={len(events) / max(elapsed, 1e-9):,.0f}")
+    print(f"matches_incremental={replayed == incremental}")
+
+
+if __name__ == "__main__":
+    main()
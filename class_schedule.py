@@ -0,0 +1,123 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+CACHE_DAYS = 512
+
+# (academy_id, class_date) -> (watermark, keys) where keys is the day's offerings as sorted
+# (start_seconds, offering_id) tuples. Offerings are only ever inserted, never moved or
+# deleted, so the day's (COUNT(*), MAX(id)) changes exactly when its list does. MAX(id) alone
+# misses an offering that commits after a higher id was already visible.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _seconds(value):
+    # TIME columns arrive as timedelta.
+    return int(value.total_seconds()) if hasattr(value, "total_seconds") else 0
+
+
+def schedule_days_query(academy_id, day_sql, day_params):
+    # (sql, params) for the watermark of `day` and of the nearest class days either side.
+    # `day_sql` is a placeholder or a subquery yielding the day; each lookup is index-only.
+    return (
+        f"""
+        SELECT class_date, COUNT(*) AS offering_count, MAX(id) AS last_id
+        FROM class_offerings
+        WHERE academy_id = %s
+          AND class_date IN (
+              {day_sql},
+              (SELECT MAX(class_date) FROM class_offerings WHERE academy_id = %s AND class_date < {day_sql}),
+              (SELECT MIN(class_date) FROM class_offerings WHERE academy_id = %s AND class_date > {day_sql})
+          )
+        GROUP BY class_date
+        """,
+        (academy_id, *day_params, academy_id, *day_params, academy_id, *day_params),
+    )
+
+
+def _watermark(row):
+    return row["offering_count"], row["last_id"]
+
+
+def day_offerings_query(academy_id, days):
+    placeholders = ", ".join(["%s"] * len(days))
+    return (
+        f"""
+        SELECT id, class_date, start_time
+        FROM class_offerings
+        WHERE academy_id = %s AND class_date IN ({placeholders})
+        ORDER BY class_date, start_time, id
+        """,
+        (academy_id, *days),
+    )
+
+
+def cached_days(academy_id, day_rows, on_lookup=None):
+    # Split schedule_days_query rows into cached lists {day: keys} and the days still to load.
+    lists, missing = {}, []
+    with _cache_lock:
+        for row in day_rows:
+            cache_key = (academy_id, row["class_date"])
+            cached = _cache.get(cache_key)
+            hit = cached is not None and cached[0] == _watermark(row)
+            if hit:
+                _cache.move_to_end(cache_key)
+                lists[row["class_date"]] = cached[1]
+            else:
+                missing.append(row["class_date"])
+            if on_lookup:
+                on_lookup(hit)
+    return lists, missing
+
+
+def store_days(academy_id, day_rows, offering_rows):
+    # Cache lists loaded by day_offerings_query under the watermarks they were checked against.
+    lists = {row["class_date"]: [] for row in day_rows}
+    for row in offering_rows:
+        if row["class_date"] in lists:
+            lists[row["class_date"]].append((_seconds(row["start_time"]), row["id"]))
+    with _cache_lock:
+        for row in day_rows:
+            day = row["class_date"]
+            lists[day].sort()
+            _cache[(academy_id, day)] = (_watermark(row), lists[day])
+            _cache.move_to_end((academy_id, day))
+        while len(_cache) > CACHE_DAYS:
+            _cache.popitem(last=False)
+    return lists
+
+
+def adjacent_offerings(lists, day, start_time, offering_id):
+    # (previous_id, next_id) around one offering in (class_date, start_time, id) order, given
+    # the lists for its day and the nearest class day on either side.
+    key = (_seconds(start_time), offering_id)
+    same_day = lists.get(day, [])
+    earlier = [other for other in lists if other < day and lists[other]]
+    later = [other for other in lists if other > day and lists[other]]
+
+    position = bisect_right(same_day, key)
+    if position < len(same_day):
+        next_id = same_day[position][1]
+    else:
+        next_id = lists[min(later)][0][1] if later else None
+    position = bisect_left(same_day, key)
+    if position > 0:
+        previous_id = same_day[position - 1][1]
+    else:
+        previous_id = lists[max(earlier)][-1][1] if earlier else None
+    return previous_id, next_id
+
+
+def neighbouring_offerings(cur, academy_id, day, start_time, offering_id, on_lookup=None):
+    # Cursor-based adjacent_offerings for views that are not running a query batch.
+    sql, params = schedule_days_query(academy_id, "%s", (day,))
+    cur.execute(sql, params)
+    day_rows = cur.fetchall()
+    lists, missing = cached_days(academy_id, day_rows, on_lookup)
+    if missing:
+        sql, params = day_offerings_query(academy_id, missing)
+        cur.execute(sql, params)
+        loaded_rows = [row for row in day_rows if row["class_date"] in missing]
+        lists.update(store_days(academy_id, loaded_rows, cur.fetchall()))
+    return adjacent_offerings(lists, day, start_time, offering_id)
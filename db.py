@@ -1,8 +1,13 @@
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from flask import g
+from flask import g, has_request_context, session
 import mysql.connector
+from mysql.connector import pooling
 
 
 def _load_env_file() -> None:
@@ -23,35 +28,314 @@ def _load_env_file() -> None:
             os.environ[key] = value
 
 
-def get_db():
-    if "db" not in g:
+# Academy used for rows created before locations existed and for requests without a session.
+DEFAULT_ACADEMY_ID = 1
+_academy_databases = None
+
+
+def _academy_database_overrides() -> dict:
+    # ACADEMY_DATABASES='{"2": {"host": "fresno-db", "database": "karate_fresno"}}' moves an academy
+    # to its own MySQL instance; academies not listed share the default database.
+    global _academy_databases
+    if _academy_databases is None:
         _load_env_file()
+        raw = os.getenv("ACADEMY_DATABASES", "").strip()
+        _academy_databases = {int(key): value for key, value in json.loads(raw).items()} if raw else {}
+    return _academy_databases
+
+
+def database_route(academy_id=None):
+    # Key of the database holding an academy's rows; None is the default database.
+    academy_id = DEFAULT_ACADEMY_ID if academy_id is None else int(academy_id)
+    return academy_id if academy_id in _academy_database_overrides() else None
+
+
+def routed_academy_ids():
+    return sorted(_academy_database_overrides())
+
+
+def current_academy_id() -> int:
+    # Academy every request-scoped query is filtered by: the signed-in user's location.
+    if not has_request_context():
+        return DEFAULT_ACADEMY_ID
+    if "academy_id" not in g:
+        g.academy_id = int(session.get("academy_id") or DEFAULT_ACADEMY_ID)
+    return g.academy_id
+
+
+def select_academy(academy_id):
+    # Switch the request to another academy (sign-in), reconnecting if it lives on another database.
+    academy_id = int(academy_id)
+    if "db" in g and g.get("db_route") != database_route(academy_id):
+        close_db()
+    g.academy_id = academy_id
+
+
+def _connection_config(route=None) -> dict:
+    _load_env_file()
+
+    config = {
+        "host": os.getenv("MYSQL_HOST", "localhost"),
+        "port": int(os.getenv("MYSQL_PORT", "3306")),
+        "user": os.getenv("MYSQL_USER", "root"),
+        "database": os.getenv("MYSQL_DATABASE", "karate_academy"),
+        "autocommit": False,
+    }
 
-        config = {
-            "host": os.getenv("MYSQL_HOST", "localhost"),
-            "port": int(os.getenv("MYSQL_PORT", "3306")),
-            "user": os.getenv("MYSQL_USER", "root"),
-            "database": os.getenv("MYSQL_DATABASE", "karate_academy"),
-            "autocommit": False,
-        }
+    password = os.getenv("MYSQL_PASSWORD", "")
+    if password:
+        config["password"] = password
+    if route is not None:
+        overrides = dict(_academy_database_overrides()[route])
+        if "port" in overrides:
+            overrides["port"] = int(overrides["port"])
+        config.update(overrides)
+    return config
 
-        password = os.getenv("MYSQL_PASSWORD", "")
-        if password:
-            config["password"] = password
 
+def connect_db(academy_id=None):
+    # Open a standalone connection for code running outside a request (background jobs).
+    try:
+        return mysql.connector.connect(**_connection_config(database_route(academy_id)))
+    except mysql.connector.Error as exc:
+        if getattr(exc, "errno", None) == 1045:
+            raise RuntimeError(
+                "MySQL login failed (1045). Set MYSQL_USER and MYSQL_PASSWORD in a .env file "
+                "or export them in your shell before running python app.py."
+            ) from exc
+        raise
+
+
+class QueryStats:
+    # SQL statement count and time for one request, including its query batch threads.
+    # `listener(operation, seconds, cursor)` may return a span whose rows the cursor keeps counting.
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds, operation=None, cursor=None):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+        if self.listener is not None:
+            return self.listener(operation, seconds, cursor)
+        return None
+
+
+class _TimedCursor:
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+        self._span = None
+
+    def _timed(self, method, operation, args, kwargs):
+        started = time.perf_counter()
         try:
-            g.db = mysql.connector.connect(**config)
-        except mysql.connector.Error as exc:
-            if getattr(exc, "errno", None) == 1045:
-                raise RuntimeError(
-                    "MySQL login failed (1045). Set MYSQL_USER and MYSQL_PASSWORD in a .env file "
-                    "or export them in your shell before running python app.py."
-                ) from exc
-            raise
+            return method(operation, *args, **kwargs)
+        finally:
+            self._span = self._stats.record(time.perf_counter() - started, operation, self._cursor)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, args, kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, args, kwargs)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if self._span is not None and row is not None:
+            self._span.add_rows(1)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self._span is not None:
+            self._span.add_rows(len(rows))
+        return rows
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        if self._span is not None:
+            self._span.add_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    # Connection wrapper whose cursors report into the request's QueryStats.
+
+    def __init__(self, cnx, stats):
+        self._cnx = cnx
+        self._stats = stats
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._cnx.cursor(*args, **kwargs), self._stats)
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+
+def query_stats():
+    if "query_stats" not in g:
+        g.query_stats = QueryStats()
+    return g.query_stats
+
+
+# Per-process request connection pools, one per database route; disabled (one connection per
+# request) when DB_POOL_SIZE is 0. Size the pool as request threads + QUERY_BATCH_WORKERS:
+# batch reads never hold more than QUERY_BATCH_WORKERS connections at once, so every request
+# thread can still check out its own.
+QUERY_BATCH_WORKERS = int(os.getenv("QUERY_BATCH_WORKERS", "4"))
+_batch_slots = threading.BoundedSemaphore(max(1, QUERY_BATCH_WORKERS))
+_pools = {}
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pool_in_use = 0
+_batch_executor = None
+_batch_executor_pid = None
+
+
+def _get_pool(route=None):
+    global _pools, _pool_pid
+    size = min(int(os.getenv("DB_POOL_SIZE", "0")), pooling.CNX_POOL_MAXSIZE)
+    if size <= 0:
+        return None
+    # Sockets must not be shared across fork, so each worker process builds its own pools.
+    if route not in _pools or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pools = {}
+                _pool_pid = os.getpid()
+            if route not in _pools:
+                suffix = "" if route is None else f"_{route}"
+                _pools[route] = pooling.MySQLConnectionPool(
+                    pool_name=f"karate_{os.getpid()}{suffix}",
+                    pool_size=size,
+                    **_connection_config(route),
+                )
+    return _pools[route]
+
+
+def prime_pool():
+    # Creating a pool opens all of its connections up front; routed academies get their own pool.
+    primed = _get_pool() is not None
+    for academy_id in routed_academy_ids():
+        _get_pool(database_route(academy_id))
+    return primed
+
+
+def pool_status():
+    if not _pools or _pool_pid != os.getpid():
+        return {"enabled": int(os.getenv("DB_POOL_SIZE", "0")) > 0, "size": 0, "in_use": 0}
+    size = sum(pool.pool_size for pool in _pools.values())
+    return {"enabled": True, "size": size, "in_use": _pool_in_use}
+
+
+def get_db():
+    global _pool_in_use
+    if "db" not in g:
+        route = database_route(current_academy_id())
+        pool = _get_pool(route)
+        if pool is None:
+            cnx = connect_db(current_academy_id())
+        else:
+            try:
+                cnx = pool.get_connection()
+                with _pool_lock:
+                    _pool_in_use += 1
+                g.db_pooled = True
+            except mysql.connector.errors.PoolError:
+                # Pool exhausted: fall back to a one-off connection rather than failing the request.
+                cnx = connect_db(current_academy_id())
+        g.db = _TimedConnection(cnx, query_stats())
+        g.db_route = route
     return g.db
 
 
 def close_db(_=None):
+    global _pool_in_use
     db = g.pop("db", None)
-    if db is not None and db.is_connected():
+    g.pop("db_route", None)
+    if g.pop("db_pooled", False):
+        # Pooled connections are reset and handed back; the pool reconnects dead ones on checkout.
+        with _pool_lock:
+            _pool_in_use -= 1
         db.close()
+    elif db is not None and db.is_connected():
+        db.close()
+
+
+def _get_batch_executor():
+    global _batch_executor, _batch_executor_pid
+    if _batch_executor is None or _batch_executor_pid != os.getpid():
+        with _pool_lock:
+            if _batch_executor is None or _batch_executor_pid != os.getpid():
+                _batch_executor = ThreadPoolExecutor(
+                    max_workers=max(1, QUERY_BATCH_WORKERS),
+                    thread_name_prefix="query-batch",
+                )
+                _batch_executor_pid = os.getpid()
+    return _batch_executor
+
+
+def _fetch_all(cnx, sql, params):
+    cur = cnx.cursor(dictionary=True)
+    try:
+        cur.execute(sql, params)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def _fetch_all_pooled(cnx, sql, params):
+    global _pool_in_use
+    try:
+        return _fetch_all(cnx, sql, params)
+    finally:
+        with _pool_lock:
+            _pool_in_use -= 1
+        cnx.close()
+        _batch_slots.release()
+
+
+def run_query_batch(queries):
+    # Run independent read queries {name: (sql, params)} concurrently on pooled connections.
+    # The request connection is taken first and always runs at least one query; the rest go to
+    # spare pooled connections, at most QUERY_BATCH_WORKERS per process, or run serially.
+    global _pool_in_use
+    if not queries:
+        return {}
+    db = get_db()
+    pool = _get_pool(database_route(current_academy_id()))
+    futures = {}
+    serial = dict(queries)
+    if pool is not None and len(queries) > 1:
+        executor = _get_batch_executor()
+        stats = query_stats()
+        for name in list(queries)[1:]:
+            if not _batch_slots.acquire(blocking=False):
+                break
+            try:
+                cnx = _TimedConnection(pool.get_connection(), stats)
+            except mysql.connector.errors.PoolError:
+                _batch_slots.release()
+                break
+            with _pool_lock:
+                _pool_in_use += 1
+            sql, params = serial.pop(name)
+            futures[name] = executor.submit(_fetch_all_pooled, cnx, sql, params)
+
+    results = {}
+    for name, (sql, params) in serial.items():
+        results[name] = _fetch_all(db, sql, params)
+    for name, future in futures.items():
+        results[name] = future.result()
+    return {name: results[name] for name in queries}
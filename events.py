@@ -0,0 +1,289 @@
+import asyncio
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+
+from db import connect_db, database_route
+
+# Idle streams send a comment line this often so proxies keep them open and dead clients surface.
+HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Streams close after this long; EventSource reconnects on its own.
+STREAM_MAX_SECONDS = int(os.getenv("SSE_STREAM_MAX_SECONDS", "300"))
+# Open streams allowed per process before new ones are refused with 503. Under a threaded WSGI
+# server each stream holds a thread, so gunicorn.conf.py sets this below the thread count.
+MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "50"))
+# Streams served from the event loop (asgi.py) hold no thread; only memory bounds them.
+ASYNC_MAX_STREAMS = int(os.getenv("ASYNC_SSE_MAX_STREAMS", "1000"))
+SUBSCRIBER_QUEUE_SIZE = 100
+FANOUT_POLL_SECONDS = 1.0
+# live_events ids are assigned at insert, not commit, so a lower id can commit after a higher
+# one was already read. Ids skipped that way are re-checked for this long (publishers commit
+# right after inserting), tracking at most FANOUT_MAX_GAPS of them.
+FANOUT_GAP_SECONDS = 30
+FANOUT_MAX_GAPS = 1000
+
+
+class Subscription:
+    def __init__(self, channels, deliver):
+        self.channels = tuple(channels)
+        self.deliver = deliver
+
+
+class StreamSlot:
+    # One reserved stream. release() is idempotent: the stream's finally and the response's
+    # close both call it, and a stream that is never iterated only gets the latter.
+
+    def __init__(self, bus):
+        self._bus = bus
+        self._released = threading.Event()
+
+    def release(self):
+        with self._bus._lock:
+            if self._released.is_set():
+                return
+            self._released.set()
+            self._bus._stream_count -= 1
+
+
+class LocalEventBus:
+    # In-process pub/sub; events only reach streams served by the same process.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+        self._stream_count = 0
+
+    @property
+    def stream_count(self):
+        return self._stream_count
+
+    def reserve_stream(self, limit):
+        # Check and count a new stream under one lock; None once `limit` streams are open.
+        with self._lock:
+            if self._stream_count >= limit:
+                return None
+            self._stream_count += 1
+        return StreamSlot(self)
+
+    def subscribe(self, channels, deliver, academy_id=None):
+        subscription = Subscription(channels, deliver)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, db, events):
+        # events: [(channel, event_type, data)]; call after the writes they describe commit.
+        for channel, event_type, data in events:
+            self._dispatch(channel, next(self._ids), event_type, data)
+
+    def _dispatch(self, channel, event_id, event_type, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver({"id": event_id, "event": event_type, "data": data})
+
+
+class MySQLFanoutEventBus(LocalEventBus):
+    # Cross-process fan-out: publishers append to live_events and every process tails the table.
+
+    def __init__(self, poll_interval=FANOUT_POLL_SECONDS):
+        super().__init__()
+        self._poll_interval = poll_interval
+        self._pollers_pid = None
+        self._polled_routes = set()
+
+    def subscribe(self, channels, deliver, academy_id=None):
+        self._ensure_poller(academy_id)
+        return super().subscribe(channels, deliver)
+
+    def publish(self, db, events):
+        if not events:
+            return
+        cur = db.cursor()
+        cur.executemany(
+            "INSERT INTO live_events (channel, event_type, payload) VALUES (%s, %s, %s)",
+            [(channel, event_type, json.dumps(data)) for channel, event_type, data in events],
+        )
+        db.commit()
+        cur.close()
+
+    def _ensure_poller(self, academy_id=None):
+        # One tailing thread per process and database, started after fork on first subscription.
+        route = database_route(academy_id)
+        if self._pollers_pid == os.getpid() and route in self._polled_routes:
+            return
+        with self._lock:
+            if self._pollers_pid != os.getpid():
+                self._pollers_pid = os.getpid()
+                self._polled_routes = set()
+            if route in self._polled_routes:
+                return
+            self._polled_routes.add(route)
+        threading.Thread(
+            target=self._poll_forever, args=(academy_id,), name="live-events", daemon=True
+        ).start()
+
+    def _poll_forever(self, academy_id=None):
+        last_id = None
+        gaps = {}
+        while True:
+            db = None
+            try:
+                db = connect_db(academy_id)
+                db.autocommit = True
+                cur = db.cursor(dictionary=True)
+                if last_id is None:
+                    cur.execute("SELECT COALESCE(MAX(id), 0) AS last_id FROM live_events")
+                    last_id = int(cur.fetchone()["last_id"])
+                while True:
+                    late_rows = []
+                    if gaps:
+                        now = time.monotonic()
+                        for event_id, missed_at in list(gaps.items()):
+                            if now - missed_at > FANOUT_GAP_SECONDS:
+                                # Rolled back, or purged before this poller saw it.
+                                del gaps[event_id]
+                    if gaps:
+                        placeholders = ", ".join(["%s"] * len(gaps))
+                        cur.execute(
+                            f"""
+                            SELECT id, channel, event_type, payload
+                            FROM live_events
+                            WHERE id IN ({placeholders})
+                            ORDER BY id
+                            """,
+                            tuple(gaps),
+                        )
+                        late_rows = cur.fetchall()
+                    cur.execute(
+                        """
+                        SELECT id, channel, event_type, payload
+                        FROM live_events
+                        WHERE id > %s
+                        ORDER BY id
+                        LIMIT 500
+                        """,
+                        (last_id,),
+                    )
+                    rows = cur.fetchall()
+                    for row in late_rows:
+                        del gaps[row["id"]]
+                        self._dispatch(row["channel"], row["id"], row["event_type"], json.loads(row["payload"]))
+                    for row in rows:
+                        missed_at = time.monotonic()
+                        for event_id in range(max(last_id + 1, row["id"] - FANOUT_MAX_GAPS), row["id"]):
+                            gaps[event_id] = missed_at
+                        last_id = row["id"]
+                        self._dispatch(row["channel"], row["id"], row["event_type"], json.loads(row["payload"]))
+                    while len(gaps) > FANOUT_MAX_GAPS:
+                        del gaps[min(gaps)]
+                    if not rows:
+                        time.sleep(self._poll_interval)
+            except Exception:
+                traceback.print_exc()
+                time.sleep(self._poll_interval * 5)
+            finally:
+                if db is not None:
+                    try:
+                        db.close()
+                    except Exception:
+                        pass
+
+
+def format_sse(message):
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+def stream_events(bus, channels, academy_id=None, slot=None, heartbeat=HEARTBEAT_SECONDS,
+                  max_seconds=STREAM_MAX_SECONDS):
+    # Blocking SSE generator for WSGI servers; one thread per open stream. `slot` comes from
+    # bus.reserve_stream() and is released when the stream ends.
+    inbox = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    overflowed = threading.Event()
+
+    def deliver(message):
+        try:
+            inbox.put_nowait(message)
+        except queue.Full:
+            overflowed.set()
+
+    subscription = bus.subscribe(channels, deliver, academy_id)
+    try:
+        yield f"retry: {heartbeat * 1000}\n\n"
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline and not overflowed.is_set():
+            try:
+                message = inbox.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(message)
+    finally:
+        bus.unsubscribe(subscription)
+        if slot is not None:
+            slot.release()
+
+
+async def stream_events_async(bus, channels, academy_id=None, slot=None, heartbeat=HEARTBEAT_SECONDS,
+                              max_seconds=STREAM_MAX_SECONDS):
+    # Event-loop counterpart of stream_events; publishers deliver from other threads.
+    loop = asyncio.get_running_loop()
+    inbox = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    overflowed = threading.Event()
+
+    def enqueue(message):
+        try:
+            inbox.put_nowait(message)
+        except asyncio.QueueFull:
+            overflowed.set()
+
+    def deliver(message):
+        loop.call_soon_threadsafe(enqueue, message)
+
+    subscription = bus.subscribe(channels, deliver, academy_id)
+    try:
+        yield f"retry: {heartbeat * 1000}\n\n"
+        deadline = loop.time() + max_seconds
+        while loop.time() < deadline and not overflowed.is_set():
+            try:
+                message = await asyncio.wait_for(inbox.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(message)
+    finally:
+        bus.unsubscribe(subscription)
+        if slot is not None:
+            slot.release()
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus():
+    # EVENT_BUS_BACKEND=mysql fans events out across worker processes; "local" stays in-process.
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                if os.getenv("EVENT_BUS_BACKEND", "local") == "mysql":
+                    _bus = MySQLFanoutEventBus()
+                else:
+                    _bus = LocalEventBus()
+    return _bus
@@ -0,0 +1,66 @@
+import glob
+import math
+import os
+import tempfile
+
+# Serving profile for `gunicorn -c gunicorn.conf.py wsgi:app`; every value can be overridden by env.
+_cores = os.cpu_count() or 1
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "gthread"
+# Requests mostly wait on MySQL, so aim for about four in-flight requests per core,
+# split across processes (capped to keep MySQL connections bounded) and threads.
+workers = int(os.getenv("WEB_CONCURRENCY", min(_cores * 2 + 1, 12)))
+threads = int(os.getenv("WEB_THREADS", max(2, math.ceil(_cores * 4 / workers))))
+# Import the app (and run migrations/template compilation) once in the master before forking.
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically so slow leaks cannot accumulate.
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+accesslog = "-"
+
+# One pooled MySQL connection per request thread in each worker, plus the spare connections
+# dashboard query batches run on (at most QUERY_BATCH_WORKERS at a time per worker).
+os.environ.setdefault("DB_POOL_SIZE", str(threads + int(os.getenv("QUERY_BATCH_WORKERS", "4"))))
+# Live updates must reach streams held by the other workers.
+os.environ.setdefault("EVENT_BUS_BACKEND", "mysql")
+# Each open /events/stream holds one gthread thread for up to SSE_STREAM_MAX_SECONDS, and the
+# browser reconnects straight away, so a dashboard left open occupies a thread indefinitely.
+# Streams beyond half of a worker's threads get a 503 (EventSource retries later), which
+# always leaves the other half for page requests: with the defaults on an 8-core box
+# (12 workers x 3 threads) that is 1 stream per worker, 12 in total. To keep many dashboards
+# live, route /events/stream at the proxy to `uvicorn asgi:app`, which serves streams on
+# its event loop without holding threads (ASYNC_SSE_MAX_STREAMS per process); raising
+# WEB_THREADS instead also raises DB_POOL_SIZE and the MySQL connection count.
+os.environ.setdefault("SSE_MAX_STREAMS", str(max(1, threads // 2)))
+# Background jobs run under `flask --app app jobs-worker`, not inside web workers.
+os.environ.setdefault("JOBS_INLINE_WORKER", "0")
+# Workers share metrics through files in this directory; it must be set before prometheus_client
+# is imported, which happens when the app is preloaded.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "karate-academy-metrics")
+)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    # Samples left by a previous run would otherwise be added to this one's.
+    for stale in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(stale)
+
+
+def post_fork(server, worker):
+    # Connections must be opened after fork; prime them before the worker accepts traffic.
+    from app import warm_worker
+
+    warm_worker()
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (pool size/in use) from the aggregated metrics.
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,257 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+# Per-employee, per-ISO-week hours are stored in instructor_week_hours. Writes to shifts,
+# approved requests and class offerings bump the version of their week in
+# instructor_hours_weeks; a report recomputes only weeks whose stored rows are older
+# than their version.
+HOUR_COLUMNS = (
+    "scheduled_hours",
+    "worked_hours",
+    "called_out_hours",
+    "switched_out_hours",
+    "picked_up_hours",
+)
+FETCH_CHUNK = 5000
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def weeks_between(start_date, end_date):
+    first, last = week_start(start_date), week_start(end_date)
+    return [first + timedelta(days=7 * offset) for offset in range((last - first).days // 7 + 1)]
+
+
+def mark_weeks_dirty(cur, academy_id, days):
+    # Call on the transaction that changes shifts, requests or offerings dated on `days`.
+    weeks = sorted({week_start(day) for day in days if day is not None})
+    if not weeks:
+        return
+    cur.executemany(
+        """
+        INSERT INTO instructor_hours_weeks (academy_id, week_start, version, computed_version)
+        VALUES (%s, %s, 1, 0)
+        ON DUPLICATE KEY UPDATE version = version + 1
+        """,
+        [(academy_id, week) for week in weeks],
+    )
+
+
+def _seconds(value):
+    # TIME columns arrive as timedelta.
+    return value.total_seconds() if hasattr(value, "total_seconds") else 0.0
+
+
+def _stale_weeks(cur, academy_id, weeks):
+    cur.execute(
+        """
+        SELECT week_start, version, computed_version
+        FROM instructor_hours_weeks
+        WHERE academy_id = %s AND week_start BETWEEN %s AND %s
+        """,
+        (academy_id, weeks[0], weeks[-1]),
+    )
+    known = {row["week_start"]: row for row in cur.fetchall()}
+    stale = {}
+    for week in weeks:
+        row = known.get(week)
+        if row is None:
+            stale[week] = 0
+        elif row["version"] != row["computed_version"]:
+            stale[week] = row["version"]
+    return stale
+
+
+def _load_sources(cur, academy_id, first_day, last_day):
+    # One range query per source.
+    cur.execute(
+        """
+        SELECT id, employee_user_id, covering_employee_id, shift_date, start_time, end_time, coverage_status
+        FROM shifts
+        WHERE academy_id = %s AND shift_date BETWEEN %s AND %s
+        """,
+        (academy_id, first_day, last_day),
+    )
+    shifts = cur.fetchall()
+    cur.execute(
+        """
+        SELECT r.shift_id, r.requester_user_id
+        FROM requests r
+        JOIN shifts s ON s.id = r.shift_id
+        WHERE s.academy_id = %s
+          AND s.shift_date BETWEEN %s AND %s
+          AND r.status = 'approved'
+        ORDER BY r.id
+        """,
+        (academy_id, first_day, last_day),
+    )
+    original_employee = {}
+    for row in cur.fetchall():
+        # The first approved switch or call-out names who the shift was scheduled for.
+        original_employee.setdefault(row["shift_id"], row["requester_user_id"])
+    cur.execute(
+        """
+        SELECT instructor_user_id, class_date, start_time, end_time, program_track
+        FROM class_offerings
+        WHERE academy_id = %s
+          AND class_date BETWEEN %s AND %s
+          AND instructor_user_id IS NOT NULL
+        """,
+        (academy_id, first_day, last_day),
+    )
+    offerings = cur.fetchall()
+    return shifts, original_employee, offerings
+
+
+def compute_week_hours(shifts, original_employee, offerings, program_tracks):
+    # Returns {(employee_id, week_start): {column: hours}} for the given rows.
+    scheduled_for = np.array(
+        [original_employee.get(row["id"], row["employee_user_id"]) for row in shifts], dtype=np.int64
+    )
+    assigned_to = np.array(
+        [row["covering_employee_id"] or row["employee_user_id"] for row in shifts], dtype=np.int64
+    )
+    shift_week = np.array([week_start(row["shift_date"]).toordinal() for row in shifts], dtype=np.int64)
+    shift_hours = np.array(
+        [_seconds(row["end_time"]) - _seconds(row["start_time"]) for row in shifts], dtype=np.float64
+    ) / 3600.0
+    status = np.array([row["coverage_status"] or "scheduled" for row in shifts], dtype=object)
+    called_out = status != "scheduled"
+    worked = status != "called_out"
+
+    track_code = {track: code for code, track in enumerate(program_tracks)}
+    teacher = np.array([row["instructor_user_id"] for row in offerings], dtype=np.int64)
+    class_week = np.array([week_start(row["class_date"]).toordinal() for row in offerings], dtype=np.int64)
+    class_hours = np.array(
+        [_seconds(row["end_time"]) - _seconds(row["start_time"]) for row in offerings], dtype=np.float64
+    ) / 3600.0
+    class_track = np.array([track_code.get(row["program_track"], 0) for row in offerings], dtype=np.int64)
+
+    # Every (employee, week) pair any source mentions becomes one output row.
+    employees = np.concatenate([scheduled_for, assigned_to, teacher])
+    weeks = np.concatenate([shift_week, shift_week, class_week])
+    keys, inverse = np.unique(np.stack([employees, weeks]), axis=1, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    shift_count, class_count = len(shifts), len(offerings)
+    as_scheduled = inverse[:shift_count]
+    as_assigned = inverse[shift_count:2 * shift_count]
+    as_teacher = inverse[2 * shift_count:]
+    size = keys.shape[1]
+
+    def total(positions, weights, mask=None):
+        if mask is not None:
+            positions, weights = positions[mask], weights[mask]
+        return np.bincount(positions, weights=weights, minlength=size)
+
+    switched_away = ~called_out & (scheduled_for != assigned_to)
+    columns = {
+        "scheduled_hours": total(as_scheduled, shift_hours),
+        "worked_hours": total(as_assigned, shift_hours, worked),
+        "called_out_hours": total(as_scheduled, shift_hours, called_out),
+        "switched_out_hours": total(as_scheduled, shift_hours, switched_away),
+        "picked_up_hours": total(as_assigned, shift_hours, worked & (scheduled_for != assigned_to)),
+    }
+    teaching = np.zeros((size, len(program_tracks)))
+    if class_count:
+        np.add.at(teaching, (as_teacher, class_track), class_hours)
+
+    result = {}
+    for pos in range(size):
+        hours = {column: round(float(values[pos]), 2) for column, values in columns.items()}
+        for code, track in enumerate(program_tracks):
+            hours[f"teaching_{track}_hours"] = round(float(teaching[pos, code]), 2)
+        teaching_total = float(teaching[pos].sum())
+        hours["teaching_hours"] = round(teaching_total, 2)
+        hours["utilization"] = (
+            round(teaching_total / float(columns["worked_hours"][pos]), 3)
+            if columns["worked_hours"][pos]
+            else None
+        )
+        result[(int(keys[0, pos]), date.fromordinal(int(keys[1, pos])))] = hours
+    return result
+
+
+def refresh_week_hours(db, academy_id, weeks, program_tracks):
+    # Recompute stored rows for the stale weeks among `weeks`; returns how many were rebuilt.
+    cur = db.cursor(dictionary=True)
+    try:
+        stale = _stale_weeks(cur, academy_id, weeks)
+        if not stale:
+            return 0
+        stale_weeks = sorted(stale)
+        shifts, original_employee, offerings = _load_sources(
+            cur, academy_id, stale_weeks[0], stale_weeks[-1] + timedelta(days=6)
+        )
+        # The range may span clean weeks between stale ones; keep only rows of stale weeks.
+        shifts = [row for row in shifts if week_start(row["shift_date"]) in stale]
+        offerings = [row for row in offerings if week_start(row["class_date"]) in stale]
+        hours = compute_week_hours(shifts, original_employee, offerings, program_tracks)
+
+        placeholders = ", ".join(["%s"] * len(stale_weeks))
+        cur.execute(
+            f"DELETE FROM instructor_week_hours WHERE academy_id = %s AND week_start IN ({placeholders})",
+            (academy_id, *stale_weeks),
+        )
+        if hours:
+            track_columns = [f"teaching_{track}_hours" for track in program_tracks]
+            columns = list(HOUR_COLUMNS) + track_columns + ["teaching_hours", "utilization"]
+            cur.executemany(
+                f"""
+                INSERT INTO instructor_week_hours
+                  (academy_id, week_start, employee_user_id, {", ".join(columns)})
+                VALUES (%s, %s, %s, {", ".join(["%s"] * len(columns))})
+                """,
+                [
+                    (academy_id, week, employee_id, *(values[column] for column in columns))
+                    for (employee_id, week), values in sorted(hours.items(), key=lambda item: item[0][::-1])
+                ],
+            )
+        # A write that lands while this runs bumps the version again, leaving its week stale.
+        cur.executemany(
+            """
+            INSERT INTO instructor_hours_weeks (academy_id, week_start, version, computed_version)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+              computed_version = IF(version = VALUES(version), VALUES(computed_version), computed_version)
+            """,
+            [(academy_id, week, version, version) for week, version in stale.items()],
+        )
+        db.commit()
+        return len(stale_weeks)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def week_hours_rows(db, academy_id, first_week, last_week, program_tracks):
+    # Yield stored rows in week/employee order without loading the whole range.
+    track_columns = [f"h.teaching_{track}_hours" for track in program_tracks]
+    cur = db.cursor(dictionary=True)
+    try:
+        cur.execute(
+            f"""
+            SELECT h.week_start, h.employee_user_id, u.username AS employee,
+                   {", ".join("h." + column for column in HOUR_COLUMNS)},
+                   {", ".join(track_columns)}, h.teaching_hours, h.utilization
+            FROM instructor_week_hours h
+            JOIN users u ON u.id = h.employee_user_id
+            WHERE h.academy_id = %s AND h.week_start BETWEEN %s AND %s
+            ORDER BY h.week_start, u.username
+            """,
+            (academy_id, first_week, last_week),
+        )
+        while True:
+            rows = cur.fetchmany(FETCH_CHUNK)
+            if not rows:
+                break
+            for row in rows:
+                iso_year, iso_week, _ = row["week_start"].isocalendar()
+                row["iso_week"] = f"{iso_year}-W{iso_week:02d}"
+                yield row
+    finally:
+        cur.close()
@@ -0,0 +1,256 @@
+import random
+import time
+from datetime import timedelta
+
+# Cost weights: balance is the sum of squared weekly hours per instructor, so
+# moving one hour from a busy instructor to an idle one always lowers it.
+TRACK_MISS_PENALTY = 4.0
+UNASSIGNED_PENALTY = 1000.0
+
+
+def _to_minutes(value):
+    if isinstance(value, timedelta):
+        return int(value.total_seconds() // 60)
+    if isinstance(value, int):
+        return value
+    return value.hour * 60 + value.minute
+
+
+class InstructorAssignmentSolver:
+    # Greedy construction followed by time-boxed local search over instructor moves and swaps.
+
+    def __init__(self, offerings, employee_ids, busy_blocks=None, track_experience=None, seed=0):
+        self.employee_ids = list(employee_ids)
+        self.track_experience = track_experience or {}
+        self.rng = random.Random(seed)
+
+        self.offering_ids = []
+        self.dates = []
+        self.starts = []
+        self.ends = []
+        self.hours = []
+        self.weeks = []
+        self.tracks = []
+        self.fixed = []
+        for row in offerings:
+            self.offering_ids.append(row["id"])
+            self.dates.append(row["class_date"])
+            start_minute = _to_minutes(row["start_time"])
+            end_minute = _to_minutes(row["end_time"])
+            self.starts.append(start_minute)
+            self.ends.append(end_minute)
+            self.hours.append(max(end_minute - start_minute, 0) / 60.0)
+            self.weeks.append(row["class_date"].isocalendar()[:2])
+            self.tracks.append(row.get("program_track"))
+            self.fixed.append(row.get("instructor_user_id"))
+
+        self.assigned = [None] * len(self.offering_ids)
+        self.weekly_hours = {}
+        # {(employee_id, date): [(start, end, offering_index)]}; index -1 marks a shift.
+        self.day_slots = {}
+        for (employee_id, day_value), intervals in (busy_blocks or {}).items():
+            for start_value, end_value in intervals:
+                self._add_slot(employee_id, day_value, _to_minutes(start_value), _to_minutes(end_value), -1)
+
+        for idx, employee_id in enumerate(self.fixed):
+            if employee_id is not None:
+                self._assign(idx, employee_id)
+
+        self.free_indexes = [idx for idx, employee_id in enumerate(self.fixed) if employee_id is None]
+
+    # -- bookkeeping --------------------------------------------------------
+
+    def _add_slot(self, employee_id, day_value, start_minute, end_minute, idx):
+        self.day_slots.setdefault((employee_id, day_value), []).append((start_minute, end_minute, idx))
+
+    def _assign(self, idx, employee_id):
+        self.assigned[idx] = employee_id
+        if employee_id is None:
+            return
+        self._add_slot(employee_id, self.dates[idx], self.starts[idx], self.ends[idx], idx)
+        key = (employee_id, self.weeks[idx])
+        self.weekly_hours[key] = self.weekly_hours.get(key, 0.0) + self.hours[idx]
+
+    def _unassign(self, idx):
+        employee_id = self.assigned[idx]
+        if employee_id is None:
+            return
+        slots = self.day_slots[(employee_id, self.dates[idx])]
+        slots[:] = [slot for slot in slots if slot[2] != idx]
+        key = (employee_id, self.weeks[idx])
+        self.weekly_hours[key] -= self.hours[idx]
+        self.assigned[idx] = None
+
+    def _is_free(self, employee_id, idx, ignore=()):
+        start_minute = self.starts[idx]
+        end_minute = self.ends[idx]
+        for slot_start, slot_end, slot_idx in self.day_slots.get((employee_id, self.dates[idx]), ()):
+            if slot_idx == idx or slot_idx in ignore:
+                continue
+            if slot_start < end_minute and slot_end > start_minute:
+                return False
+        return True
+
+    # -- cost ---------------------------------------------------------------
+
+    def _track_cost(self, idx, employee_id):
+        if employee_id is None:
+            return UNASSIGNED_PENALTY
+        if self.track_experience.get((employee_id, self.tracks[idx]), 0) > 0:
+            return 0.0
+        return TRACK_MISS_PENALTY
+
+    def _load_delta(self, employee_id, week, delta_hours):
+        if employee_id is None:
+            return 0.0
+        load = self.weekly_hours.get((employee_id, week), 0.0)
+        return (load + delta_hours) ** 2 - load ** 2
+
+    def _move_delta(self, idx, new_employee_id):
+        old_employee_id = self.assigned[idx]
+        week = self.weeks[idx]
+        hours = self.hours[idx]
+        return (
+            self._load_delta(old_employee_id, week, -hours)
+            + self._load_delta(new_employee_id, week, hours)
+            + self._track_cost(idx, new_employee_id)
+            - self._track_cost(idx, old_employee_id)
+        )
+
+    def score(self):
+        balance = sum(load ** 2 for load in self.weekly_hours.values())
+        track = sum(
+            self._track_cost(idx, self.assigned[idx]) for idx in range(len(self.assigned))
+        )
+        return balance + track
+
+    # -- search -------------------------------------------------------------
+
+    def greedy(self):
+        # Place the most constrained (longest, earliest) classes first.
+        order = sorted(
+            self.free_indexes,
+            key=lambda idx: (-self.hours[idx], self.dates[idx], self.starts[idx]),
+        )
+        for idx in order:
+            best_employee_id = None
+            best_delta = None
+            for employee_id in self.employee_ids:
+                if not self._is_free(employee_id, idx):
+                    continue
+                delta = self._move_delta(idx, employee_id)
+                if best_delta is None or delta < best_delta:
+                    best_delta = delta
+                    best_employee_id = employee_id
+            self._assign(idx, best_employee_id)
+
+    def _try_move(self, idx):
+        employee_id = self.rng.choice(self.employee_ids)
+        if employee_id == self.assigned[idx] or not self._is_free(employee_id, idx):
+            return False
+        if self._move_delta(idx, employee_id) > 0:
+            return False
+        self._unassign(idx)
+        self._assign(idx, employee_id)
+        return True
+
+    def _try_swap(self, idx, other_idx):
+        first_employee_id = self.assigned[idx]
+        second_employee_id = self.assigned[other_idx]
+        if first_employee_id == second_employee_id:
+            return False
+        # Each offering must fit the other instructor's day once the swapped class is gone.
+        if second_employee_id is not None and not self._is_free(second_employee_id, idx, ignore=(other_idx,)):
+            return False
+        if first_employee_id is not None and not self._is_free(first_employee_id, other_idx, ignore=(idx,)):
+            return False
+
+        before = self._score_pair(idx, other_idx)
+        self._unassign(idx)
+        self._unassign(other_idx)
+        self._assign(idx, second_employee_id)
+        self._assign(other_idx, first_employee_id)
+        if self._score_pair(idx, other_idx) <= before:
+            return True
+        self._unassign(idx)
+        self._unassign(other_idx)
+        self._assign(idx, first_employee_id)
+        self._assign(other_idx, second_employee_id)
+        return False
+
+    def _score_pair(self, idx, other_idx):
+        # Cost terms that a swap between two offerings can change.
+        keys = {
+            (self.assigned[idx], self.weeks[idx]),
+            (self.assigned[idx], self.weeks[other_idx]),
+            (self.assigned[other_idx], self.weeks[idx]),
+            (self.assigned[other_idx], self.weeks[other_idx]),
+        }
+        balance = sum(self.weekly_hours.get(key, 0.0) ** 2 for key in keys if key[0] is not None)
+        return (
+            balance
+            + self._track_cost(idx, self.assigned[idx])
+            + self._track_cost(other_idx, self.assigned[other_idx])
+        )
+
+    def local_search(self, time_budget):
+        if not self.free_indexes or not self.employee_ids:
+            return 0
+        deadline = time.monotonic() + time_budget
+        accepted = 0
+        iterations = 0
+        while True:
+            iterations += 1
+            if iterations % 256 == 0 and time.monotonic() >= deadline:
+                break
+            idx = self.rng.choice(self.free_indexes)
+            if self.rng.random() < 0.5:
+                if self._try_move(idx):
+                    accepted += 1
+            else:
+                other_idx = self.rng.choice(self.free_indexes)
+                if other_idx != idx and self._try_swap(idx, other_idx):
+                    accepted += 1
+        return accepted
+
+    def summary(self):
+        assigned_count = sum(1 for idx in self.free_indexes if self.assigned[idx] is not None)
+        track_matches = sum(
+            1
+            for idx in self.free_indexes
+            if self.assigned[idx] is not None and self._track_cost(idx, self.assigned[idx]) == 0
+        )
+        loads = list(self.weekly_hours.values())
+        mean_load = sum(loads) / len(loads) if loads else 0.0
+        spread = (sum((load - mean_load) ** 2 for load in loads) / len(loads)) ** 0.5 if loads else 0.0
+        return {
+            "offerings": len(self.offering_ids),
+            "fixed": len(self.offering_ids) - len(self.free_indexes),
+            "assigned": assigned_count,
+            "unassigned": len(self.free_indexes) - assigned_count,
+            "track_matches": track_matches,
+            "weekly_hours_stddev": round(spread, 2),
+            "score": round(self.score(), 2),
+        }
+
+
+def solve_assignments(offerings, employee_ids, busy_blocks=None, track_experience=None,
+                      time_budget=2.0, seed=0):
+    # Return {offering_id: instructor_id or None} for every non-fixed offering plus a score summary.
+    solver = InstructorAssignmentSolver(
+        offerings,
+        employee_ids,
+        busy_blocks=busy_blocks,
+        track_experience=track_experience,
+        seed=seed,
+    )
+    solver.greedy()
+    greedy_score = solver.score()
+    accepted_moves = solver.local_search(time_budget)
+    result = solver.summary()
+    result["greedy_score"] = round(greedy_score, 2)
+    result["accepted_moves"] = accepted_moves
+    result["assignments"] = {
+        solver.offering_ids[idx]: solver.assigned[idx] for idx in solver.free_indexes
+    }
+    return result
@@ -0,0 +1,376 @@
+import importlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+
+from db import connect_db
+
+JOB_HANDLERS = {}
+MAINTENANCE_TASKS = []
+DEFAULT_MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 5
+POLL_INTERVAL_SECONDS = 1.0
+# Workers refresh heartbeat_at on their running job this often, from a ticker thread and on
+# every progress() call; a running job whose heartbeat is older than STALE_JOB_SECONDS is
+# assumed to belong to a dead worker and is queued again.
+HEARTBEAT_SECONDS = 30
+STALE_JOB_SECONDS = 5 * 60
+STALE_SWEEP_EVERY = 60
+
+
+class JobLost(Exception):
+    # Raised by JobContext.commit() once a requeued copy of the job has been claimed elsewhere.
+    pass
+
+
+def job_handler(job_type):
+    # Register a function(ctx, payload) -> result dict as the handler for a job type.
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+
+    return decorator
+
+
+def maintenance_task(func):
+    # Register a function(db) that workers run on every stale-job sweep (db autocommits).
+    MAINTENANCE_TASKS.append(func)
+    return func
+
+
+def enqueue_job(cur, job_type, payload=None, user_id=None, label=None,
+                max_attempts=DEFAULT_MAX_ATTEMPTS):
+    # Insert a queued job on the caller's transaction; it becomes visible on commit.
+    cur.execute(
+        """
+        INSERT INTO background_jobs
+          (job_type, label, payload, max_attempts, created_by_user_id)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        (job_type, label or job_type, json.dumps(payload or {}), max_attempts, user_id),
+    )
+    return cur.lastrowid
+
+
+def recent_jobs_query(user_id=None, limit=10, academy_id=None):
+    # Return (sql, params) so callers can run the lookup inside a query batch.
+    query = """
+        SELECT id, job_type, label, status, progress, progress_message, attempts,
+               max_attempts, error, result, created_at, started_at, finished_at
+        FROM background_jobs
+    """
+    conditions = []
+    params = ()
+    if user_id is not None:
+        conditions.append("created_by_user_id = %s")
+        params += (user_id,)
+    if academy_id is not None:
+        # Jobs belong to the academy of the user who queued them.
+        conditions.append("created_by_user_id IN (SELECT id FROM users WHERE academy_id = %s)")
+        params += (academy_id,)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id DESC LIMIT %s"
+    return query, params + (limit,)
+
+
+def decode_jobs(jobs):
+    for job in jobs:
+        job["result"] = json.loads(job["result"]) if job.get("result") else {}
+    return jobs
+
+
+class JobContext:
+    # Handed to job handlers: `db` is the job's own transaction, progress writes autocommit.
+    # Handlers that commit part-way must do so through commit(), never db.commit().
+
+    def __init__(self, job, db, control_db):
+        self.job_id = job["id"]
+        self.attempt = job["attempts"]
+        self.db = db
+        self._job = job
+        self._control_db = control_db
+        self._worker_id = job["locked_by"]
+
+    def commit(self):
+        if not _still_owned(self.db, self._job):
+            self.db.rollback()
+            raise JobLost(f"Job {self.job_id} was requeued and claimed by another worker.")
+        self.db.commit()
+
+    def progress(self, percent, message=None):
+        cur = self._control_db.cursor()
+        cur.execute(
+            """
+            UPDATE background_jobs
+            SET progress = %s, progress_message = %s, heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND locked_by = %s
+            """,
+            (max(0, min(int(percent), 100)), message, self.job_id, self._worker_id),
+        )
+        cur.close()
+
+
+def _claim_next_job(control_db, worker_id):
+    # SKIP LOCKED lets several workers poll the same table without blocking each other.
+    control_db.start_transaction()
+    cur = control_db.cursor(dictionary=True)
+    try:
+        cur.execute(
+            """
+            SELECT id, job_type, payload, attempts, max_attempts
+            FROM background_jobs
+            WHERE status = 'queued' AND run_after <= CURRENT_TIMESTAMP
+            ORDER BY run_after, id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+            """
+        )
+        job = cur.fetchone()
+        if job:
+            cur.execute(
+                """
+                UPDATE background_jobs
+                SET status = 'running',
+                    attempts = attempts + 1,
+                    started_at = CURRENT_TIMESTAMP,
+                    heartbeat_at = CURRENT_TIMESTAMP,
+                    locked_by = %s
+                WHERE id = %s
+                """,
+                (worker_id, job["id"]),
+            )
+            job["attempts"] += 1
+            job["locked_by"] = worker_id
+        control_db.commit()
+        return job
+    except Exception:
+        control_db.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _retry_delay(attempts):
+    return BACKOFF_BASE_SECONDS * (2 ** (attempts - 1))
+
+
+def _requeue_stale_jobs(control_db):
+    # A lost worker counts as a failed attempt: retry with the usual backoff while attempts
+    # remain, so a job that keeps killing its worker ends up failed instead of looping.
+    # Rows from before heartbeats existed fall back to started_at.
+    cur = control_db.cursor()
+    cur.execute(
+        """
+        UPDATE background_jobs
+        SET status = 'failed',
+            error = 'Worker lost: no heartbeat before the last attempt ran out.',
+            locked_by = NULL,
+            finished_at = CURRENT_TIMESTAMP
+        WHERE status = 'running'
+          AND attempts >= max_attempts
+          AND COALESCE(heartbeat_at, started_at) < CURRENT_TIMESTAMP - INTERVAL %s SECOND
+        """,
+        (STALE_JOB_SECONDS,),
+    )
+    cur.execute(
+        """
+        UPDATE background_jobs
+        SET status = 'queued',
+            error = 'Worker lost: no heartbeat.',
+            locked_by = NULL,
+            run_after = CURRENT_TIMESTAMP + INTERVAL (%s * POW(2, attempts - 1)) SECOND
+        WHERE status = 'running'
+          AND attempts < max_attempts
+          AND COALESCE(heartbeat_at, started_at) < CURRENT_TIMESTAMP - INTERVAL %s SECOND
+        """,
+        (BACKOFF_BASE_SECONDS, STALE_JOB_SECONDS),
+    )
+    cur.close()
+
+
+def _heartbeat_forever(worker_id, stop_event, academy_id=None):
+    # Own connection: the worker's control connection is busy on the job thread.
+    db = None
+    while not stop_event.wait(HEARTBEAT_SECONDS):
+        try:
+            if db is None:
+                db = connect_db(academy_id)
+                db.autocommit = True
+            cur = db.cursor()
+            cur.execute(
+                """
+                UPDATE background_jobs
+                SET heartbeat_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND locked_by = %s
+                """,
+                (worker_id,),
+            )
+            cur.close()
+        except Exception:
+            traceback.print_exc()
+            if db is not None:
+                try:
+                    db.close()
+                except Exception:
+                    pass
+            db = None
+    if db is not None:
+        db.close()
+
+
+def _still_owned(db, job):
+    # Lock the job row on the job's own transaction so a requeued copy cannot commit alongside it.
+    cur = db.cursor()
+    cur.execute("SELECT locked_by FROM background_jobs WHERE id = %s FOR UPDATE", (job["id"],))
+    row = cur.fetchone()
+    cur.close()
+    return row is not None and row[0] == job["locked_by"]
+
+
+def _finish_job(control_db, job, status, result=None, error=None, retry_in=None):
+    # Only the worker holding the job may settle it; a lost claim leaves the row to its new owner.
+    cur = control_db.cursor()
+    if retry_in is not None:
+        cur.execute(
+            """
+            UPDATE background_jobs
+            SET status = 'queued',
+                error = %s,
+                locked_by = NULL,
+                run_after = CURRENT_TIMESTAMP + INTERVAL %s SECOND
+            WHERE id = %s AND locked_by = %s
+            """,
+            (error, retry_in, job["id"], job["locked_by"]),
+        )
+    else:
+        cur.execute(
+            """
+            UPDATE background_jobs
+            SET status = %s,
+                progress = CASE WHEN %s = 'done' THEN 100 ELSE progress END,
+                result = %s,
+                error = %s,
+                locked_by = NULL,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND locked_by = %s
+            """,
+            (
+                status,
+                status,
+                json.dumps(result) if result is not None else None,
+                error,
+                job["id"],
+                job["locked_by"],
+            ),
+        )
+    cur.close()
+
+
+def _run_maintenance(control_db):
+    for task in MAINTENANCE_TASKS:
+        try:
+            task(control_db)
+        except Exception:
+            traceback.print_exc()
+
+
+def run_job(job, control_db, academy_id=None):
+    handler = JOB_HANDLERS.get(job["job_type"])
+    if handler is None:
+        _finish_job(control_db, job, "failed", error=f"No handler for job type {job['job_type']!r}.")
+        return
+
+    db = connect_db(academy_id)
+    try:
+        payload = json.loads(job["payload"]) if job.get("payload") else {}
+        ctx = JobContext(job, db, control_db)
+        result = handler(ctx, payload)
+        ctx.commit()
+        _finish_job(control_db, job, "done", result=result or {})
+    except JobLost:
+        # Requeued after a missed heartbeat and claimed again; the other run owns the job.
+        db.rollback()
+    except Exception as exc:
+        db.rollback()
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        if job["attempts"] < job["max_attempts"]:
+            _finish_job(
+                control_db,
+                job,
+                "queued",
+                error=error,
+                retry_in=_retry_delay(job["attempts"]),
+            )
+        else:
+            _finish_job(control_db, job, "failed", error=error)
+    finally:
+        db.close()
+
+
+def run_worker(handler_module="app", stop_event=None, poll_interval=POLL_INTERVAL_SECONDS,
+               academy_id=None):
+    # Poll for queued jobs until stopped; importing the handler module registers job types.
+    # academy_id picks the database to poll when that academy is routed to its own instance.
+    importlib.import_module(handler_module)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    control_db = connect_db(academy_id)
+    control_db.autocommit = True
+    heartbeat_stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat_forever,
+        args=(worker_id, heartbeat_stop, academy_id),
+        name="job-heartbeat",
+        daemon=True,
+    ).start()
+    polls = 0
+    try:
+        while stop_event is None or not stop_event.is_set():
+            if polls % STALE_SWEEP_EVERY == 0:
+                _requeue_stale_jobs(control_db)
+                _run_maintenance(control_db)
+            polls += 1
+            job = _claim_next_job(control_db, worker_id)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            run_job(job, control_db, academy_id)
+    finally:
+        heartbeat_stop.set()
+        control_db.close()
+
+
+def run_worker_pool(processes, handler_module="app", academy_id=None):
+    # Run one polling worker per process; blocks until interrupted.
+    workers = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(handler_module,),
+            kwargs={"academy_id": academy_id},
+            daemon=True,
+        )
+        for _ in range(max(1, processes))
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+def start_inline_worker(handler_module="app"):
+    # Development fallback: poll the queue from a daemon thread inside the web process.
+    stop_event = threading.Event()
+    threading.Thread(
+        target=run_worker,
+        args=(handler_module, stop_event),
+        daemon=True,
+    ).start()
+    return stop_event
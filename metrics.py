@@ -0,0 +1,122 @@
+import os
+import time
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from db import pool_status
+
+# With PROMETHEUS_MULTIPROC_DIR set (the Gunicorn profile sets it), each worker writes its samples
+# to memory-mapped files in that directory and a scrape of any worker reports all of them.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+REQUESTS = Counter(
+    "karate_http_requests_total",
+    "HTTP requests by Flask endpoint, method and status code.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "karate_http_request_duration_seconds",
+    "Time from request start until the response is ready, by Flask endpoint.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+SQL_STATEMENTS = Histogram(
+    "karate_sql_statements_per_request",
+    "SQL statements executed per request that used the database, by Flask endpoint.",
+    ["endpoint"],
+    buckets=STATEMENT_BUCKETS,
+)
+SQL_SECONDS = Histogram(
+    "karate_sql_seconds_per_request",
+    "Time spent executing SQL per request, by Flask endpoint.",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+TEMPLATE_SECONDS = Histogram(
+    "karate_template_render_seconds",
+    "Jinja template render time, by template.",
+    ["template"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "karate_cache_requests_total",
+    "Lookups against in-app caches, by cache and hit/miss.",
+    ["cache", "result"],
+)
+POOL_SIZE = Gauge(
+    "karate_db_pool_size",
+    "Pooled MySQL connections per worker, summed over live workers.",
+    multiprocess_mode="livesum",
+)
+POOL_IN_USE = Gauge(
+    "karate_db_pool_in_use",
+    "Pooled MySQL connections checked out, summed over live workers.",
+    multiprocess_mode="livesum",
+)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def update_pool_gauges():
+    status = pool_status()
+    POOL_SIZE.set(status["size"])
+    POOL_IN_USE.set(status["in_use"])
+
+
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def record_request_metrics(response):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return response
+    # Unmatched URLs share one label so 404 scans cannot grow the series count.
+    endpoint = request.endpoint or "unmatched"
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    stats = g.get("query_stats")
+    if stats is not None and stats.count:
+        SQL_STATEMENTS.labels(endpoint).observe(stats.count)
+        SQL_SECONDS.labels(endpoint).observe(stats.seconds)
+    update_pool_gauges()
+    return response
+
+
+def start_template_timer(sender, template, context, **extra):
+    g.setdefault("template_timers", []).append(time.perf_counter())
+
+
+def record_template_render(sender, template, context, **extra):
+    timers = g.get("template_timers")
+    if timers:
+        elapsed = time.perf_counter() - timers.pop()
+        TEMPLATE_SECONDS.labels(template.name or "<string>").observe(elapsed)
+        # Per-request total, read by the request profiler.
+        g.template_seconds = g.get("template_seconds", 0.0) + elapsed
+
+
+def latest_metrics():
+    # Returns (body, content type) for the /metrics endpoint.
+    update_pool_gauges()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
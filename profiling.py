@@ -0,0 +1,136 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g, request, session
+
+# Fraction of all requests profiled without being asked; 0 turns sampling off.
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Number of stored profiles kept; older ones are deleted as new ones arrive.
+KEEP_PROFILES = int(os.getenv("PROFILE_KEEP", "100"))
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_FLAG = "_profile"
+TOP_FUNCTIONS = 20
+PROFILE_NAME_PATTERN = re.compile(r"^[0-9T]+-[A-Za-z0-9_.]+-[0-9]+$")
+
+# cProfile follows only the thread that enabled it and newer Pythons allow one active
+# profiler per process, so at most one request per process is profiled at a time.
+_profile_lock = threading.Lock()
+
+
+def profile_dir():
+    return os.getenv("PROFILE_DIR") or os.path.join(current_app.instance_path, "profiles")
+
+
+def _profile_requested():
+    # Managers opt in per request with `X-Profile: 1` or `?_profile=1`.
+    if session.get("role") != "manager":
+        return False
+    return request.headers.get(PROFILE_HEADER) == "1" or request.args.get(PROFILE_QUERY_FLAG) == "1"
+
+
+def start_profiler():
+    if not (_profile_requested() or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)):
+        return
+    if not _profile_lock.acquire(blocking=False):
+        return
+    g.profiler = cProfile.Profile()
+    g.profile_started = time.perf_counter()
+    g.profiler.enable()
+
+
+def stop_profiler(exc=None):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+    try:
+        profiler.disable()
+        total = time.perf_counter() - g.pop("profile_started")
+        stats = g.get("query_stats")
+        sql_seconds = stats.seconds if stats else 0.0
+        template_seconds = g.get("template_seconds", 0.0)
+        _save_profile(
+            profiler,
+            {
+                "endpoint": request.endpoint or "unmatched",
+                "method": request.method,
+                "path": request.path,
+                "captured_at": datetime.now().isoformat(timespec="seconds"),
+                "sampled": not _profile_requested(),
+                "error": repr(exc) if exc is not None else None,
+                "total_ms": round(total * 1000, 2),
+                "sql_ms": round(sql_seconds * 1000, 2),
+                "sql_statements": stats.count if stats else 0,
+                "template_ms": round(template_seconds * 1000, 2),
+                # Batched SQL runs on other threads and can overlap, so Python time is clamped at zero.
+                "python_ms": round(max(total - sql_seconds - template_seconds, 0.0) * 1000, 2),
+            },
+        )
+    except Exception:
+        current_app.logger.exception("Could not store request profile.")
+    finally:
+        _profile_lock.release()
+
+
+def _top_functions(profiler):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": calls,
+                "own_ms": round(tottime * 1000, 2),
+                "cumulative_ms": round(cumtime * 1000, 2),
+            }
+        )
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+def _save_profile(profiler, meta):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    endpoint = re.sub(r"[^A-Za-z0-9_.]", "_", meta["endpoint"])
+    name = f"{datetime.now():%Y%m%dT%H%M%S%f}-{endpoint}-{os.getpid()}"
+    meta["name"] = name
+    meta["top_functions"] = _top_functions(profiler)
+    # The .prof file is standard pstats data; snakeviz or flameprof render it as a flame graph.
+    profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as handle:
+        json.dump(meta, handle)
+    _prune_profiles(directory)
+
+
+def _prune_profiles(directory):
+    if KEEP_PROFILES <= 0:
+        return
+    names = sorted(entry[:-5] for entry in os.listdir(directory) if entry.endswith(".json"))
+    for name in names[:-KEEP_PROFILES]:
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit=50):
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((entry[:-5] for entry in os.listdir(directory) if entry.endswith(".json")), reverse=True)
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(directory, f"{name}.json"), encoding="utf-8") as handle:
+                profiles.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return profiles
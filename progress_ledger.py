@@ -0,0 +1,342 @@
+from datetime import datetime
+
+# child_skill_progress is a projection of the append-only progress_events ledger.
+# Every mutation appends an event and folds it into the projection row on the same
+# transaction; rebuild_progress_projection replays the ledger from scratch. Writers hold a
+# shared lock on the child row (lock_children) before touching its progress, and a rebuild
+# batch holds its children exclusively, so a live write never lands between the batch's
+# event read and its projection write.
+#
+# Event types:
+#   assigned   new projection row; learned_delta is the first learned step
+#   learned    add learned_delta to the count (capped at the learned target)
+#   corrected  set technique, count and notes to the recorded values
+#   removed    drop the projection row
+#   imported   snapshot of a row that existed before the ledger
+EVENT_TYPES = ("assigned", "learned", "corrected", "removed", "imported")
+PROJECTION_COLUMNS = (
+    "id",
+    "child_id",
+    "technique_id",
+    "assigned_by_user_id",
+    "assigned_at",
+    "learned_count",
+    "completed",
+    "completed_at",
+    "notes",
+)
+REPLAY_CHILD_BATCH = 500
+
+
+def fold_progress_event(state, event, learned_target):
+    # Pure fold step: projection row (or None) + event -> projection row (or None).
+    kind = event["event_type"]
+    occurred_at = event["created_at"]
+    if kind == "removed":
+        return None
+    if kind == "assigned":
+        learned_count = max(0, min(int(event["learned_delta"] or 0), learned_target))
+        completed = learned_count >= learned_target
+        return {
+            "id": event["progress_id"],
+            "child_id": event["child_id"],
+            "technique_id": event["technique_id"],
+            "assigned_by_user_id": event["actor_user_id"],
+            "assigned_at": occurred_at,
+            "learned_count": learned_count,
+            "completed": int(completed),
+            "completed_at": occurred_at if completed else None,
+            "notes": event["notes"],
+        }
+    if kind == "imported":
+        return {
+            "id": event["progress_id"],
+            "child_id": event["child_id"],
+            "technique_id": event["technique_id"],
+            "assigned_by_user_id": event["actor_user_id"],
+            "assigned_at": occurred_at,
+            "learned_count": int(event["learned_count"] or 0),
+            "completed": int(event["completed"] or 0),
+            "completed_at": event["completed_at"],
+            "notes": event["notes"],
+        }
+    if state is None:
+        # Events after a removal have nothing to apply to.
+        return None
+
+    state = dict(state)
+    if kind == "learned":
+        learned_count = min(learned_target, int(state["learned_count"] or 0) + int(event["learned_delta"] or 0))
+        completed = learned_count >= learned_target
+        state["learned_count"] = learned_count
+        state["completed"] = int(completed)
+        state["completed_at"] = occurred_at if completed else None
+        if event["notes"]:
+            state["notes"] = event["notes"]
+    elif kind == "corrected":
+        learned_count = max(0, min(int(event["learned_count"] or 0), learned_target))
+        completed = learned_count >= learned_target
+        state["technique_id"] = event["technique_id"]
+        state["notes"] = event["notes"]
+        state["learned_count"] = learned_count
+        state["completed"] = int(completed)
+        state["completed_at"] = (state["completed_at"] or occurred_at) if completed else None
+    else:
+        raise ValueError(f"Unknown progress event type {kind!r}.")
+    return state
+
+
+def fold_progress_events(events, learned_target, states=None):
+    # Fold events (in ledger order) into {progress_id: row}; removed rows are dropped.
+    states = {} if states is None else states
+    for event in events:
+        progress_id = event["progress_id"]
+        state = fold_progress_event(states.get(progress_id), event, learned_target)
+        if state is None:
+            states.pop(progress_id, None)
+        else:
+            states[progress_id] = state
+    return states
+
+
+def _event_row(event):
+    return {
+        "progress_id": event.get("progress_id"),
+        "child_id": event["child_id"],
+        "technique_id": event["technique_id"],
+        "event_type": event["event_type"],
+        "learned_delta": int(event.get("learned_delta") or 0),
+        "learned_count": event.get("learned_count"),
+        "completed": event.get("completed"),
+        "completed_at": event.get("completed_at"),
+        "notes": event.get("notes") or None,
+        "actor_user_id": event.get("actor_user_id"),
+        "attendance_session_id": event.get("attendance_session_id"),
+        "created_at": event.get("created_at"),
+    }
+
+
+def _load_projection_row(cur, progress_id):
+    cur.execute(
+        f"SELECT {', '.join(PROJECTION_COLUMNS)} FROM child_skill_progress WHERE id = %s FOR UPDATE",
+        (progress_id,),
+    )
+    return cur.fetchone()
+
+
+def lock_children(cur, child_ids, exclusive=False):
+    # Take child row locks before any progress row lock, so writers and rebuilds lock in one order.
+    placeholders = ", ".join(["%s"] * len(child_ids))
+    cur.execute(
+        f"SELECT id FROM children WHERE id IN ({placeholders}) {'FOR UPDATE' if exclusive else 'FOR SHARE'}",
+        tuple(child_ids),
+    )
+    return [row["id"] if isinstance(row, dict) else row[0] for row in cur.fetchall()]
+
+
+def record_progress_event(cur, event, learned_target, current=None):
+    # Append one event and fold it into child_skill_progress; returns the new row or None.
+    # `current` is the projection row when the caller already holds it. The caller must hold
+    # lock_children() on the event's child.
+    event = _event_row(event)
+    if event["event_type"] not in EVENT_TYPES:
+        raise ValueError(f"Unknown progress event type {event['event_type']!r}.")
+    if event["created_at"] is None:
+        event["created_at"] = current_timestamp(cur)
+
+    if event["event_type"] == "assigned":
+        state = fold_progress_event(None, dict(event, progress_id=None), learned_target)
+        cur.execute(
+            """
+            INSERT INTO child_skill_progress
+              (child_id, technique_id, assigned_by_user_id, assigned_at, learned_count,
+               completed, completed_at, notes)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            tuple(state[column] for column in PROJECTION_COLUMNS[1:]),
+        )
+        event["progress_id"] = state["id"] = cur.lastrowid
+    else:
+        if current is None:
+            current = _load_projection_row(cur, event["progress_id"])
+        if current is None:
+            return None
+        state = fold_progress_event(current, event, learned_target)
+        if state is None:
+            cur.execute("DELETE FROM child_skill_progress WHERE id = %s", (event["progress_id"],))
+        else:
+            cur.execute(
+                """
+                UPDATE child_skill_progress
+                SET technique_id = %s,
+                    learned_count = %s,
+                    completed = %s,
+                    completed_at = %s,
+                    notes = %s,
+                    predicted_ready_date = NULL
+                WHERE id = %s
+                """,
+                (
+                    state["technique_id"],
+                    state["learned_count"],
+                    state["completed"],
+                    state["completed_at"],
+                    state["notes"],
+                    event["progress_id"],
+                ),
+            )
+
+    cur.execute(
+        """
+        INSERT INTO progress_events
+          (progress_id, child_id, technique_id, event_type, learned_delta, learned_count,
+           completed, completed_at, notes, actor_user_id, attendance_session_id, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (
+            event["progress_id"],
+            event["child_id"],
+            event["technique_id"],
+            event["event_type"],
+            event["learned_delta"],
+            event["learned_count"],
+            event["completed"],
+            event["completed_at"],
+            event["notes"],
+            event["actor_user_id"],
+            event["attendance_session_id"],
+            event["created_at"],
+        ),
+    )
+    return state
+
+
+def current_timestamp(cur):
+    # Database clock, so ledger times match CURRENT_TIMESTAMP defaults elsewhere.
+    cur.execute("SELECT CURRENT_TIMESTAMP AS now")
+    row = cur.fetchone()
+    now = row["now"] if isinstance(row, dict) else row[0]
+    return now if isinstance(now, datetime) else datetime.fromisoformat(str(now))
+
+
+def import_untracked_progress(cur):
+    # Snapshot progress rows written before the ledger existed so replay can rebuild them.
+    cur.execute(
+        """
+        INSERT INTO progress_events
+          (progress_id, child_id, technique_id, event_type, learned_count, completed,
+           completed_at, notes, actor_user_id, created_at)
+        SELECT csp.id, csp.child_id, csp.technique_id, 'imported', csp.learned_count, csp.completed,
+               csp.completed_at, csp.notes, csp.assigned_by_user_id, csp.assigned_at
+        FROM child_skill_progress csp
+        WHERE NOT EXISTS (SELECT 1 FROM progress_events pe WHERE pe.progress_id = csp.id)
+        """
+    )
+    return cur.rowcount
+
+
+def _write_projection(cur, first_child_id, last_child_id, states):
+    # Upsert folded rows for a range of children and delete their rows the ledger no longer has.
+    rows = sorted(states.values(), key=lambda row: row["id"])
+    if rows:
+        cur.executemany(
+            """
+            INSERT INTO child_skill_progress
+              (id, child_id, technique_id, assigned_by_user_id, assigned_at, learned_count,
+               completed, completed_at, notes)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+              predicted_ready_date = IF(
+                learned_count = VALUES(learned_count) AND technique_id = VALUES(technique_id),
+                predicted_ready_date,
+                NULL
+              ),
+              technique_id = VALUES(technique_id),
+              assigned_by_user_id = VALUES(assigned_by_user_id),
+              assigned_at = VALUES(assigned_at),
+              learned_count = VALUES(learned_count),
+              completed = VALUES(completed),
+              completed_at = VALUES(completed_at),
+              notes = VALUES(notes)
+            """,
+            [tuple(row[column] for column in PROJECTION_COLUMNS) for row in rows],
+        )
+    params = (first_child_id, last_child_id)
+    query = "DELETE FROM child_skill_progress WHERE child_id BETWEEN %s AND %s"
+    if rows:
+        query += f" AND id NOT IN ({', '.join(['%s'] * len(rows))})"
+        params += tuple(row["id"] for row in rows)
+    cur.execute(query, params)
+    return len(rows), cur.rowcount
+
+
+def rebuild_progress_projection(db, learned_target, batch_size=REPLAY_CHILD_BATCH, progress=None):
+    # Replay the whole ledger into child_skill_progress, one committed batch of children at a time.
+    # Only one batch of events is held in memory; the result matches folding every event in order.
+    cur = db.cursor(dictionary=True)
+    totals = {"children": 0, "events": 0, "rows": 0, "removed": 0}
+    try:
+        cur.execute("SELECT COUNT(DISTINCT child_id) AS child_count FROM progress_events")
+        child_count = int((cur.fetchone() or {}).get("child_count") or 0)
+        last_child_id = 0
+        while True:
+            cur.execute(
+                """
+                SELECT DISTINCT child_id
+                FROM progress_events
+                WHERE child_id > %s
+                ORDER BY child_id
+                LIMIT %s
+                """,
+                (last_child_id, batch_size),
+            )
+            child_ids = [row["child_id"] for row in cur.fetchall()]
+            if not child_ids:
+                break
+            # End the snapshot taken by the read above so the event read below starts after the
+            # lock: every write to these children either committed before it or waits for the batch.
+            db.commit()
+            cur.execute(
+                "SELECT id FROM children WHERE id BETWEEN %s AND %s FOR UPDATE",
+                (child_ids[0], child_ids[-1]),
+            )
+            cur.fetchall()
+            cur.execute(
+                """
+                SELECT id, progress_id, child_id, technique_id, event_type, learned_delta,
+                       learned_count, completed, completed_at, notes, actor_user_id, created_at
+                FROM progress_events
+                WHERE child_id BETWEEN %s AND %s
+                ORDER BY child_id, progress_id, id
+                """,
+                (child_ids[0], child_ids[-1]),
+            )
+            events = cur.fetchall()
+            states = fold_progress_events(events, learned_target)
+            rows, removed = _write_projection(cur, child_ids[0], child_ids[-1], states)
+            db.commit()
+            totals["children"] += len(child_ids)
+            totals["events"] += len(events)
+            totals["rows"] += rows
+            totals["removed"] += removed
+            last_child_id = child_ids[-1]
+            if progress and child_count:
+                progress(totals["children"] * 100 // child_count, f"{totals['children']} of {child_count} students")
+
+        # Projection rows with no events at all cannot come from the ledger.
+        cur.execute(
+            """
+            DELETE csp
+            FROM child_skill_progress csp
+            LEFT JOIN progress_events pe ON pe.progress_id = csp.id
+            WHERE pe.id IS NULL
+            """
+        )
+        totals["removed"] += cur.rowcount
+        db.commit()
+        return totals
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
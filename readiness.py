@@ -0,0 +1,325 @@
+from datetime import date
+
+import numpy as np
+
+# One learned step per technique per week reproduces the old fixed 7-day rule
+# and is the prior of last resort for children with no attendance history.
+DEFAULT_STEPS_PER_WEEK = 1.0
+MIN_STEPS_PER_WEEK = 0.1
+# Pseudo-observation weight used when shrinking sparse estimates toward their prior.
+PRIOR_WEIGHT = 3.0
+ID_CHUNK_SIZE = 1000
+
+
+def _chunks(values, size=ID_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _ordinal(value):
+    if value is None:
+        return 0
+    if hasattr(value, "date"):
+        value = value.date()
+    return value.toordinal()
+
+
+def _claim_job_state(cur):
+    # Serialize runs on the single state row and return the highest session id folded so far.
+    cur.execute(
+        "INSERT IGNORE INTO readiness_job_state (id, last_session_id) VALUES (1, 0)"
+    )
+    cur.execute("SELECT last_session_id FROM readiness_job_state WHERE id = 1 FOR UPDATE")
+    row = cur.fetchone() or {}
+    return int(row.get("last_session_id") or 0)
+
+
+def _fold_new_sessions(cur, full=False):
+    # Add logs from sessions not folded yet into per-child learning stats. Session ids are
+    # assigned at insert rather than commit, so a per-session flag marks what has been folded.
+    cur.execute("SELECT id FROM attendance_sessions" + ("" if full else " WHERE readiness_folded = 0"))
+    session_ids = [row["id"] for row in cur.fetchall()]
+    touched_child_ids = set()
+    for chunk in _chunks(session_ids):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cur.execute(
+            f"""
+            SELECT
+                atl.child_id,
+                COUNT(DISTINCT ats.id) AS session_count,
+                SUM(atl.learned_increment) AS increments,
+                MIN(ats.class_date) AS first_date,
+                MAX(ats.class_date) AS last_date
+            FROM attendance_technique_logs atl
+            JOIN attendance_sessions ats ON ats.id = atl.attendance_session_id
+            WHERE ats.id IN ({placeholders})
+            GROUP BY atl.child_id
+            """,
+            tuple(chunk),
+        )
+        rows = cur.fetchall()
+        if rows:
+            cur.executemany(
+                """
+                INSERT INTO child_learning_stats
+                  (child_id, total_increments, session_count, first_session_date, last_session_date)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                  total_increments = total_increments + VALUES(total_increments),
+                  session_count = session_count + VALUES(session_count),
+                  first_session_date = LEAST(first_session_date, VALUES(first_session_date)),
+                  last_session_date = GREATEST(last_session_date, VALUES(last_session_date))
+                """,
+                [
+                    (
+                        row["child_id"],
+                        int(row["increments"] or 0),
+                        int(row["session_count"] or 0),
+                        row["first_date"],
+                        row["last_date"],
+                    )
+                    for row in rows
+                ],
+            )
+        touched_child_ids.update(row["child_id"] for row in rows)
+        cur.execute(f"UPDATE attendance_sessions SET readiness_folded = 1 WHERE id IN ({placeholders})", tuple(chunk))
+    return max(session_ids, default=0), sorted(touched_child_ids)
+
+
+def _fit_velocities(children, technique_counts, program_tracks, belt_count):
+    # Shrink each child's observed steps/week toward a belt prior, itself shrunk toward a track prior.
+    track_codes = {track: code for code, track in enumerate(program_tracks)}
+    track = np.array([track_codes.get(c["program_track"], 0) for c in children], dtype=np.int64)
+    belt = np.array(
+        [max(0, min(int(c["belt_index"] or 0), belt_count - 1)) for c in children],
+        dtype=np.int64,
+    )
+    increments = np.array([float(c["total_increments"] or 0) for c in children])
+    sessions = np.array([float(c["session_count"] or 0) for c in children])
+    first_day = np.array([_ordinal(c["first_session_date"]) for c in children], dtype=np.int64)
+    last_day = np.array([_ordinal(c["last_session_date"]) for c in children], dtype=np.int64)
+    techniques = np.array([technique_counts.get(c["id"], 0) for c in children], dtype=np.float64)
+
+    weeks_active = np.maximum((last_day - first_day + 7) / 7.0, 1.0)
+    has_data = (sessions > 0) & (techniques > 0)
+    observed = np.where(
+        has_data,
+        increments / np.maximum(techniques, 1.0) / weeks_active,
+        0.0,
+    )
+    observed = np.maximum(observed, MIN_STEPS_PER_WEEK)
+
+    track_count = len(program_tracks)
+    track_sum = np.bincount(track[has_data], weights=observed[has_data], minlength=track_count)
+    track_n = np.bincount(track[has_data], minlength=track_count)
+    track_prior = (track_sum + PRIOR_WEIGHT * DEFAULT_STEPS_PER_WEEK) / (track_n + PRIOR_WEIGHT)
+
+    group = track * belt_count + belt
+    group_count = track_count * belt_count
+    belt_sum = np.bincount(group[has_data], weights=observed[has_data], minlength=group_count)
+    belt_n = np.bincount(group[has_data], minlength=group_count)
+    belt_prior = (belt_sum + PRIOR_WEIGHT * np.repeat(track_prior, belt_count)) / (belt_n + PRIOR_WEIGHT)
+
+    weight = np.where(has_data, sessions, 0.0)
+    velocity = (weight * observed + PRIOR_WEIGHT * belt_prior[group]) / (weight + PRIOR_WEIGHT)
+    return np.maximum(velocity, MIN_STEPS_PER_WEEK), last_day
+
+
+def _load_target_children(cur, touched_child_ids, full, learned_target):
+    if full:
+        return None
+    cur.execute(
+        """
+        SELECT DISTINCT child_id
+        FROM child_skill_progress
+        WHERE predicted_ready_date IS NULL
+          AND learned_count < %s
+        """,
+        (learned_target,),
+    )
+    return set(touched_child_ids) | {row["child_id"] for row in cur.fetchall()}
+
+
+def _load_progress_rows(cur, target_ids):
+    query = """
+        SELECT csp.id, csp.child_id, csp.learned_count, csp.assigned_at,
+               t.program_track, t.belt_index
+        FROM child_skill_progress csp
+        JOIN techniques t ON t.id = csp.technique_id
+    """
+    if target_ids is None:
+        cur.execute(query)
+        return cur.fetchall()
+    rows = []
+    for chunk in _chunks(sorted(target_ids)):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cur.execute(query + f" WHERE csp.child_id IN ({placeholders})", tuple(chunk))
+        rows.extend(cur.fetchall())
+    return rows
+
+
+def refresh_readiness(db, belt_sequence, program_tracks, learned_target, full=False, today=None,
+                      commit=None):
+    # Incrementally fold new attendance into learning stats and rewrite predicted readiness dates.
+    # Background jobs pass their JobContext.commit so a requeued duplicate cannot apply its writes.
+    commit = commit or db.commit
+    today = today or date.today()
+    cur = db.cursor(dictionary=True)
+    try:
+        last_session_id = _claim_job_state(cur)
+        if full:
+            cur.execute("DELETE FROM child_learning_stats")
+            last_session_id = 0
+        folded_through, touched_child_ids = _fold_new_sessions(cur, full)
+        max_session_id = max(last_session_id, folded_through)
+
+        target_ids = _load_target_children(cur, touched_child_ids, full, learned_target)
+        if target_ids is not None and not target_ids:
+            cur.execute(
+                "UPDATE readiness_job_state SET last_session_id = %s, last_run_at = CURRENT_TIMESTAMP WHERE id = 1",
+                (max_session_id,),
+            )
+            commit()
+            return {"sessions_through": max_session_id, "children": 0, "rows": 0}
+
+        cur.execute(
+            """
+            SELECT c.id, c.academy_id, c.program_track, c.belt_index,
+                   s.total_increments, s.session_count, s.first_session_date, s.last_session_date
+            FROM children c
+            LEFT JOIN child_learning_stats s ON s.child_id = c.id
+            ORDER BY c.id
+            """
+        )
+        children = cur.fetchall()
+        cur.execute(
+            """
+            SELECT child_id, COUNT(*) AS technique_count
+            FROM child_skill_progress
+            GROUP BY child_id
+            """
+        )
+        technique_counts = {row["child_id"]: int(row["technique_count"]) for row in cur.fetchall()}
+        cur.execute(
+            """
+            SELECT academy_id, program_track, belt_index, COUNT(*) AS belt_total
+            FROM techniques
+            WHERE is_active = 1
+            GROUP BY academy_id, program_track, belt_index
+            """
+        )
+        # Each academy has its own technique catalog; totals never mix academies in one database.
+        belt_totals = {
+            (row["academy_id"], row["program_track"], int(row["belt_index"])): int(row["belt_total"])
+            for row in cur.fetchall()
+        }
+
+        # Priors use every child; predictions are only rewritten for the target set.
+        velocity, last_day = _fit_velocities(children, technique_counts, program_tracks, len(belt_sequence))
+        position = {child["id"]: pos for pos, child in enumerate(children)}
+
+        rows = _load_progress_rows(cur, target_ids)
+        row_child = np.array([position[row["child_id"]] for row in rows], dtype=np.int64)
+        learned = np.array([int(row["learned_count"] or 0) for row in rows], dtype=np.float64)
+        assigned_day = np.array([_ordinal(row["assigned_at"]) or today.toordinal() for row in rows], dtype=np.int64)
+
+        remaining = np.maximum(learned_target - learned, 0.0)
+        anchor = np.maximum(assigned_day, last_day[row_child])
+        predicted_day = anchor + np.ceil(remaining / velocity[row_child] * 7.0).astype(np.int64)
+        row_ready = remaining <= 0
+
+        cur.executemany(
+            "UPDATE child_skill_progress SET predicted_ready_date = %s WHERE id = %s",
+            [
+                (None if row_ready[i] else date.fromordinal(int(predicted_day[i])), row["id"])
+                for i, row in enumerate(rows)
+            ],
+        )
+
+        # Belt readiness: the latest unfinished technique in the current belt, or a fresh
+        # technique started today when some belt techniques have not been assigned yet.
+        target_positions = (
+            np.arange(len(children)) if target_ids is None
+            else np.array(sorted(position[cid] for cid in target_ids if cid in position), dtype=np.int64)
+        )
+        current_belt = np.array(
+            [max(0, min(int(child["belt_index"] or 0), len(belt_sequence) - 1)) for child in children],
+            dtype=np.int64,
+        )
+        row_belt = np.array([int(row["belt_index"] or 0) for row in rows], dtype=np.int64)
+        same_track = np.array(
+            [row["program_track"] == children[position[row["child_id"]]]["program_track"] for row in rows],
+            dtype=bool,
+        )
+        in_current_belt = same_track & (row_belt == current_belt[row_child])
+        belt_latest = np.zeros(len(children), dtype=np.int64)
+        belt_rows = np.zeros(len(children), dtype=np.int64)
+        open_rows = in_current_belt & ~row_ready
+        np.maximum.at(belt_latest, row_child[open_rows], predicted_day[open_rows])
+        np.add.at(belt_rows, row_child[in_current_belt], 1)
+
+        belt_total = np.array(
+            [
+                belt_totals.get((child["academy_id"], child["program_track"], int(current_belt[pos])), 0)
+                for pos, child in enumerate(children)
+            ],
+            dtype=np.int64,
+        )
+        fresh_start = np.maximum(last_day, today.toordinal())
+        fresh_day = fresh_start + np.ceil(learned_target / velocity * 7.0).astype(np.int64)
+        missing = belt_total > belt_rows
+        belt_day = np.where(missing, np.maximum(belt_latest, fresh_day), belt_latest)
+
+        readiness_rows = []
+        for pos in target_positions:
+            child = children[pos]
+            ready_date = None
+            if belt_total[pos] > 0 and belt_day[pos] > 0:
+                ready_date = date.fromordinal(int(belt_day[pos]))
+            readiness_rows.append(
+                (
+                    child["id"],
+                    int(current_belt[pos]),
+                    belt_sequence[current_belt[pos]],
+                    ready_date,
+                    round(float(velocity[pos]), 3),
+                )
+            )
+        if readiness_rows:
+            cur.executemany(
+                """
+                INSERT INTO child_belt_readiness
+                  (child_id, belt_index, belt_name, predicted_ready_date, steps_per_week)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                  belt_name = VALUES(belt_name),
+                  predicted_ready_date = VALUES(predicted_ready_date),
+                  steps_per_week = VALUES(steps_per_week),
+                  updated_at = CURRENT_TIMESTAMP
+                """,
+                readiness_rows,
+            )
+
+        cur.execute(
+            "UPDATE readiness_job_state SET last_session_id = %s, last_run_at = CURRENT_TIMESTAMP WHERE id = 1",
+            (max_session_id,),
+        )
+        commit()
+        return {
+            "sessions_through": max_session_id,
+            "children": len(target_positions),
+            "rows": len(rows),
+        }
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def readiness_label(predicted_ready_date, learned_count, learned_target):
+    if int(learned_count or 0) >= learned_target:
+        return "Ready now"
+    if predicted_ready_date is None:
+        return "Estimate pending"
+    return predicted_ready_date.strftime("%b %d, %Y")
@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+VIEWS = ("week", "two_week", "month")
+VIEW_DAYS = {"week": 7, "two_week": 14}
+CACHE_WINDOWS = 64
+
+# (first_day, last_day, month) -> weeks of label-only day dicts. Labels depend on nothing but
+# the dates, so a skeleton never goes stale; renders copy each day before overlaying rows.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def normalize_start(view, start_date):
+    # Month views always start on the first of the month; week views start on any day.
+    return start_date.replace(day=1) if view == "month" else start_date
+
+
+def calendar_window(view, start_date):
+    # (first_day, last_day) shown for a view. Month grids are padded out to whole Mon-Sun weeks.
+    if view == "month":
+        month_start = start_date.replace(day=1)
+        month_end = _add_months(month_start, 1) - timedelta(days=1)
+        return (
+            month_start - timedelta(days=month_start.weekday()),
+            month_end + timedelta(days=6 - month_end.weekday()),
+        )
+    return start_date, start_date + timedelta(days=VIEW_DAYS[view] - 1)
+
+
+def shift_start(view, start_date, steps):
+    # Start date of the window `steps` views before (negative) or after this one.
+    if view == "month":
+        return _add_months(start_date, steps)
+    return start_date + timedelta(days=VIEW_DAYS[view] * steps)
+
+
+def _build_skeleton(first_day, last_day, month):
+    weeks, week = [], []
+    for offset in range((last_day - first_day).days + 1):
+        day_value = first_day + timedelta(days=offset)
+        week.append(
+            {
+                "date": day_value,
+                "iso_date": day_value.isoformat(),
+                "display_date": day_value.strftime("%b %d"),
+                "weekday": day_value.strftime("%A"),
+                "weekday_short": day_value.strftime("%a"),
+                "in_month": month is None or day_value.month == month,
+            }
+        )
+        if len(week) == 7:
+            weeks.append(week)
+            week = []
+    if week:
+        weeks.append(week)
+    return weeks
+
+
+def calendar_skeleton(view, start_date, on_lookup=None):
+    first_day, last_day = calendar_window(view, start_date)
+    key = (first_day, last_day, start_date.month if view == "month" else None)
+    with _cache_lock:
+        skeleton = _cache.get(key)
+        if skeleton is not None:
+            _cache.move_to_end(key)
+    if on_lookup:
+        on_lookup(skeleton is not None)
+    if skeleton is not None:
+        return skeleton
+
+    skeleton = _build_skeleton(*key)
+    with _cache_lock:
+        _cache[key] = skeleton
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_WINDOWS:
+            _cache.popitem(last=False)
+    return skeleton
+
+
+def shifts_query(academy_id, first_day, last_day, employee_user_id=None):
+    # One range read on idx_shifts_academy_date for the whole window.
+    query = """
+        SELECT
+            s.id,
+            s.employee_user_id,
+            COALESCE(s.covering_employee_id, s.employee_user_id) AS assigned_employee_id,
+            s.shift_date,
+            s.start_time,
+            s.end_time,
+            s.class_name,
+            s.coverage_status,
+            TIME_FORMAT(s.start_time, '%H:%i') AS start_label,
+            TIME_FORMAT(s.end_time, '%H:%i') AS end_label,
+            u.username AS employee
+        FROM shifts s
+        JOIN users u ON u.id = COALESCE(s.covering_employee_id, s.employee_user_id)
+        WHERE s.academy_id = %s
+          AND s.shift_date BETWEEN %s AND %s
+    """
+    params = (academy_id, first_day, last_day)
+    if employee_user_id is not None:
+        # Shifts the employee works: their own unless called out, plus the ones they cover.
+        query += (
+            " AND COALESCE(s.covering_employee_id, s.employee_user_id) = %s"
+            " AND s.coverage_status <> 'called_out'"
+        )
+        params += (employee_user_id,)
+    return query + " ORDER BY s.shift_date, s.start_time", params
+
+
+def classes_query(academy_id, first_day, last_day, instructor_user_id=None):
+    # One range read on idx_class_offerings_academy_date for the whole window.
+    query = """
+        SELECT
+            co.id,
+            co.class_date,
+            co.start_time,
+            co.class_name,
+            co.program_track,
+            co.capacity,
+            co.enrolled_count,
+            TIME_FORMAT(co.start_time, '%H:%i') AS start_label,
+            TIME_FORMAT(co.end_time, '%H:%i') AS end_label,
+            u.username AS instructor_name
+        FROM class_offerings co
+        LEFT JOIN users u ON u.id = co.instructor_user_id
+        WHERE co.academy_id = %s
+          AND co.class_date BETWEEN %s AND %s
+    """
+    params = (academy_id, first_day, last_day)
+    if instructor_user_id is not None:
+        query += " AND co.instructor_user_id = %s"
+        params += (instructor_user_id,)
+    return query + " ORDER BY co.class_date, co.start_time, co.id", params
+
+
+def overlay_calendar(skeleton, shifts=(), classes=(), class_marks=None):
+    # Copy the skeleton's days and attach the window's rows: `shifts` and `classes` as fetched,
+    # plus a merged `timeline` of both ordered by start time. `class_marks` maps an offering id
+    # to per-user labels (e.g. a parent's children signed up for it).
+    days = {}
+    weeks = []
+    for week in skeleton:
+        copied = []
+        for day in week:
+            day = dict(day, shifts=[], classes=[], timeline=[])
+            days[day["date"]] = day
+            copied.append(day)
+        weeks.append(copied)
+
+    for shift in shifts:
+        day = days.get(shift["shift_date"])
+        if day is not None:
+            day["shifts"].append(shift)
+            day["timeline"].append(dict(shift, kind="shift"))
+    for offering in classes:
+        day = days.get(offering["class_date"])
+        if day is not None:
+            offering["marks"] = class_marks.get(offering["id"], []) if class_marks else []
+            day["classes"].append(offering)
+            day["timeline"].append(dict(offering, kind="class"))
+    for day in days.values():
+        if day["shifts"] and day["classes"]:
+            # Both sources arrive ordered; HH:MM labels sort the same way as the times.
+            day["timeline"].sort(key=lambda entry: entry["start_label"])
+    return weeks
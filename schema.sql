@@ -1,11 +1,21 @@
 CREATE DATABASE IF NOT EXISTS karate_academy;
 USE karate_academy;
 
+CREATE TABLE IF NOT EXISTS academies (
+  id INT PRIMARY KEY,
+  academy_name VARCHAR(120) NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO academies (id, academy_name) VALUES (1, 'Modesto''s Karate');
+
 CREATE TABLE IF NOT EXISTS users (
   id INT AUTO_INCREMENT PRIMARY KEY,
+  academy_id INT NOT NULL DEFAULT 1,
   username VARCHAR(80) NOT NULL UNIQUE,
   password_hash VARCHAR(255) NOT NULL,
-  role ENUM('manager', 'employee', 'parent') NOT NULL
+  role ENUM('manager', 'employee', 'parent') NOT NULL,
+  KEY idx_users_academy_role (academy_id, role, username)
 );
 
 CREATE TABLE IF NOT EXISTS children (
@@ -16,6 +26,8 @@ CREATE TABLE IF NOT EXISTS children (
   belt_index INT NOT NULL DEFAULT 0,
   guardian_name VARCHAR(120) NULL,
   contact_phone VARCHAR(40) NULL,
+  academy_id INT NOT NULL DEFAULT 1,
+  KEY idx_children_academy_parent (academy_id, parent_user_id, child_name),
   FOREIGN KEY (parent_user_id) REFERENCES users(id)
 );
 
@@ -26,6 +38,13 @@ CREATE TABLE IF NOT EXISTS shifts (
   start_time TIME NOT NULL,
   end_time TIME NOT NULL,
   class_name VARCHAR(120) NOT NULL,
+  coverage_status ENUM('scheduled','called_out','covered') NOT NULL DEFAULT 'scheduled',
+  covering_employee_id INT NULL,
+  academy_id INT NOT NULL DEFAULT 1,
+  KEY idx_shifts_academy_date (academy_id, shift_date, employee_user_id),
+  KEY idx_shifts_date_employee (shift_date, employee_user_id),
+  KEY idx_shifts_class_employee (class_name, employee_user_id),
+  KEY idx_shifts_coverage_date (coverage_status, shift_date),
   FOREIGN KEY (employee_user_id) REFERENCES users(id)
 );
 
@@ -57,16 +76,32 @@ CREATE TABLE IF NOT EXISTS child_schedule (
 
 CREATE TABLE IF NOT EXISTS techniques (
   id INT AUTO_INCREMENT PRIMARY KEY,
-  technique_name VARCHAR(120) NOT NULL UNIQUE,
+  technique_name VARCHAR(120) NOT NULL,
   description TEXT NOT NULL,
   program_track ENUM('little_dragons', 'kids_martial_arts', 'teen_martial_arts', 'adult_martial_arts') NOT NULL DEFAULT 'kids_martial_arts',
-  belt_name VARCHAR(40) NOT NULL DEFAULT 'White',
+  belt_index INT NOT NULL DEFAULT 0,
   created_by_user_id INT NULL,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   is_active TINYINT(1) NOT NULL DEFAULT 1,
+  academy_id INT NOT NULL DEFAULT 1,
+  UNIQUE KEY uq_techniques_academy_name (academy_id, technique_name),
+  INDEX idx_techniques_academy_track_belt (academy_id, program_track, belt_index, is_active),
+  INDEX idx_techniques_track_belt_active (program_track, belt_index, is_active),
   FOREIGN KEY (created_by_user_id) REFERENCES users(id)
 );
 
+CREATE TABLE IF NOT EXISTS technique_revisions (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  technique_id INT NOT NULL,
+  changed_by_user_id INT NULL,
+  changes TEXT NULL,
+  comment TEXT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_technique_revisions_technique (technique_id, id),
+  FOREIGN KEY (technique_id) REFERENCES techniques(id) ON DELETE CASCADE,
+  FOREIGN KEY (changed_by_user_id) REFERENCES users(id)
+);
+
 CREATE TABLE IF NOT EXISTS child_skill_progress (
   id INT AUTO_INCREMENT PRIMARY KEY,
   child_id INT NOT NULL,
@@ -77,11 +112,102 @@ CREATE TABLE IF NOT EXISTS child_skill_progress (
   completed TINYINT(1) NOT NULL DEFAULT 0,
   completed_at TIMESTAMP NULL,
   notes TEXT NULL,
+  predicted_ready_date DATE NULL,
   FOREIGN KEY (child_id) REFERENCES children(id),
   FOREIGN KEY (technique_id) REFERENCES techniques(id),
   FOREIGN KEY (assigned_by_user_id) REFERENCES users(id)
 );
 
+CREATE TABLE IF NOT EXISTS progress_events (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  progress_id INT NOT NULL,
+  child_id INT NOT NULL,
+  technique_id INT NOT NULL,
+  event_type ENUM('assigned', 'learned', 'corrected', 'removed', 'imported') NOT NULL,
+  learned_delta TINYINT NOT NULL DEFAULT 0,
+  learned_count TINYINT NULL,
+  completed TINYINT(1) NULL,
+  completed_at TIMESTAMP NULL,
+  notes TEXT NULL,
+  actor_user_id INT NULL,
+  attendance_session_id INT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_progress_events_child (child_id, progress_id, id),
+  KEY idx_progress_events_progress (progress_id, id),
+  FOREIGN KEY (child_id) REFERENCES children(id),
+  FOREIGN KEY (actor_user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS belt_promotions (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  academy_id INT NOT NULL DEFAULT 1,
+  child_id INT NOT NULL,
+  program_track ENUM('little_dragons', 'kids_martial_arts', 'teen_martial_arts', 'adult_martial_arts') NOT NULL,
+  from_belt_index INT NOT NULL,
+  to_belt_index INT NOT NULL,
+  promoted_by_user_id INT NULL,
+  batch_key CHAR(32) NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_belt_promotions_academy_created (academy_id, created_at, to_belt_index),
+  KEY idx_belt_promotions_batch (batch_key),
+  KEY idx_belt_promotions_child (child_id, id),
+  FOREIGN KEY (child_id) REFERENCES children(id),
+  FOREIGN KEY (promoted_by_user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS instructor_hours_weeks (
+  academy_id INT NOT NULL,
+  week_start DATE NOT NULL,
+  version INT NOT NULL DEFAULT 1,
+  computed_version INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (academy_id, week_start)
+);
+
+CREATE TABLE IF NOT EXISTS instructor_week_hours (
+  academy_id INT NOT NULL,
+  week_start DATE NOT NULL,
+  employee_user_id INT NOT NULL,
+  scheduled_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  worked_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  called_out_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  switched_out_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  picked_up_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  teaching_little_dragons_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  teaching_kids_martial_arts_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  teaching_teen_martial_arts_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  teaching_adult_martial_arts_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  teaching_hours DECIMAL(7,2) NOT NULL DEFAULT 0,
+  utilization DECIMAL(6,3) NULL,
+  PRIMARY KEY (academy_id, week_start, employee_user_id),
+  FOREIGN KEY (employee_user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS child_learning_stats (
+  child_id INT PRIMARY KEY,
+  total_increments INT NOT NULL DEFAULT 0,
+  session_count INT NOT NULL DEFAULT 0,
+  first_session_date DATE NULL,
+  last_session_date DATE NULL,
+  FOREIGN KEY (child_id) REFERENCES children(id)
+);
+
+CREATE TABLE IF NOT EXISTS child_belt_readiness (
+  child_id INT NOT NULL,
+  belt_index INT NOT NULL,
+  belt_name VARCHAR(40) NOT NULL,
+  predicted_ready_date DATE NULL,
+  steps_per_week DOUBLE NOT NULL DEFAULT 1,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (child_id, belt_index),
+  FOREIGN KEY (child_id) REFERENCES children(id)
+);
+
+CREATE TABLE IF NOT EXISTS readiness_job_state (
+  id TINYINT PRIMARY KEY,
+  last_session_id INT NOT NULL DEFAULT 0,
+  last_run_at TIMESTAMP NULL
+);
+
 CREATE TABLE IF NOT EXISTS parent_notes (
   id INT AUTO_INCREMENT PRIMARY KEY,
   child_id INT NOT NULL,
@@ -102,6 +228,12 @@ CREATE TABLE IF NOT EXISTS class_offerings (
   instructor_user_id INT NULL,
   created_by_user_id INT NULL,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  week_key INT AS (YEARWEEK(class_date, 1)) STORED,
+  academy_id INT NOT NULL DEFAULT 1,
+  capacity INT NULL,
+  enrolled_count INT NOT NULL DEFAULT 0,
+  KEY idx_class_offerings_academy_date (academy_id, class_date, start_time),
+  KEY idx_class_offerings_week (week_key),
   FOREIGN KEY (instructor_user_id) REFERENCES users(id),
   FOREIGN KEY (created_by_user_id) REFERENCES users(id)
 );
@@ -118,6 +250,87 @@ CREATE TABLE IF NOT EXISTS class_enrollments (
   FOREIGN KEY (enrolled_by_user_id) REFERENCES users(id)
 );
 
+CREATE TABLE IF NOT EXISTS class_waitlist (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  offering_id INT NOT NULL,
+  child_id INT NOT NULL,
+  requested_by_user_id INT NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE KEY uq_class_waitlist (offering_id, child_id),
+  KEY idx_class_waitlist_offering (offering_id, id),
+  KEY idx_class_waitlist_child (child_id),
+  FOREIGN KEY (offering_id) REFERENCES class_offerings(id),
+  FOREIGN KEY (child_id) REFERENCES children(id),
+  FOREIGN KEY (requested_by_user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS child_week_signups (
+  child_id INT NOT NULL,
+  week_key INT NOT NULL,
+  signup_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (child_id, week_key),
+  FOREIGN KEY (child_id) REFERENCES children(id)
+);
+
+CREATE TABLE IF NOT EXISTS instructor_assignment_runs (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  month_start DATE NOT NULL,
+  status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+  score DOUBLE NULL,
+  summary TEXT NULL,
+  created_by_user_id INT NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  finished_at TIMESTAMP NULL,
+  academy_id INT NOT NULL DEFAULT 1,
+  KEY idx_instructor_assignment_runs_academy (academy_id, id),
+  FOREIGN KEY (created_by_user_id) REFERENCES users(id)
+);
+
+CREATE TABLE IF NOT EXISTS live_events (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  channel VARCHAR(60) NOT NULL,
+  event_type VARCHAR(40) NOT NULL,
+  payload MEDIUMTEXT NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  KEY idx_live_events_created (created_at)
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  idem_key CHAR(32) PRIMARY KEY,
+  user_id INT NOT NULL,
+  scope VARCHAR(60) NOT NULL,
+  response_location VARCHAR(500) NULL,
+  flashes TEXT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  completed_at TIMESTAMP NULL,
+  expires_at TIMESTAMP NOT NULL,
+  KEY idx_idempotency_keys_expires (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS background_jobs (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  job_type VARCHAR(60) NOT NULL,
+  label VARCHAR(200) NOT NULL,
+  payload MEDIUMTEXT NULL,
+  status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+  progress TINYINT NOT NULL DEFAULT 0,
+  progress_message VARCHAR(200) NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  max_attempts INT NOT NULL DEFAULT 3,
+  run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  locked_by VARCHAR(120) NULL,
+  result TEXT NULL,
+  error TEXT NULL,
+  created_by_user_id INT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  started_at TIMESTAMP NULL,
+  heartbeat_at TIMESTAMP NULL,
+  finished_at TIMESTAMP NULL,
+  KEY idx_background_jobs_claim (status, run_after),
+  KEY idx_background_jobs_user (created_by_user_id, id),
+  FOREIGN KEY (created_by_user_id) REFERENCES users(id)
+);
+
 CREATE TABLE IF NOT EXISTS attendance_sessions (
   id INT AUTO_INCREMENT PRIMARY KEY,
   offering_id INT NULL,
@@ -127,6 +340,13 @@ CREATE TABLE IF NOT EXISTS attendance_sessions (
   end_time TIME NOT NULL,
   staff_user_id INT NOT NULL,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  academy_id INT NOT NULL DEFAULT 1,
+  client_id VARCHAR(36) NULL,
+  readiness_folded TINYINT(1) NOT NULL DEFAULT 0,
+  KEY idx_attendance_sessions_academy_date (academy_id, class_date, start_time),
+  KEY idx_attendance_sessions_academy_id (academy_id, id),
+  KEY idx_attendance_sessions_unfolded (readiness_folded, id),
+  UNIQUE KEY uq_attendance_sessions_client (academy_id, client_id),
   FOREIGN KEY (offering_id) REFERENCES class_offerings(id),
   FOREIGN KEY (staff_user_id) REFERENCES users(id)
 );
@@ -0,0 +1,122 @@
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+
+
+def _to_minutes(value):
+    # MySQL TIME columns come back as timedelta; form values may be time objects.
+    if isinstance(value, timedelta):
+        return int(value.total_seconds() // 60)
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    if isinstance(value, datetime):
+        return value.hour * 60 + value.minute
+    parsed = datetime.strptime(str(value)[:5], "%H:%M")
+    return parsed.hour * 60 + parsed.minute
+
+
+def iso_week_bounds(day_value):
+    week_start = day_value - timedelta(days=day_value.weekday())
+    return week_start, week_start + timedelta(days=6)
+
+
+class AvailabilityIndex:
+    # Per-day busy intervals for every employee plus weekly scheduled minutes.
+
+    def __init__(self, week_start, week_end):
+        self.week_start = week_start
+        self.week_end = week_end
+        # {shift_date: {employee_id: ([starts], [ends])}} with starts kept sorted.
+        self.busy_by_day = {}
+        self.weekly_minutes = {}
+
+    def add_shift(self, employee_id, shift_date, start_minute, end_minute):
+        day_busy = self.busy_by_day.setdefault(shift_date, {})
+        starts, ends = day_busy.setdefault(employee_id, ([], []))
+        pos = bisect_left(starts, start_minute)
+        starts.insert(pos, start_minute)
+        ends.insert(pos, end_minute)
+        self.weekly_minutes[employee_id] = (
+            self.weekly_minutes.get(employee_id, 0) + max(end_minute - start_minute, 0)
+        )
+
+    def is_free(self, employee_id, shift_date, start_minute, end_minute):
+        # Only intervals starting before the window end can overlap it.
+        busy = self.busy_by_day.get(shift_date, {}).get(employee_id)
+        if not busy:
+            return True
+        starts, ends = busy
+        pos = bisect_left(starts, end_minute)
+        return not any(ends[idx] > start_minute for idx in range(pos))
+
+
+def build_availability_index(cur, academy_id, week_start, week_end):
+    # Load every employee shift of the academy in the window with a single range query.
+    index = AvailabilityIndex(week_start, week_end)
+    cur.execute(
+        """
+        SELECT COALESCE(covering_employee_id, employee_user_id) AS employee_user_id,
+               shift_date, start_time, end_time
+        FROM shifts
+        WHERE academy_id = %s
+          AND shift_date BETWEEN %s AND %s
+          AND coverage_status <> 'called_out'
+        """,
+        (academy_id, week_start, week_end),
+    )
+    for row in cur.fetchall():
+        index.add_shift(
+            row["employee_user_id"],
+            row["shift_date"],
+            _to_minutes(row["start_time"]),
+            _to_minutes(row["end_time"]),
+        )
+    return index
+
+
+def suggest_coverage(cur, shift, limit=None):
+    # Rank employees who are free for the shift: prior experience first, then fewest hours.
+    week_start, week_end = iso_week_bounds(shift["shift_date"])
+    index = build_availability_index(cur, shift["academy_id"], week_start, week_end)
+    start_minute = _to_minutes(shift["start_time"])
+    end_minute = _to_minutes(shift["end_time"])
+
+    cur.execute(
+        "SELECT id, username FROM users WHERE academy_id = %s AND role = 'employee'",
+        (shift["academy_id"],),
+    )
+    employees = cur.fetchall()
+    cur.execute(
+        """
+        SELECT DISTINCT COALESCE(covering_employee_id, employee_user_id) AS employee_user_id
+        FROM shifts
+        WHERE academy_id = %s
+          AND class_name = %s
+        """,
+        (shift["academy_id"], shift.get("class_name")),
+    )
+    taught_ids = {row["employee_user_id"] for row in cur.fetchall()}
+
+    candidates = []
+    for employee in employees:
+        employee_id = employee["id"]
+        if employee_id == shift.get("employee_user_id"):
+            continue
+        if not index.is_free(employee_id, shift["shift_date"], start_minute, end_minute):
+            continue
+        weekly_minutes = index.weekly_minutes.get(employee_id, 0)
+        candidates.append(
+            {
+                "id": employee_id,
+                "username": employee["username"],
+                "weekly_minutes": weekly_minutes,
+                "weekly_hours": round(weekly_minutes / 60.0, 1),
+                "has_taught_class": employee_id in taught_ids,
+            }
+        )
+
+    candidates.sort(
+        key=lambda c: (not c["has_taught_class"], c["weekly_minutes"], c["username"].lower())
+    )
+    if limit is not None:
+        candidates = candidates[:limit]
+    return candidates
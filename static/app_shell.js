@@ -279,8 +279,355 @@
     });
   }
 
+  function applyQueueOp(table, op) {
+    var existing = table.querySelector('tr[data-request-id="' + op.id + '"]');
+    var row = null;
+    if (op.action === "upsert" && op.html) {
+      var holder = document.createElement("tbody");
+      holder.innerHTML = op.html.trim();
+      row = holder.firstElementChild;
+    }
+
+    if (existing && row) {
+      existing.replaceWith(row);
+    } else if (existing) {
+      existing.remove();
+    } else if (row) {
+      var emptyRow = table.querySelector("tr[data-empty-row]");
+      var rows = table.querySelectorAll("tr[data-request-id]");
+      if (table.dataset.liveOrder === "desc" && rows.length) {
+        rows[0].parentNode.insertBefore(row, rows[0]);
+      } else if (emptyRow) {
+        emptyRow.parentNode.insertBefore(row, emptyRow);
+      } else {
+        (table.tBodies[0] || table).appendChild(row);
+      }
+    }
+
+    var limit = parseInt(table.dataset.liveLimit || "0", 10);
+    var liveRows = table.querySelectorAll("tr[data-request-id]");
+    if (limit > 0) {
+      for (var i = liveRows.length - 1; i >= limit; i -= 1) {
+        liveRows[i].remove();
+      }
+    }
+    var emptyMarker = table.querySelector("tr[data-empty-row]");
+    if (emptyMarker) {
+      emptyMarker.hidden = table.querySelector("tr[data-request-id]") !== null;
+    }
+  }
+
+  function wireLiveQueues() {
+    // Patch request tables in place from the server's event stream instead of reloading.
+    if (!context.loggedIn || !context.eventsUrl || !window.EventSource) return;
+    if (!document.querySelector("[data-live-queue]")) return;
+
+    var source = new EventSource(context.eventsUrl);
+    source.addEventListener("queue", function (event) {
+      var payload;
+      try {
+        payload = JSON.parse(event.data);
+      } catch (err) {
+        return;
+      }
+      (payload.ops || []).forEach(function (op) {
+        var table = document.querySelector('[data-live-queue="' + op.queue + '"]');
+        if (table) applyQueueOp(table, op);
+      });
+    });
+    window.addEventListener("pagehide", function () {
+      source.close();
+    });
+  }
+
+  var OFFLINE_DB_NAME = "academy-offline";
+  var ATTENDANCE_SYNC_CHUNK = 100;
+  var ATTENDANCE_SYNC_INTERVAL_MS = 60000;
+
+  function openOfflineDb() {
+    return new Promise(function (resolve, reject) {
+      if (!window.indexedDB) {
+        reject(new Error("IndexedDB is not available."));
+        return;
+      }
+      var request = window.indexedDB.open(OFFLINE_DB_NAME, 1);
+      request.onupgradeneeded = function () {
+        var db = request.result;
+        if (!db.objectStoreNames.contains("rosters")) {
+          db.createObjectStore("rosters", { keyPath: "offering_id" });
+        }
+        if (!db.objectStoreNames.contains("attendance_queue")) {
+          db.createObjectStore("attendance_queue", { keyPath: "client_id" });
+        }
+      };
+      request.onsuccess = function () {
+        resolve(request.result);
+      };
+      request.onerror = function () {
+        reject(request.error);
+      };
+    });
+  }
+
+  function offlineStore(db, storeName, mode, work) {
+    // Run work(store) in one transaction; resolves with the last request's result once committed.
+    return new Promise(function (resolve, reject) {
+      var tx = db.transaction(storeName, mode);
+      var result;
+      var request = work(tx.objectStore(storeName));
+      if (request) {
+        request.onsuccess = function () {
+          result = request.result;
+        };
+      }
+      tx.oncomplete = function () {
+        resolve(result);
+      };
+      tx.onerror = function () {
+        reject(tx.error);
+      };
+      tx.onabort = function () {
+        reject(tx.error);
+      };
+    });
+  }
+
+  function newClientId() {
+    if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+    return "xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx".replace(/[xy]/g, function (c) {
+      var r = (Math.random() * 16) | 0;
+      return (c === "x" ? r : (r & 0x3) | 0x8).toString(16);
+    });
+  }
+
+  function collectAttendance(form, action) {
+    // Same fields the attendance form posts, shaped for the sync endpoint.
+    var present = [];
+    form.querySelectorAll(".present-checkbox:checked").forEach(function (box) {
+      present.push(parseInt(box.value, 10));
+    });
+    var students = {};
+    form.querySelectorAll(".student-row").forEach(function (row) {
+      var techniqueIds = [];
+      row.querySelectorAll(".technique-checkbox:checked").forEach(function (box) {
+        techniqueIds.push(parseInt(box.value, 10));
+      });
+      var increment = row.querySelector(".learned-increment");
+      students[row.dataset.childId] = {
+        technique_ids: techniqueIds,
+        increment: increment ? parseInt(increment.value, 10) : 1,
+      };
+    });
+    var bulk = [];
+    var bulkSelect = form.querySelector('select[name="bulk_technique_ids"]');
+    if (bulkSelect) {
+      Array.prototype.forEach.call(bulkSelect.selectedOptions, function (option) {
+        bulk.push(parseInt(option.value, 10));
+      });
+    }
+    return {
+      client_id: newClientId(),
+      offering_id: parseInt(form.dataset.offeringId, 10),
+      action: action,
+      present_child_ids: present,
+      bulk_technique_ids: bulk,
+      students: students,
+      queued_at: new Date().toISOString(),
+    };
+  }
+
+  function postAttendanceChunk(syncUrl, chunk) {
+    return fetch(syncUrl, {
+      method: "POST",
+      credentials: "same-origin",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ sessions: chunk }),
+    }).then(function (response) {
+      // A redirect means the login expired; keep the queue until the user signs in again.
+      if (!response.ok || response.redirected) {
+        throw new Error("Attendance sync failed (" + response.status + ").");
+      }
+      return response.json();
+    });
+  }
+
+  function syncAttendanceQueue(db, syncUrl) {
+    // Send queued sessions oldest first; an entry leaves the queue once the server has answered for it.
+    // A chunk that fails stays queued for the next sync and does not hold back the chunks after it;
+    // the promise rejects only when no chunk got through.
+    return offlineStore(db, "attendance_queue", "readonly", function (store) {
+      return store.getAll();
+    }).then(function (queued) {
+      queued = (queued || []).sort(function (a, b) {
+        return a.queued_at < b.queued_at ? -1 : a.queued_at > b.queued_at ? 1 : 0;
+      });
+      var answered = [];
+      var failedChunks = 0;
+      var chain = Promise.resolve();
+      for (var i = 0; i < queued.length; i += ATTENDANCE_SYNC_CHUNK) {
+        (function (chunk) {
+          chain = chain
+            .then(function () {
+              return postAttendanceChunk(syncUrl, chunk);
+            })
+            .then(function (payload) {
+              var results = (payload.results || []).filter(function (result) {
+                return result.client_id && result.status;
+              });
+              answered = answered.concat(results);
+              return offlineStore(db, "attendance_queue", "readwrite", function (store) {
+                results.forEach(function (result) {
+                  store.delete(result.client_id);
+                });
+              });
+            })
+            .catch(function () {
+              failedChunks += 1;
+            });
+        })(queued.slice(i, i + ATTENDANCE_SYNC_CHUNK));
+      }
+      return chain.then(function () {
+        if (failedChunks && !answered.length) {
+          throw new Error("Attendance sync failed.");
+        }
+        return answered;
+      });
+    });
+  }
+
+  function wireOfflineAttendance() {
+    // While the device is online the form posts as usual. Offline submits are queued in
+    // IndexedDB and synced in batches once the connection is back, so a dropped Wi-Fi never
+    // loses a class taken on a page that was already open.
+    var form = document.querySelector("form[data-offline-sync]");
+    if (!form || !window.fetch || !window.Promise) return;
+    var syncUrl = form.dataset.syncUrl;
+    var statusEl = document.getElementById("offline-sync-status");
+    var rosterEl = document.getElementById("attendance-offline-roster");
+    var syncing = null;
+
+    function showStatus(message, tone) {
+      if (!statusEl) return;
+      statusEl.textContent = message || "";
+      statusEl.className = "flash " + (tone || "info") + (message ? "" : " hidden");
+    }
+
+    openOfflineDb()
+      .then(function (db) {
+        if (rosterEl) {
+          try {
+            var roster = JSON.parse(rosterEl.textContent);
+            offlineStore(db, "rosters", "readwrite", function (store) {
+              return store.put(roster);
+            });
+          } catch (err) {
+            // A bad payload only costs the class labels in the pending message.
+          }
+        }
+
+        function showPending(rejected) {
+          return Promise.all([
+            offlineStore(db, "attendance_queue", "readonly", function (store) {
+              return store.getAll();
+            }),
+            offlineStore(db, "rosters", "readonly", function (store) {
+              return store.getAll();
+            }),
+          ]).then(function (stores) {
+            var labels = {};
+            (stores[1] || []).forEach(function (roster) {
+              labels[roster.offering_id] = roster.label;
+            });
+            var pending = stores[0] || [];
+            var messages = (rejected || []).map(function (result) {
+              return "A queued attendance session was not recorded: " + result.error;
+            });
+            if (pending.length) {
+              var classes = pending.map(function (entry) {
+                return labels[entry.offering_id] || "class #" + entry.offering_id;
+              });
+              messages.push(
+                pending.length +
+                  " attendance session(s) saved on this device and waiting to sync: " +
+                  classes.join("; ") +
+                  "."
+              );
+            }
+            showStatus(messages.join(" "), rejected && rejected.length ? "error" : "info");
+          });
+        }
+
+        function runSync() {
+          if (syncing) return syncing;
+          syncing = syncAttendanceQueue(db, syncUrl)
+            .then(
+              function (results) {
+                var rejected = results.filter(function (result) {
+                  return result.status === "rejected";
+                });
+                return showPending(rejected).then(function () {
+                  return results;
+                });
+              },
+              function () {
+                return showPending().then(function () {
+                  return [];
+                });
+              }
+            )
+            .then(function (results) {
+              syncing = null;
+              return results;
+            });
+          return syncing;
+        }
+
+        form.addEventListener("submit", function (event) {
+          if (navigator.onLine) return;
+          event.preventDefault();
+          var submitter = event.submitter;
+          var entry = collectAttendance(form, (submitter && submitter.value) || "save_attendance");
+          offlineStore(db, "attendance_queue", "readwrite", function (store) {
+            return store.put(entry);
+          })
+            .then(function () {
+              // Wait for any sync already in flight so this entry goes out in the next one.
+              return syncing ? syncing.then(runSync) : runSync();
+            })
+            .then(function (results) {
+              var mine = results.filter(function (result) {
+                return result.client_id === entry.client_id;
+              })[0];
+              if (mine && mine.summary_url) {
+                // The connection came back while this entry was queued.
+                window.location.href = mine.summary_url;
+                return;
+              }
+              form.classList.remove("is-submitting");
+              if (!mine) {
+                showStatus(
+                  "No connection: attendance is saved on this device and will sync when the network is back.",
+                  "info"
+                );
+              }
+            });
+        });
+
+        window.addEventListener("online", runSync);
+        window.setInterval(function () {
+          if (navigator.onLine) runSync();
+        }, ATTENDANCE_SYNC_INTERVAL_MS);
+        runSync();
+      })
+      .catch(function () {
+        // Without IndexedDB the form keeps posting directly.
+      });
+  }
+
   animatePageEnter();
   wireLinkTransitions();
   mountShell();
   wireFormStates();
+  wireLiveQueues();
+  wireOfflineAttendance();
 })();
@@ -0,0 +1,267 @@
+import json
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+
+from db import query_stats
+
+# Tail-based sampling: every request at least this slow (or failing) is exported,
+# plus a random share of the rest.
+SLOW_TRACE_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_HEADER = "X-Trace-Id"
+MAX_SQL_LENGTH = 2000
+# The file exporter moves a full TRACE_FILE aside to TRACE_FILE.1, keeping at most two files.
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(64 * 1024 * 1024)))
+TRACEPARENT_PATTERN = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_SQL_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_SQL_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(operation):
+    # Collapse whitespace and replace inline literals so identical statements group together.
+    if isinstance(operation, bytes):
+        operation = operation.decode("utf-8", "replace")
+    text = _SQL_SPACE.sub(" ", str(operation or "")).strip()
+    text = _SQL_NUMBER.sub("?", _SQL_STRING.sub("?", text))
+    return text[:MAX_SQL_LENGTH]
+
+
+class Span:
+    def __init__(self, trace_id, name, kind, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        # Raw SQL for sql spans; normalized only when a kept trace is exported.
+        self.statement = None
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms = None
+
+    def finish(self, duration_seconds=None):
+        if duration_seconds is None:
+            duration_seconds = time.perf_counter() - self._started
+        self.duration_ms = round(duration_seconds * 1000, 3)
+
+    def add_rows(self, count):
+        self.attributes["rows"] = self.attributes.get("rows", 0) + count
+
+    def to_dict(self):
+        attributes = self.attributes
+        if self.statement is not None:
+            attributes = {"db.statement": normalize_sql(self.statement), **attributes}
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": attributes,
+        }
+
+
+class Trace:
+    # Spans of one request. SQL from query batch threads hangs off the request span.
+
+    def __init__(self, trace_id, root_name, parent_id=None):
+        self.trace_id = trace_id
+        self.spans = []
+        self._lock = threading.Lock()
+        self._owner_thread = threading.get_ident()
+        self.root = self._add(Span(trace_id, root_name, "request", parent_id))
+        self._stack = [self.root]
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def start_span(self, name, kind, attributes=None):
+        span = self._add(Span(self.trace_id, name, kind, self._stack[-1].span_id, attributes))
+        self._stack.append(span)
+        return span
+
+    def active_span(self):
+        return self._stack[-1]
+
+    def on_owner_thread(self):
+        return threading.get_ident() == self._owner_thread
+
+    def finish_span(self, span):
+        span.finish()
+        if span in self._stack:
+            self._stack.remove(span)
+
+    def record_sql(self, operation, seconds, cursor):
+        on_owner = self.on_owner_thread()
+        parent = self._stack[-1] if on_owner else self.root
+        attributes = {}
+        if cursor is not None and not getattr(cursor, "with_rows", False):
+            attributes["rows"] = max(getattr(cursor, "rowcount", 0) or 0, 0)
+        if not on_owner:
+            attributes["thread"] = "query-batch"
+        span = Span(self.trace_id, "sql", "sql", parent.span_id, attributes)
+        span.statement = operation
+        span.start_time -= seconds
+        span.finish(seconds)
+        return self._add(span)
+
+
+class InMemoryExporter:
+    # Keeps exported spans in a list; for tests and interactive debugging.
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        with self._lock:
+            self.spans.extend(span.to_dict() for span in spans)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonLinesFileExporter:
+    # Appends one JSON object per span; safe to share between threads of a worker.
+
+    def __init__(self, path, max_bytes=TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if self.max_bytes and size and size + len(lines) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(lines)
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def set_exporter(exporter):
+    # Any object with export(spans) works; None turns tracing off.
+    global _exporter
+    _exporter = exporter if exporter is not None else False
+
+
+def get_exporter():
+    # TRACE_EXPORTER=file (default, TRACE_FILE), memory, or off.
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                backend = os.getenv("TRACE_EXPORTER", "file")
+                if backend == "memory":
+                    _exporter = InMemoryExporter()
+                elif backend == "file":
+                    _exporter = JsonLinesFileExporter(
+                        os.getenv("TRACE_FILE")
+                        or os.path.join(current_app.instance_path, "traces.jsonl")
+                    )
+                else:
+                    _exporter = False
+    return _exporter or None
+
+
+def current_trace():
+    if not has_request_context():
+        return None
+    return g.get("trace")
+
+
+def start_trace():
+    if get_exporter() is None:
+        return
+    trace_id, parent_id = secrets.token_hex(16), None
+    match = TRACEPARENT_PATTERN.match(request.headers.get("traceparent", ""))
+    if match:
+        trace_id, parent_id = match.groups()
+    trace = Trace(trace_id, f"{request.method} {request.url_rule or request.path}", parent_id)
+    trace.root.attributes.update({"http.method": request.method, "http.path": request.path})
+    g.trace = trace
+    query_stats().listener = trace.record_sql
+
+
+def tag_trace_response(response):
+    trace = current_trace()
+    if trace is not None:
+        trace.root.attributes["http.status_code"] = response.status_code
+        trace.root.attributes["endpoint"] = request.endpoint or "unmatched"
+        response.headers[TRACE_HEADER] = trace.trace_id
+    return response
+
+
+def finish_trace(exc=None):
+    trace = g.pop("trace", None)
+    if trace is None:
+        return
+    stats = g.get("query_stats")
+    if stats is not None:
+        stats.listener = None
+    trace.root.finish()
+    if exc is not None:
+        trace.root.attributes["error"] = repr(exc)
+    failed = exc is not None or trace.root.attributes.get("http.status_code", 200) >= 500
+    if not (failed or trace.root.duration_ms >= SLOW_TRACE_MS or random.random() < SAMPLE_RATE):
+        return
+    exporter = get_exporter()
+    if exporter is None:
+        return
+    try:
+        exporter.export(list(trace.spans))
+    except Exception:
+        current_app.logger.exception("Could not export trace %s.", trace.trace_id)
+
+
+def start_template_span(sender, template, context, **extra):
+    trace = current_trace()
+    if trace is not None:
+        trace.start_span("render " + (template.name or "<string>"), "template")
+
+
+def finish_template_span(sender, template, context, **extra):
+    trace = current_trace()
+    if trace is not None and trace.active_span().kind == "template":
+        trace.finish_span(trace.active_span())
+
+
+def traced(func):
+    # Record a span for a helper when it runs inside a traced request.
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        trace = current_trace()
+        if trace is None or not trace.on_owner_thread():
+            return func(*args, **kwargs)
+        span = trace.start_span(func.__name__, "function")
+        try:
+            return func(*args, **kwargs)
+        except Exception as exc:
+            span.attributes["error"] = repr(exc)
+            raise
+        finally:
+            trace.finish_span(span)
+
+    return wrapped